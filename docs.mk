@@ -9,7 +9,7 @@ pages = 64on32.htm configs.htm copying.htm developer.htm \
 
 xx:
 	test -d tmp.xx || mkdir tmp.xx
-	for p in $(pages); do python3 docs/mdhtm.py docs/$$p > tmp.xx/$$p.xx1 ; done
+	python3 docs/tools/mdhtm.py -o tmp.xx -s .xx1 $(addprefix docs/,$(pages))
 	for p in $(pages); do python3 docs/md2dbk.py -r docs/$$p.md > tmp.xx/$$p.xx2 ; done
 
 html2md.py:
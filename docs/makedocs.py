@@ -2,19 +2,19 @@
 from typing import Optional, List, Dict
 
 import sys
-from zzipdoc.match import *
-from zzipdoc.options import *
-from zzipdoc.textfile import *
-from zzipdoc.textfileheader import *
-from zzipdoc.functionheader import *
-from zzipdoc.functionprototype import *
-from zzipdoc.commentmarkup import *
-from zzipdoc.functionlisthtmlpage import *
-from zzipdoc.functionlistreference import *
-from zzipdoc.dbk2htm import *
-from zzipdoc.htmldoctypes import *
-from zzipdoc.htmldocument import *
-from zzipdoc.docbookdocument import *
+from zzipdoc.match import Match
+from zzipdoc.options import DocOptions
+from zzipdoc.textfile import TextFile
+from zzipdoc.textfileheader import TextFileHeader
+from zzipdoc.functionheader import FunctionHeader, FunctionHeaderList
+from zzipdoc.functionprototype import FunctionPrototype
+from zzipdoc.commentmarkup import CommentMarkup, CommentMarkupTextFileHeader, CommentMarkupFunctionHeader
+from zzipdoc.functionlisthtmlpage import FunctionListHtmlPage
+from zzipdoc.functionlistreference import FunctionListReference
+from zzipdoc.dbk2htm import section2html, paramdef2html
+from zzipdoc.htmldoctypes import HtmlDocPart, RefDocPart
+from zzipdoc.htmldocument import HtmlDocument
+from zzipdoc.docbookdocument import DocbookDocument
 
 def _src_to_xml(text: str) -> str:
     return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
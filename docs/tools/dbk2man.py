@@ -11,6 +11,7 @@ from typing import Optional, List, Dict, Union, Iterator
 import logging
 import os.path
 import re
+import json
 import collections
 import xml.etree.ElementTree as ET
 
@@ -60,6 +61,12 @@ def textof(elem: ET.Element, defaults: str = "") -> str:
 
 OverviewEntry = collections.namedtuple("OverviewEntry", ["manpage", "manvolnum", "refpurpose"])
 
+SearchEntry = collections.namedtuple("SearchEntry", ["file", "names", "refpurpose", "text"])
+
+# a hidden sidecar for each html overview page, to be read by dir2index
+OVERVIEW_MANIFEST = ".%s.overview"
+SEARCHINDEX = "searchindex.json"
+
 def parse_docbook(filename: str) -> ET.Element:
     tree = ET.parse(filename)
     return tree.getroot()
@@ -70,6 +77,31 @@ def dbk2(man: str, filenames: List[str], subdirectory: str = ".") -> None:
         overview = docbook2(man, root, subdirectory)
         overview2(man, overview, subdirectory, filename)
 
+def dbks2(makes: List[str], filenames: List[str], subdirectory: str = ".",
+          mandir: str = "", htmldir: str = "", index: bool = False, search: bool = False) -> Dict[str, Dict[str, OverviewEntry]]:
+    """ like dbk2 but for multiple output kinds ('man'/'html') in one run. Each docbook
+        file is parsed only once and the trees are shared among the output kinds. The
+        html overviews are returned and they can be written as an index.html as well.
+        With 'search' the html run does also write a searchindex.json for refsearch.py"""
+    roots = [(filename, parse_docbook(filename)) for filename in filenames]
+    overviews: Dict[str, Dict[str, OverviewEntry]] = {}
+    searches: List[SearchEntry] = []
+    for make in makes:
+        man = "man" if make == "man" else ""
+        into = (mandir if man else htmldir) or subdirectory
+        for filename, root in roots:
+            overview = docbook2(man, root, into)
+            overview2(man, overview, into, filename)
+            if not man:
+                overviews[filename] = overview
+                if search:
+                    searches += docbook2search(root)
+    if index and overviews:
+        index2htm(overviews, htmldir or subdirectory)
+    if search and "html" in makes:
+        search2json(searches, htmldir or subdirectory)
+    return overviews
+
 def docbook2(man: str, root: ET.Element, subdirectory: str = ".") -> Dict[str, OverviewEntry]:
     if root.tag != "reference":
         logg.warning("no <reference> found, not a docbook file?")
@@ -438,14 +470,99 @@ def overview2htm(overview: Dict[str, OverviewEntry], subdirectory: str, docbook_
     text += "<h3>%s %s</h3>\n" % (htm(basename), htm("overview"))
     text += "<ul>\n"
     for filename in sorted(overview):
-        entry = overview[filename]
-        subdir_filename = os.path.basename(filename)
-        text += '<li><a href="%s">%s</a> - %s</li>' % (subdir_filename, entry.manpage, htm(entry.refpurpose))
+        text += overviewitem2htm(filename, overview[filename])
         text += "\n"
     text += "</ul>\n"
     text += "</body></html>\n"
     docbook_filename = "%s/%s.%s" % (subdirectory, basename, "html")
     writefile(docbook_filename, text)
+    overview2manifest(overview, subdirectory, docbook_filename)
+
+def overview2manifest(overview: Dict[str, OverviewEntry], subdirectory: str, docbook_filename: str) -> None:
+    """ one json line per entry (file, manpage, manvolnum, refpurpose) in the order of the overview page """
+    basename = splitname(docbook_filename)
+    text = ""
+    for filename in sorted(overview):
+        entry = overview[filename]
+        item = {"file": os.path.basename(filename), "manpage": entry.manpage,
+                "manvolnum": entry.manvolnum, "refpurpose": entry.refpurpose}
+        text += json.dumps(item) + "\n"
+    writefile(os.path.join(subdirectory, OVERVIEW_MANIFEST % basename), text)
+
+def overviewitem2htm(filename: str, entry: OverviewEntry) -> str:
+    subdir_filename = os.path.basename(filename)
+    return '<li><a href="%s">%s</a> - %s</li>' % (subdir_filename, entry.manpage, htm(entry.refpurpose))
+
+def index2htm(overviews: Dict[str, Dict[str, OverviewEntry]], subdirectory: str) -> None:
+    """ the same index.html as from dir2index but using the overviews in memory """
+    text = "<html><body>" + "\n"
+    text += "<ul>"
+    pages = []
+    for docbook_filename, overview in overviews.items():
+        basename = splitname(docbook_filename)
+        text += '<li><a href="%s.html"><h4>%s</h4></a></li>' % (basename, basename)
+        text += "\n"
+        for filename in sorted(overview):
+            subdir_filename = os.path.basename(filename)
+            if subdir_filename in pages:
+                continue
+            pages.append(subdir_filename)
+            text += overviewitem2htm(filename, overview[filename])
+            text += "\n"
+    text += "</ul>"
+    text += "</body></html>" + "\n"
+    writefile("%s/index.html" % subdirectory, text)
+
+def docbook2search(root: ET.Element) -> List[SearchEntry]:
+    """ the searchable parts of each refentry - with the same html filename as in refentry2 """
+    entries: List[SearchEntry] = []
+    for refentry in root.findall("refentry"):
+        refentrytitle = ""
+        manvolnum = "3"
+        section = refentry.find("refmeta")
+        if section is not None:
+            found = section.find("refentrytitle")
+            if found is not None: refentrytitle = textof(found)
+            found = section.find("manvolnum")
+            if found is not None: manvolnum = textof(found)
+        names: List[str] = []
+        refpurpose = ""
+        section = refentry.find("refnamediv")
+        if section is not None:
+            names = [ textof(refname) for refname in section.findall("refname") ]
+            found = section.find("refpurpose")
+            if found is not None: refpurpose = textof(found)
+        if not refentrytitle:
+            if not names: continue
+            refentrytitle = names[0]
+        if refentrytitle not in names:
+            names = [ refentrytitle ] + names
+        text = " ".join(["".join(refsect.itertext()) for refsect in refentry.findall("refsect1")])
+        filename = "%s.%s.%s" % (refentrytitle, manvolnum, "html")
+        entries.append(SearchEntry(filename, names, refpurpose.strip(), text))
+    return entries
+
+def trigrams(text: str) -> Iterator[str]:
+    for word in re.findall(r"\w+", text.lower()):
+        for pos in range(len(word) - 2):
+            yield word[pos:pos+3]
+
+def search2json(entries: List[SearchEntry], subdirectory: str) -> None:
+    """ the searchindex has a list of docs [file, names, refpurpose] and the trigram
+        postings over names, refpurpose and description as ascending lists of doc numbers """
+    docs: List[List[object]] = []
+    postings: Dict[str, List[int]] = {}
+    for entry in sorted(entries, key = lambda x: x.file):
+        if docs and docs[-1][0] == entry.file:
+            continue
+        docnum = len(docs)
+        docs.append([entry.file, entry.names, entry.refpurpose])
+        for trigram in trigrams(" ".join(entry.names) + " " + entry.refpurpose + " " + entry.text):
+            posting = postings.setdefault(trigram, [])
+            if not posting or posting[-1] != docnum:
+                posting.append(docnum)
+    index = {"version": 1, "docs": docs, "trigrams": postings}
+    writefile(os.path.join(subdirectory, SEARCHINDEX), json.dumps(index, sort_keys=True, separators=(",", ":")))
 
 def writefile(filename: str, manpagetext: str) -> None:
     dirname = os.path.dirname(filename)
@@ -462,14 +579,24 @@ if __name__ == "__main__":
     _o.add_option("-o","--into", metavar="DIR", default=".",
         help="specify base directory for output [%default]")
     _o.add_option("-t","--make", metavar="DIR", default="man",
-        help="make 'man'/'html' output pages [%default]")
+        help="make 'man'/'html' output pages, or both as 'man,html' [%default]")
+    _o.add_option("--mandir", metavar="DIR", default="",
+        help="base directory for 'man' output (instead of --into)")
+    _o.add_option("--htmldir", metavar="DIR", default="",
+        help="base directory for 'html' output (instead of --into)")
+    _o.add_option("--index", action="store_true", default=False,
+        help="write an index.html for the 'html' output (like dir2index)")
+    _o.add_option("--search", action="store_true", default=False,
+        help="write a searchindex.json for the 'html' output (see refsearch.py)")
     _o.add_option("-v","--verbose", action="count", default=0,
         help="increase logging level [%default]")
     opt, args = _o.parse_args()
     logging.basicConfig(level = max(0, logging.WARNING - 10 * opt.verbose))
     # ensure commandline is compatible with "xmlto -o DIR TYPE INPUTFILE"
-    make = opt.make
+    makes = opt.make.split(",")
     if args and args[0] in ("man", "html"):
-       make = args[0]
-       args = args[1:]
-    dbk2(make == 'man', args, opt.into)
+       makes = []
+       while args and args[0] in ("man", "html"):
+           makes.append(args[0])
+           args = args[1:]
+    dbks2(makes, args, opt.into, opt.mandir, opt.htmldir, opt.index, opt.search)
@@ -5,10 +5,11 @@
 
 __author__ = "Guido U. Draheim"
 
-from typing import Optional, List, Iterator
+from typing import Optional, List, Dict, Tuple, Iterator
 import logging
 import os.path
 import re
+import json
 import xml.etree.ElementTree as ET
 
 logg = logging.getLogger("dir2index")
@@ -47,19 +48,57 @@ def zzip_sorted(filenames: List[str]) -> Iterator[str]:
         if "zziplib" not in name:
             yield name
 
+# the hidden sidecar written by dbk2man for each html overview page
+OVERVIEW_MANIFEST = ".%s.overview"
+OVERVIEW_TITLE = " overview</title>"
+OVERVIEW_SCANSIZE = 1024
+
+def read_manifest(filepath: str) -> Iterator[Tuple[str, str]]:
+    """ yields (filename, index line) from a dbk2man overview manifest """
+    with open(filepath) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            yield item["file"], '<li><a href="%s">%s</a> - %s</li>' % (item["file"], item["manpage"], htm(item["refpurpose"]))
+
+def is_overview(filepath: str) -> bool:
+    """ the overview html pages have their title within the first line """
+    with open(filepath) as f:
+        return OVERVIEW_TITLE in f.read(OVERVIEW_SCANSIZE)
+
+def scan_overview(filepath: str) -> Iterator[Tuple[str, str]]:
+    """ yields (filename, index line) from the list items of an overview html page """
+    with open(filepath) as f:
+        for line in f:
+            m = re.match('<li><a href="([^"]*)".*</li>', line)
+            if m:
+                yield m.group(1), line.rstrip("\n")
+
 def dir2(man: str, dirs: List[str], into: str) -> None:
     text = "<html><body>" + "\n"
-    file2name = {}
-    file2text = {}
+    file2name: Dict[str, str] = {}
+    file2path: Dict[str, str] = {}
     for dirname in dirs:
         for filename in os.listdir(dirname):
-            filepath = os.path.join(dirname, filename)
+            if filename.startswith("."):
+                continue
             file2name[filename] = splitname(filename)
-            file2text[filename] = open(filepath).read()
-    # find the overview filenames and generate the pages order
+            file2path[filename] = os.path.join(dirname, filename)
+    # find the overview filenames - from the manifest sidecars or by a short scan
     overviews = []
-    for filename in file2text:
-        if " overview</title>" in file2text[filename]:
+    manifests: Dict[str, str] = {}
+    for filename in file2name:
+        manifest = os.path.join(os.path.dirname(file2path[filename]), OVERVIEW_MANIFEST % file2name[filename])
+        if filename.endswith(".html") and os.path.isfile(manifest):
+            overviews.append(filename)
+            manifests[filename] = manifest
+    known = set(overviews)
+    for filename in overviews:
+        for listed, _ in read_manifest(manifests[filename]):
+            known.add(listed)
+    for filename in file2name:
+        if filename not in known and is_overview(file2path[filename]):
             overviews.append(filename)
     logg.warning("overviews = %s", overviews)
     logg.warning("overviews = %s", [file2name[f] for f in overviews])
@@ -68,14 +107,15 @@ def dir2(man: str, dirs: List[str], into: str) -> None:
     for overview in zzip_sorted(overviews):
         if overview not in pages:
             pages.append(overview)
-        for line in file2text[overview].split("\n"):
-            m = re.match('<li><a href="([^"]*)".*</li>', line)
-            if m:
-                filename = m.group(1)
-                if filename not in file2item:
-                    file2item[filename] = line
-                if filename not in pages:
-                    pages.append(filename)
+        if overview in manifests:
+            items = read_manifest(manifests[overview])
+        else:
+            items = scan_overview(file2path[overview])
+        for filename, line in items:
+            if filename not in file2item:
+                file2item[filename] = line
+            if filename not in pages:
+                pages.append(filename)
     for filename in sorted(file2name):
         if filename not in pages:
             pages.append(filename)
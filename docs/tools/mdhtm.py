@@ -1,47 +1,115 @@
 #! /usr/bin/python3
 
+""" Cleans up the html markup of the old site pages to be closer to what
+    md2dbk expects. The replacements are combined into one regex that is
+    run once over each file - the plain text in between is not touched and
+    each run of adjacent markup is looked up in a dispatch dict.
+"""
+
+__author__ = "Guido U. Draheim"
+
+from typing import List, Dict, Optional, TextIO
+import logging
+import os.path
 import re
+import sys
+
+logg = logging.getLogger("mdhtm")
+
+def mdhtm_line(part: str) -> str:
+    """ the replacements on one line (without its newline) - in that order """
+    part = re.sub("`([^`]*)`", "<code>\\1</code>", part)
+    # part = re.sub("(?m)(</[hH][1234]>) *(\\S+)", "\\1\n\\2", part)
+    part = part.replace("<br>", "<br />")
+    part = part.replace("<>", " ")
+    # part = part.replace("<center>", "")
+    # part = part.replace("</center>", "")
+    # part = part.replace("<small>", "")
+    # part = part.replace("</small>", "")
+    part = part.replace("<nobr>", "")
+    part = part.replace("</nobr>", "")
+    part = part.replace("<section>", "")
+    part = part.replace("</section>", "")
+    #part = part.replace("<blockquote>", "<P>")
+    #part = part.replace("</blockquote>", "</P>")
+    #part = part.replace("<BLOCKQUOTE>", "<P>")
+    #part = part.replace("</BLOCKQUOTE>", "</P>")
+    part = part.replace("<BLOCKQUOTE>", "<blockquote>")
+    part = part.replace("</BLOCKQUOTE>", "</blockquote>")
+    part = part.replace("<PRE>", "<pre>")
+    part = part.replace("</PRE>", "</pre>")
+    part = part.replace("<tt>", "<code>")
+    part = part.replace("</tt>", "</code>")
+    part = re.sub("(</?)H([1234]>)", "\\1h\\2", part)
+    part = part.replace("<p>&nbsp;</p>", "")
+    part = part.replace("&nbsp;", "")
+    part = part.replace("<blockquote><ul>", "<blockquote>\n<ul>")
+    part = part.replace("</ul></blockquote>", "</ul>\n</blockquote>")
+    part = part.replace("<P><small>", "<P>\n<small>")
+    part = part.replace("</small></P>", "</small>\n</P>")
+    part = part.replace("<ul><li>", "<ul>\n<li>")
+    part = part.replace("</li></ul>", "</li>\n</ul>")
+    part = part.replace("<dd><ul>", "<dd>\n<ul>")
+    part = part.replace("</ul></dd>", "</ul>\n</dd>")
+    part = part.replace("<code><code>", "<code>")
+    part = part.replace("</code></code>", "</code>")
+    return part
+
+# every replacement above matches a sequence of these markups
+MARKUPS = ["<br>", "<>", "<nobr>", "</nobr>", "<section>", "</section>",
+           "<BLOCKQUOTE>", "</BLOCKQUOTE>", "<PRE>", "</PRE>", "<tt>", "</tt>",
+           "<H1>", "<H2>", "<H3>", "<H4>", "</H1>", "</H2>", "</H3>", "</H4>",
+           "<p>", "</p>", "&nbsp;", "<blockquote>", "</blockquote>", "<P>", "</P>",
+           "<small>", "</small>", "<ul>", "</ul>", "<li>", "</li>", "<dd>", "</dd>",
+           "<code>", "</code>"]
+# trailing whitespace is stripped (as rstrip did) and a run of adjacent markups
+# and `quoted` parts is converted as a whole, as the replacements may span them.
+# The lookahead lets the regex engine skip quickly over the plain text.
+MARKUPRUNS = re.compile(r"(?=[<&`\s])(?:(?P<ws>[^\S\n]+$)|(?P<run>(?:`[^`\n]*`|&nbsp;|<(?:%s))+))" % "|".join(
+    [re.escape(markup[1:]) for markup in sorted(MARKUPS, key=len, reverse=True) if markup.startswith("<")]), re.MULTILINE)
+DISPATCH: Dict[str, str] = dict([(markup, mdhtm_line(markup)) for markup in MARKUPS])
+
+def _markuprun(found: "re.Match[str]") -> str:
+    run = found.group("run")
+    if run is None:
+        return ""
+    if run in DISPATCH:
+        return DISPATCH[run]
+    text = mdhtm_line(run)
+    if "`" not in run:
+        DISPATCH[run] = text
+    return text
+
+def mdhtm(text: str) -> str:
+    """ converts a complete text - with the same result as mdhtm_line on each line """
+    if not text:
+        return text
+    if not text.endswith("\n"):
+        text += "\n"
+    return MARKUPRUNS.sub(_markuprun, text)
+
+def mdhtm_files(filenames: List[str], out: Optional[TextIO] = None, into: str = "", suffix: str = "") -> None:
+    """ convert to 'out' (default stdout) or into separate files in the 'into' directory """
+    for filename in filenames:
+        with open(filename) as f:
+            text = mdhtm(f.read())
+        if into:
+            outfile = os.path.join(into, os.path.basename(filename) + suffix)
+            with open(outfile, "w") as o:
+                o.write(text)
+            logg.debug("written %s", outfile)
+        else:
+            (out or sys.stdout).write(text)
 
-from optparse import OptionParser
-_o = OptionParser()
-opt, args = _o.parse_args()
-
-for arg in args:
-   for line in open(arg):
-       part = line.rstrip()
-       part = re.sub("`([^`]*)`", "<code>\\1</code>", part)
-       # part = re.sub("(?m)(</[hH][1234]>) *(\\S+)", "\\1\n\\2", part)
-       part = part.replace("<br>", "<br />")
-       part = part.replace("<>", " ")
-       # part = part.replace("<center>", "")
-       # part = part.replace("</center>", "")
-       # part = part.replace("<small>", "")
-       # part = part.replace("</small>", "")
-       part = part.replace("<nobr>", "")
-       part = part.replace("</nobr>", "")
-       part = part.replace("<section>", "")
-       part = part.replace("</section>", "")
-       #part = part.replace("<blockquote>", "<P>")
-       #part = part.replace("</blockquote>", "</P>")
-       #part = part.replace("<BLOCKQUOTE>", "<P>")
-       #part = part.replace("</BLOCKQUOTE>", "</P>")
-       part = part.replace("<BLOCKQUOTE>", "<blockquote>")
-       part = part.replace("</BLOCKQUOTE>", "</blockquote>")
-       part = part.replace("<PRE>", "<pre>")
-       part = part.replace("</PRE>", "</pre>")
-       part = part.replace("<tt>", "<code>")
-       part = part.replace("</tt>", "</code>")
-       part = re.sub("(</?)H([1234]>)", "\\1h\\2", part)
-       part = part.replace("<p>&nbsp;</p>", "")
-       part = part.replace("&nbsp;", "")
-       part = part.replace("<blockquote><ul>", "<blockquote>\n<ul>")
-       part = part.replace("</ul></blockquote>", "</ul>\n</blockquote>")
-       part = part.replace("<P><small>", "<P>\n<small>")
-       part = part.replace("</small></P>", "</small>\n</P>")
-       part = part.replace("<ul><li>", "<ul>\n<li>")
-       part = part.replace("</li></ul>", "</li>\n</ul>")
-       part = part.replace("<dd><ul>", "<dd>\n<ul>")
-       part = part.replace("</ul></dd>", "</ul>\n</dd>")
-       part = part.replace("<code><code>", "<code>")
-       part = part.replace("</code></code>", "</code>")
-       print(part)
+if __name__ == "__main__":
+    from optparse import OptionParser
+    _o = OptionParser("%prog [options] files...")
+    _o.add_option("-o","--into", metavar="DIR", default="",
+        help="write each file into this directory (instead of stdout)")
+    _o.add_option("-s","--suffix", metavar="EXT", default="",
+        help="add this suffix to each filename written --into [%default]")
+    _o.add_option("-v","--verbose", action="count", default=0,
+        help="increase logging level [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level = max(0, logging.WARNING - 10 * opt.verbose))
+    mdhtm_files(args, into=opt.into, suffix=opt.suffix)
@@ -0,0 +1,81 @@
+#! /usr/bin/python3
+
+""" Looks up functions in the searchindex.json that dbk2man writes with
+    its html pages (dbk2man.py --search). A function name or its prefix
+    is matched directly, other words are matched on the trigram postings
+    of the refpurpose and description texts.
+"""
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Dict, Set, Iterator, Tuple, Any
+import logging
+import os.path
+import re
+import json
+
+logg = logging.getLogger("refsearch")
+
+SEARCHINDEX = "searchindex.json"
+
+def trigrams(text: str) -> Iterator[str]:
+    for word in re.findall(r"\w+", text.lower()):
+        for pos in range(len(word) - 2):
+            yield word[pos:pos+3]
+
+def load_searchindex(filename: str) -> Dict[str, Any]:
+    if os.path.isdir(filename):
+        filename = os.path.join(filename, SEARCHINDEX)
+    with open(filename) as f:
+        index: Dict[str, Any] = json.load(f)
+    return index
+
+def search_names(index: Dict[str, Any], word: str) -> Set[int]:
+    found = set()
+    word = word.lower()
+    for docnum, (filename, names, refpurpose) in enumerate(index["docs"]):
+        for name in names:
+            if name.lower().startswith(word):
+                found.add(docnum)
+    return found
+
+def search_text(index: Dict[str, Any], word: str) -> Set[int]:
+    postings: Dict[str, List[int]] = index["trigrams"]
+    found: Optional[Set[int]] = None
+    for trigram in trigrams(word):
+        posting = set(postings.get(trigram, []))
+        found = posting if found is None else found & posting
+        if not found:
+            return set()
+    return found or set()
+
+def search(index: Dict[str, Any], query: str) -> List[Tuple[str, str, str]]:
+    """ all words must match - returns (file, name, refpurpose) with name matches first """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return []
+    named: Optional[Set[int]] = None
+    texted: Optional[Set[int]] = None
+    for word in words:
+        names = search_names(index, word)
+        named = names if named is None else named & names
+        texts = names | search_text(index, word)
+        texted = texts if texted is None else texted & texts
+    results = []
+    for docnum in sorted(named or set()) + sorted((texted or set()) - (named or set())):
+        filename, refnames, refpurpose = index["docs"][docnum]
+        results.append((filename, refnames[0], refpurpose))
+    return results
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    _o = OptionParser("%prog [options] words...")
+    _o.add_option("-d","--index", metavar="FILE", default=".",
+        help="the searchindex.json or its html directory [%default]")
+    _o.add_option("-v","--verbose", action="count", default=0,
+        help="increase logging level [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level = max(0, logging.WARNING - 10 * opt.verbose))
+    index = load_searchindex(opt.index)
+    for filename, name, refpurpose in search(index, " ".join(args)):
+        print("%s - %s (%s)" % (name, refpurpose, filename))
@@ -1,11 +1,19 @@
 #! /usr/bin/python3
 import toolstestpath  # noqa
 from tools import md2dbk
+from tools import dbk2man
+from tools import dir2index
+from tools import refsearch
+from tools import mdhtm
 from unittest import TestCase, TestSuite, TextTestRunner, main
 from fnmatch import fnmatchcase as matches
+from typing import Dict, Tuple
 
 import os
 import sys
+import shutil
+import random
+import subprocess
 import logging
 logg = logging.getLogger("TOOLS")
 
@@ -337,6 +345,186 @@ class md2dbkTests(TestCase):
         b = md2dbk.blocks("> ###### a\n>\n>\n> ## b")
         self.assertEqual(b, ["<blockquote>", "###### a\n", "## b\n", "</blockquote>"])
 
+DBK_SAMPLE = """<reference><title>sample Function List</title>
+<refentry>
+<refentryinfo><date>0.1</date><productname>sample</productname></refentryinfo>
+<refmeta><refentrytitle>sample_open</refentrytitle><manvolnum>3</manvolnum></refmeta>
+<refnamediv>
+ <refname>sample_open</refname>
+ <refname>sample_close</refname>
+ <refpurpose>start and stop usage</refpurpose>
+</refnamediv>
+<refsynopsisdiv><funcsynopsis>
+<funcsynopsisinfo>#include &lt;sample.h&gt;</funcsynopsisinfo>
+<funcprototype><funcdef>int sample_open</funcdef><paramdef>(char* name)</paramdef></funcprototype>
+</funcsynopsis></refsynopsisdiv>
+<refsect1><title>Description</title><para>The <function>sample_open</function> call.</para></refsect1>
+</refentry>
+</reference>
+"""
+
+class dbk2manTests(TestCase):
+    def testdir(self) -> str:
+        newdir = "tmp." + self.id().split(".")[-1]
+        if os.path.isdir(newdir):
+            shutil.rmtree(newdir)
+        os.makedirs(newdir)
+        return newdir
+    def rm_testdir(self) -> None:
+        newdir = "tmp." + self.id().split(".")[-1]
+        if os.path.isdir(newdir):
+            shutil.rmtree(newdir)
+    def mkfile(self, filename: str, text: str) -> str:
+        with open(filename, "w") as f:
+            f.write(text)
+        return filename
+    def test_5001(self) -> None:
+        tmp = self.testdir()
+        dbk = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2man.dbks2(["man", "html"], [dbk], mandir=tmp + "/man", htmldir=tmp + "/html")
+        self.assertTrue(os.path.exists(tmp + "/man/man3/sample_open.3"))
+        self.assertTrue(os.path.exists(tmp + "/man/man3/sample_close.3"))
+        self.assertTrue(os.path.exists(tmp + "/html/sample_open.3.html"))
+        self.assertTrue(os.path.exists(tmp + "/html/sample.html"))
+        self.assertFalse(os.path.exists(tmp + "/html/index.html"))
+        self.rm_testdir()
+    def test_5002(self) -> None:
+        tmp = self.testdir()
+        dbk1 = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2 = self.mkfile(os.path.join(tmp, "other.xml"), DBK_SAMPLE.replace("sample", "other"))
+        dbk2man.dbks2(["html"], [dbk1, dbk2], tmp + "/html", index=True)
+        index = open(tmp + "/html/index.html").read()
+        self.assertIn('<li><a href="sample.html"><h4>sample</h4></a></li>', index)
+        self.assertIn('<li><a href="sample_open.3.html">sample_open</a> - start and stop usage</li>', index)
+        self.assertIn('<li><a href="other.html"><h4>other</h4></a></li>', index)
+        self.assertLess(index.index("sample_open"), index.index("other_open"))
+        self.rm_testdir()
+    def test_5003(self) -> None:
+        tmp = self.testdir()
+        dbk = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2man.dbk2("", [dbk], tmp + "/html1")
+        dbk2man.dbks2(["html"], [dbk], tmp + "/html2")
+        for filename in ["sample.html", "sample_open.3.html"]:
+            text1 = open(os.path.join(tmp, "html1", filename)).read()
+            text2 = open(os.path.join(tmp, "html2", filename)).read()
+            self.assertEqual(text1, text2)
+        self.rm_testdir()
+    def test_5011(self) -> None:
+        tmp = self.testdir()
+        dbk = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2man.dbks2(["html"], [dbk], tmp + "/html")
+        manifest = os.path.join(tmp, "html", ".sample.overview")
+        self.assertTrue(os.path.exists(manifest))
+        items = list(dir2index.read_manifest(manifest))
+        self.assertEqual(items, [("sample_open.3.html",
+                                  '<li><a href="sample_open.3.html">sample_open</a> - start and stop usage</li>')])
+        self.rm_testdir()
+    def test_5012(self) -> None:
+        tmp = self.testdir()
+        dbk = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2man.dbks2(["html"], [dbk], tmp + "/html", index=True)
+        index0 = open(tmp + "/html/index.html").read()
+        os.remove(tmp + "/html/index.html")
+        dir2index.dir2("", [tmp + "/html"], tmp + "/html")
+        index1 = open(tmp + "/html/index.html").read()
+        self.assertEqual(index0, index1)
+        os.remove(tmp + "/html/index.html")
+        os.remove(tmp + "/html/.sample.overview")
+        dir2index.dir2("", [tmp + "/html"], tmp + "/html")
+        index2 = open(tmp + "/html/index.html").read()
+        self.assertEqual(index0, index2)
+        self.rm_testdir()
+    def test_5021(self) -> None:
+        tmp = self.testdir()
+        dbk1 = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2 = self.mkfile(os.path.join(tmp, "other.xml"), DBK_SAMPLE.replace("sample", "other").replace("call", "thing"))
+        dbk2man.dbks2(["html"], [dbk1, dbk2], tmp + "/html", search=True)
+        index = refsearch.load_searchindex(tmp + "/html")
+        self.assertEqual(index["docs"], [["other_open.3.html", ["other_open", "other_close"], "start and stop usage"],
+                                         ["sample_open.3.html", ["sample_open", "sample_close"], "start and stop usage"]])
+        self.assertEqual(refsearch.search(index, "sample_cl"), [("sample_open.3.html", "sample_open", "start and stop usage")])
+        self.assertEqual(refsearch.search(index, "thing"), [("other_open.3.html", "other_open", "start and stop usage")])
+        self.assertEqual(len(refsearch.search(index, "usage")), 2)
+        self.assertEqual(refsearch.search(index, "usage call"), [
+                         ("sample_open.3.html", "sample_open", "start and stop usage")])
+        self.assertEqual(refsearch.search(index, "nothing"), [])
+        self.rm_testdir()
+    def test_5022(self) -> None:
+        tmp = self.testdir()
+        dbk = self.mkfile(os.path.join(tmp, "sample.xml"), DBK_SAMPLE)
+        dbk2man.dbks2(["man"], [dbk], tmp + "/man", search=True)
+        self.assertFalse(os.path.exists(tmp + "/man/searchindex.json"))
+        self.rm_testdir()
+
+class mdhtmTests(TestCase):
+    def mdhtm_lines(self, text: str) -> str:
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines = lines[:-1]
+        return "".join([mdhtm.mdhtm_line(line.rstrip()) + "\n" for line in lines if text])
+    def test_6001(self) -> None:
+        self.assertEqual(mdhtm.mdhtm(""), "")
+        self.assertEqual(mdhtm.mdhtm("a"), "a\n")
+        self.assertEqual(mdhtm.mdhtm("a  \nb\t\n"), "a\nb\n")
+    def test_6002(self) -> None:
+        text = "x `a` <tt>b</tt> <tt>`c`</tt> `d\n"
+        self.assertEqual(mdhtm.mdhtm(text), "x <code>a</code> <code>b</code> <code>c</code> `d\n")
+    def test_6003(self) -> None:
+        text = "<BLOCKQUOTE><ul><nobr><li>a</li></ul></BLOCKQUOTE><H2>b</H2><p>&nbsp;</p>"
+        self.assertEqual(mdhtm.mdhtm(text), "<blockquote>\n<ul>\n<li>a</li>\n</ul>\n</blockquote><h2>b</h2>\n")
+        self.assertEqual(mdhtm.mdhtm(text), self.mdhtm_lines(text))
+    def test_6004(self) -> None:
+        random.seed(6004)
+        parts = mdhtm.MARKUPS + ["`", "`", "a", "b c", " ", "\t", "\n", "<p>&nbsp;</p>"]
+        for attempt in range(2000):
+            text = "".join([random.choice(parts) for _ in range(random.randint(0, 20))])
+            self.assertEqual(mdhtm.mdhtm(text), self.mdhtm_lines(text), repr(text))
+    def test_6005(self) -> None:
+        docs = os.path.dirname(os.path.abspath(__file__))
+        for filename in sorted(os.listdir(docs)):
+            if filename.endswith(".htm.md"):
+                text = open(os.path.join(docs, filename)).read()
+                self.assertEqual(mdhtm.mdhtm(text), self.mdhtm_lines(text), filename)
+
+# microseconds for all zzipdoc modules of makedocs - by default it is relative to the
+# cost of "import re" on the same machine (compiling all the regex at import time would
+# show), the environment can set a fixed budget (e.g. 60000) instead
+ZZIPDOC_IMPORTTIME_BUDGET = int(os.environ.get("ZZIPDOC_IMPORTTIME_BUDGET", "0") or "0")
+ZZIPDOC_IMPORTTIME_RELATIVE = 3
+
+class importtimeTests(TestCase):
+    def python(self, code: str, *options: str) -> "subprocess.CompletedProcess[str]":
+        docs = os.path.dirname(os.path.abspath(__file__))
+        cmd = [sys.executable] + list(options) + ["-c", code]
+        return subprocess.run(cmd, cwd=docs, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    def importtime(self, code: str) -> Dict[str, Tuple[int, int]]:
+        """ the self and cumulative microseconds of each module imported by the code """
+        run = self.python(code, "-X", "importtime")
+        self.assertEqual(run.returncode, 0, run.stderr)
+        times: Dict[str, Tuple[int, int]] = {}
+        for line in run.stderr.splitlines():
+            if line.startswith("import time:"):
+                fields = line.split(":", 1)[1].split("|")
+                if fields[0].strip().isdigit():
+                    times[fields[-1].strip()] = (int(fields[0]), int(fields[1]))
+        return times
+    def test_7001(self) -> None:
+        times = self.importtime("import makedocs")
+        selftime = sum([took for name, (took, _) in times.items() if name.split(".")[0] == "zzipdoc"])
+        budget = ZZIPDOC_IMPORTTIME_BUDGET
+        if not budget:
+            budget = ZZIPDOC_IMPORTTIME_RELATIVE * self.importtime("import re")["re"][1]
+        logg.info("zzipdoc importtime %sus (budget %sus)", selftime, budget)
+        self.assertGreater(selftime, 0)
+        self.assertLess(selftime, budget)
+    def test_7002(self) -> None:
+        run = self.python("import makedocs; from zzipdoc import htm2dbk; "
+                          "print(htm2dbk.htm2dbk_conversion_base._regexlist is None); "
+                          "print(htm2dbk.html2docbook('<code>x</code>')); "
+                          "print(htm2dbk.htm2dbk_conversion_base._regexlist is None)")
+        self.assertEqual(run.returncode, 0, run.stderr)
+        self.assertEqual(run.stdout.splitlines(), ["True", "<literal>x</literal>", "False"])
+
 if __name__ == "__main__":
     # main()
     import optparse
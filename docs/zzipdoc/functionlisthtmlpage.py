@@ -1,7 +1,6 @@
 from __future__ import print_function
 
 from typing import Optional, List
-from zzipdoc.options import *
 from zzipdoc.match import Match
 from zzipdoc.options import DocOptions
 from zzipdoc.functionprototype import FunctionPrototype
@@ -3,7 +3,7 @@
 from __future__ import print_function
 from typing import Optional, List
 from zzipdoc.match import Match
-from zzipdoc.htm2dbk import *
+from zzipdoc.htm2dbk import html2docbook
 from zzipdoc.options import DocOptions
 from zzipdoc.functionprototype import FunctionPrototype
 from zzipdoc.htmldoctypes import RefDocPart
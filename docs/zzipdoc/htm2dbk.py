@@ -6,15 +6,14 @@ The mapping of markups and links is far from perfect. But all we
 want is the docbook-to-pdf converter and similar technology being
 present in the world of docbook-to-anything converters. """
 
-from typing import Iterable
-from datetime import date
-from zzipdoc.match import Match
+from typing import Iterable, List, Optional
+from zzipdoc.match import Match, MatchReplace
 import sys
 
 m = Match
 
-class htm2dbk_conversion_base:
-    regexlist = [
+def htm2dbk_regexlist() -> List[MatchReplace]:
+    return [
         m()("</[hH]2>(.*)", "m") >> "</title>\n<subtitle>\\1</subtitle>",
         m()("<[hH]2>") >> "<sect1 id=\"--filename--\"><title>",
         m()("<[Pp]([> ])","m") >> "<para\\1",
@@ -83,7 +82,8 @@ class htm2dbk_conversion_base:
         # m()("(</?)subtitle>") >> "\\1para>"
         # $_ .= "</sect1>" if /<sect1[> ]/
         ]
-    regexlist2 = [
+def htm2dbk_regexlist2() -> List[MatchReplace]:
+    return [
         m()(r"<br\s*/?>") >> "",
         m()(r"(</?)em>") >> r"\1emphasis>",
         m()(r"<code>") >> "<userinput>",
@@ -100,6 +100,21 @@ class htm2dbk_conversion_base:
         m()(r"<li>") >> "<listitem><para>",
         m()(r"</li>") >> "</para></listitem>\n",
         ]
+
+class htm2dbk_conversion_base:
+    """ the regex rules are compiled on first use, not already at import time """
+    _regexlist: Optional[List[MatchReplace]] = None
+    _regexlist2: Optional[List[MatchReplace]] = None
+    @property
+    def regexlist(self) -> List[MatchReplace]:
+        if htm2dbk_conversion_base._regexlist is None:
+            htm2dbk_conversion_base._regexlist = htm2dbk_regexlist()
+        return htm2dbk_conversion_base._regexlist
+    @property
+    def regexlist2(self) -> List[MatchReplace]:
+        if htm2dbk_conversion_base._regexlist2 is None:
+            htm2dbk_conversion_base._regexlist2 = htm2dbk_regexlist2()
+        return htm2dbk_conversion_base._regexlist2
 class htm2dbk_conversion(htm2dbk_conversion_base):
     def __init__(self) -> None:
         self.version = "" # str(date.today)
@@ -0,0 +1,140 @@
+#! /usr/bin/env python3
+""" An asyncio reader over the ctypes binding - the entries of one mapped archive
+    are streamed with "async for chunk in archive.stream(name)". All streams share
+    the same ZZIP_DISK (from zzip_disk_buffer over a mapping, see ZZipMapped) and
+    each has its own ZZIP_DISK_FILE. The blocking zzip_disk_entry_fopen and
+    zzip_disk_fread calls run in a bounded thread pool. A stream reads ahead a
+    few chunks into a bounded queue - a slow consumer stops the reading. The
+    chunks are memoryviews into a ring of buffers of the stream, each is valid
+    until the next chunk is taken (use bytes(chunk) to keep it). """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Any, AsyncGenerator, Union
+import asyncio
+import concurrent.futures
+import ctypes
+import errno
+import itertools
+import logging
+import os
+import sys
+
+from zzipctypes import ZZipMapped, ZZipError, errno_error, READSIZE
+
+logg = logging.getLogger("zzipaio")
+
+WORKERS = 4
+READAHEAD = 2
+
+class AsyncZZip:
+    """ the archive is mapped and indexed on open - use "async with" or close() """
+    def __init__(self, filename: str, bins: Optional[str] = None,
+                 workers: int = WORKERS, readahead: int = READAHEAD) -> None:
+        self.zipped = ZZipMapped(filename, bins)
+        self.zipped.index()  # the findfile of the streams are then read-only on the disk
+        self.lib = self.zipped.lib
+        self.filename = filename
+        self.readahead = max(1, readahead)
+        self.pool: Optional[concurrent.futures.ThreadPoolExecutor] = \
+            concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="zzipaio")
+        self.streams = 0
+    def close(self) -> None:
+        if self.streams:
+            raise ZZipError(errno.EBUSY, "%i streams are open" % self.streams, self.filename)
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.zipped.close()
+    async def __aenter__(self) -> "AsyncZZip":
+        return self
+    async def __aexit__(self, *exc: Any) -> None:
+        self.close()
+    def names(self) -> List[str]:
+        return self.zipped.names()
+    def fopen(self, name: str) -> int:
+        entry = self.lib.zzip_disk_findfile(self.zipped.disk, os.fsencode(name), None, None)
+        if not entry:
+            raise ZZipError(errno.ENOENT, "zzip_disk_findfile %s: not found" % name, self.filename)
+        fp: int = self.lib.zzip_disk_entry_fopen(self.zipped.disk, entry)
+        if not fp:
+            raise errno_error("zzip_disk_entry_fopen %s" % name, self.filename)
+        return fp
+    def fread(self, fp: int, buf: Any) -> int:
+        """ into the preallocated ctypes buffer - the number of bytes """
+        done: int = self.lib.zzip_disk_fread(buf, 1, len(buf), fp)
+        return done
+    async def stream(self, name: str, chunk_size: int = READSIZE) -> AsyncGenerator[memoryview, None]:
+        """ the chunks of the (uncompressed) entry - call its aclose() when breaking
+            out early, so that the file is closed right away """
+        pool = self.pool
+        if pool is None:
+            raise ZZipError(errno.EBADF, "closed", self.filename)
+        loop = asyncio.get_running_loop()
+        opening = loop.run_in_executor(pool, self.fopen, name)
+        try:
+            fp = await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            opening.add_done_callback(lambda done: done.exception() or self.lib.zzip_disk_fclose(done.result()))
+            raise
+        self.streams += 1
+        queue: "asyncio.Queue[Union[memoryview, BaseException]]" = asyncio.Queue(self.readahead)
+        # the queue, the one being filled and the one the consumer holds
+        buffers = [ctypes.create_string_buffer(chunk_size) for _ in range(self.readahead + 2)]
+        views = [memoryview(buf).cast("B") for buf in buffers]
+        reading: "Optional[concurrent.futures.Future[int]]" = None
+        async def produce() -> None:
+            nonlocal reading
+            try:
+                for turn in itertools.count():
+                    slot = turn % len(buffers)
+                    reading = pool.submit(self.fread, fp, buffers[slot])
+                    done = await asyncio.wrap_future(reading)
+                    await queue.put(views[slot][:done])
+                    if not done:
+                        break
+            except Exception as e:
+                await queue.put(e)
+        producer = loop.create_task(produce())
+        try:
+            while True:
+                chunk = await queue.get()
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            producer.cancel()  # in its queue.put or waiting for a fread
+            await asyncio.wait([producer])
+            if reading is not None:
+                await asyncio.wait([asyncio.wrap_future(reading)])  # the fread must be done with the fp
+            await loop.run_in_executor(pool, self.lib.zzip_disk_fclose, fp)
+            self.streams -= 1
+    async def read(self, name: str, chunk_size: int = READSIZE) -> bytes:
+        data = bytearray()
+        async for chunk in self.stream(name, chunk_size):
+            data += chunk
+        return bytes(data)
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] zipfile [names...]")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("-j", "--workers", metavar="N", type="int", default=WORKERS,
+                  help="threads for the blocking calls [%default]")
+    _o.add_option("--chunk", metavar="SIZE", type="int", default=READSIZE,
+                  help="bytes per chunk [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if not args:
+        _o.error("no zipfile given")
+    async def main() -> None:
+        async with AsyncZZip(args[0], opt.bindir, opt.workers) as archive:
+            for name in args[1:] or archive.names():
+                async for chunk in archive.stream(name, opt.chunk):
+                    sys.stdout.buffer.write(chunk)
+    asyncio.run(main())
@@ -0,0 +1,785 @@
+#! /usr/bin/env python3
+""" Benchmarks for the zziplib access strategies. The archives are generated
+    into the --benchdir and each binary is run with its output to /dev/null,
+    taking the child's resource usage via os.wait4. The results are JSON -
+    note that a maxrss_kb near the maxrss_floor_kb (the RSS of the python
+    process that forked it) is not significant. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, Tuple, List, Dict, Type, Union, Any, Iterator
+import collections
+import logging
+import csv
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import zipfile
+
+logg = logging.getLogger("bench")
+
+bindir = os.path.join("..", "bins")
+exeext = ""
+benchdir = "tmp.bench"
+WARMUP = 1
+REPEAT = 5
+ZZCAT_MAX = 1000
+TRUE = "/bin/true"
+
+# the unzzipcat variants - stdio "big" via fseeko, memdisk "mem", mmapped "mix"
+# and the classic zzip_dir "zap" - and zzcat on top of the zzip_open magic.
+CATTOOLS = ["unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzcat"]
+LISTTOOLS = ["unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzdir"]
+LISTSIZE = 16
+LOOKUPS = 200
+LOOKUPSEED = 1234567
+FINDAPIS = ["disk", "mem"]
+FINDLINEAR = 20  # the linear search is slow on big archives
+TOOLNAMES = {"unzzip": "unzzip-zap"}
+EXTRACTJOBS = [1, 4]
+AIOSTREAMS = [1, 8, 32]
+SERVEREQUESTS = 2000
+SERVECLIENTS = [1, 8]
+AIOTICK = 0.001
+COMPRESSIONS = {"stored": zipfile.ZIP_STORED, "deflated": zipfile.ZIP_DEFLATED}
+
+Measure = collections.namedtuple("Measure", ["returncode", "wall", "user", "sys", "maxrss", "inblock", "oublock"])
+
+def bins(name: str) -> str:
+    exe = os.path.join(bindir, name)
+    if exeext: exe += exeext
+    return exe
+
+def toolname(name: str) -> str:
+    return TOOLNAMES.get(name, name)
+
+def tool_env(exe: str) -> Dict[str, str]:
+    """ LD_LIBRARY_PATH to the zzip/.libs of the build tree (like zziptests.shell) """
+    env = os.environ.copy()
+    build_lib = os.path.dirname(os.path.realpath(exe))
+    for up in range(3):
+        libs = os.path.join(build_lib, "zzip", ".libs")
+        if os.path.isdir(libs):
+            env["LD_LIBRARY_PATH"] = libs
+            break
+        build_lib = os.path.dirname(build_lib)
+    return env
+
+def maxrss_floor() -> int:
+    """ the ru_maxrss of a forked /bin/true - any child's ru_maxrss starts from there """
+    if not os.path.exists(TRUE):
+        return 0
+    return int(measured([TRUE]).maxrss)
+
+def exitcode(status: int) -> int:
+    """ the returncode of a wait status (os.waitstatus_to_exitcode is python 3.9) """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def measured(cmd: List[str], env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> Measure:
+    """ run the command with its output to /dev/null and take its rusage.
+        A plain fork is used as the ru_maxrss after a vfork/posix_spawn
+        would start at the peak RSS of this python process. """
+    null = os.open(os.devnull, os.O_WRONLY)
+    started = time.perf_counter()
+    pid = os.fork()
+    if not pid:
+        try:
+            os.dup2(null, 1)
+            os.dup2(null, 2)
+            if cwd:
+                os.chdir(cwd)
+            os.execve(cmd[0], cmd, env if env is not None else os.environ)
+        finally:
+            os._exit(127)
+    _, status, usage = os.wait4(pid, 0)
+    wall = time.perf_counter() - started
+    os.close(null)
+    return Measure(exitcode(status), wall, usage.ru_utime, usage.ru_stime,
+                   usage.ru_maxrss, usage.ru_inblock, usage.ru_oublock)
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    half = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[half]
+    return (ordered[half - 1] + ordered[half]) / 2
+
+def percentile(values: List[float], percent: float) -> float:
+    """ nearest-rank percentile """
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100. * len(ordered)))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+def repeated(cmd: List[str], warmup: int = WARMUP, repeat: int = REPEAT) -> Dict[str, Any]:
+    """ the summary of the measured repetitions (after the warmup runs) """
+    env = tool_env(cmd[0])
+    for _ in range(warmup):
+        measured(cmd, env)
+    runs = [measured(cmd, env) for _ in range(max(1, repeat))]
+    failed = [run.returncode for run in runs if run.returncode]
+    if failed:
+        logg.warning("EXIT %s: %s", failed[0], " ".join(cmd[:3]))
+    walls = [run.wall for run in runs]
+    return {"returncode": failed and failed[0] or 0, "repeat": len(runs),
+            "wall": walls, "wall_min": min(walls), "wall_median": median(walls),
+            "user": median([run.user for run in runs]), "sys": median([run.sys for run in runs]),
+            "maxrss_kb": max([run.maxrss for run in runs]), "maxrss_floor_kb": maxrss_floor(),
+            "inblock": max([run.inblock for run in runs]), "oublock": max([run.oublock for run in runs])}
+
+def entrynames(entries: int) -> Iterator[str]:
+    """ spread into subdirectories of 1000 entries """
+    for num in range(entries):
+        if entries > 1000:
+            yield "dir%04i/file%07i.txt" % (num // 1000, num)
+        else:
+            yield "file%04i.txt" % num
+
+def make_archive(entries: int, size: int, compression: str = "deflated") -> str:
+    """ generate (or reuse) an archive with that many entries of the same size """
+    archive = os.path.join(benchdir, "bench-%i-%i-%s.zip" % (entries, size, compression))
+    if os.path.exists(archive):
+        return archive
+    if not os.path.isdir(benchdir):
+        os.makedirs(benchdir)
+    started = time.time()
+    # generated in a child process - to keep the RSS of this process low
+    pid = os.fork()
+    if not pid:
+        tmpfile = archive + ".tmp%i" % os.getpid()
+        try:
+            from zziptests import gentext
+            content = gentext(size).encode("ascii")
+            with zipfile.ZipFile(tmpfile, "w", COMPRESSIONS[compression]) as zipped:
+                for name in entrynames(entries):
+                    zipped.writestr(name, content)
+            os.replace(tmpfile, archive)
+        except BaseException as e:
+            logg.error("generating %s: %s", archive, e)
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            os._exit(1)
+        os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    if status or not os.path.exists(archive):
+        raise OSError("could not generate %s (exit %i)" % (archive, exitcode(status)))
+    logg.info("generated %s in %.3fs", archive, time.time() - started)
+    return archive
+
+def listed(cmd: List[str], suffix: str = ".txt") -> int:
+    """ run once more to count the entries really listed - zip64 archives
+        (over 65535 entries) may come out empty without an error code """
+    run = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=tool_env(cmd[0]))
+    return len([line for line in run.stdout.split(b"\n") if line.rstrip().endswith(suffix.encode("ascii"))])
+
+def archive_names(archive: str) -> List[str]:
+    with zipfile.ZipFile(archive) as zipped:
+        return [info.filename for info in zipped.infolist() if not info.is_dir()]
+
+def throughput(entries: List[int], sizes: List[int], compressions: List[str],
+               tools: List[str] = CATTOOLS, maxbytes: int = 0,
+               warmup: int = WARMUP, repeat: int = REPEAT) -> List[Dict[str, Any]]:
+    """ extract all entries of each archive to /dev/null """
+    results: List[Dict[str, Any]] = []
+    for compression in compressions:
+        for count in entries:
+            for size in sizes:
+                if maxbytes and count * size > maxbytes:
+                    logg.info("skipping %i x %i (over maxbytes)", count, size)
+                    continue
+                archive = make_archive(count, size, compression)
+                for tool in tools:
+                    exe = bins(tool)
+                    if not os.path.exists(exe):
+                        logg.warning("no %s", exe)
+                        continue
+                    done = count
+                    if tool == "zzcat":
+                        # zzcat opens each member by path - dir/archive/member
+                        names = archive_names(archive)[:ZZCAT_MAX]
+                        done = len(names)
+                        cmd = [exe] + [os.path.join(archive[:-len(".zip")], name) for name in names]
+                    else:
+                        cmd = [exe, "-p", archive]
+                    result = repeated(cmd, warmup, repeat)
+                    wall = result["wall_median"] or 1e-9
+                    result.update({"tool": toolname(tool), "archive": archive, "compression": compression,
+                                   "entries": done, "size": size, "bytes": done * size,
+                                   "mb_per_s": done * size / wall / 1000000, "entries_per_s": done / wall})
+                    logg.info("%s %s: %.1f MB/s, %.0f entries/s, %i KB maxrss", toolname(tool), archive,
+                              result["mb_per_s"], result["entries_per_s"], result["maxrss_kb"])
+                    results.append(result)
+    return results
+
+def listing(entries: List[int], tools: List[str] = LISTTOOLS, size: int = LISTSIZE,
+            warmup: int = WARMUP, repeat: int = REPEAT) -> List[Dict[str, Any]]:
+    """ list the central directory of archives with many (small stored) entries """
+    results: List[Dict[str, Any]] = []
+    for count in entries:
+        archive = make_archive(count, size, "stored")
+        for tool in tools:
+            exe = bins(tool)
+            if not os.path.exists(exe):
+                logg.warning("no %s", exe)
+                continue
+            if tool == "zzdir":
+                cmd = [exe, archive[:-len(".zip")]]
+            else:
+                cmd = [exe, "-l", archive]
+            result = repeated(cmd, warmup, repeat)
+            wall = result["wall_median"] or 1e-9
+            result.update({"tool": toolname(tool), "archive": archive, "entries": count,
+                           "listed": listed(cmd), "us_per_entry": wall / count * 1000000, "entries_per_s": count / wall})
+            logg.info("%s %s: %.3fs, %.2f us/entry, %i KB maxrss", toolname(tool), archive,
+                      wall, result["us_per_entry"], result["maxrss_kb"])
+            if result["listed"] != count:
+                logg.warning("%s %s: listed %i of %i entries", toolname(tool), archive, result["listed"], count)
+            results.append(result)
+    return results
+
+def lookup(entries: int, size: int = 1024, lookups: int = LOOKUPS, tools: List[str] = CATTOOLS,
+           warmup: int = WARMUP, seed: int = LOOKUPSEED) -> List[Dict[str, Any]]:
+    """ open the archive and fetch one named member - the same random names for each tool.
+        The startup of each tool (its --version) is measured as well to see the lookup part. """
+    archive = make_archive(entries, size, "deflated")
+    names = random.Random(seed).sample(archive_names(archive), min(lookups, entries))
+    results: List[Dict[str, Any]] = []
+    for tool in tools:
+        exe = bins(tool)
+        if not os.path.exists(exe):
+            logg.warning("no %s", exe)
+            continue
+        env = tool_env(exe)
+        def command(name: str) -> List[str]:
+            if tool == "zzcat":
+                return [exe, os.path.join(archive[:-len(".zip")], name)]
+            return [exe, "-p", archive, name]
+        for name in names[:warmup]:
+            measured(command(name), env)
+        startups = [measured([exe, "--version"], env).wall for _ in names]
+        runs = [measured(command(name), env) for name in names]
+        walls = [run.wall for run in runs]
+        failed = [run.returncode for run in runs if run.returncode]
+        result = {"tool": toolname(tool), "archive": archive, "entries": entries, "lookups": len(runs),
+                  "returncode": failed and failed[0] or 0, "failed": len(failed),
+                  "p50": percentile(walls, 50), "p90": percentile(walls, 90), "p99": percentile(walls, 99),
+                  "max": max(walls), "startup_p50": percentile(startups, 50),
+                  "maxrss_kb": max([run.maxrss for run in runs]), "maxrss_floor_kb": maxrss_floor()}
+        result["lookup_p50"] = result["p50"] - result["startup_p50"]
+        logg.info("%s %s: p50 %.3fms p99 %.3fms (startup %.3fms)", toolname(tool), archive,
+                  result["p50"] * 1000, result["p99"] * 1000, result["startup_p50"] * 1000)
+        results.append(result)
+    return results
+
+def timed_lookups(findfile: Any, names: List[str]) -> Tuple[List[float], int]:
+    """ the wall time of each findfile call - and the number of names found """
+    walls = []
+    found = 0
+    for name in names:
+        started = time.perf_counter()
+        entry = findfile(name)
+        walls.append(time.perf_counter() - started)
+        if entry:
+            found += 1
+    return walls, found
+
+def findfile(entries: List[int], lookups: int = LOOKUPS, apis: List[str] = FINDAPIS,
+             linear: int = FINDLINEAR, seed: int = LOOKUPSEED) -> List[Dict[str, Any]]:
+    """ in-process lookup latency through the ctypes binding - the linear search of
+        zzip_disk_findfile / zzip_mem_disk_findfile against the one after *_index.
+        The "visible" entries show the archives where zziplib misses the zip64 part. """
+    import zzipctypes
+    opens: Dict[str, Union[Type[zzipctypes.ZZipDisk], Type[zzipctypes.ZZipMemDisk]]] = {
+        "disk": zzipctypes.ZZipDisk, "mem": zzipctypes.ZZipMemDisk}
+    results: List[Dict[str, Any]] = []
+    for count in entries:
+        archive = make_archive(count, LISTSIZE, "stored")
+        names = random.Random(seed).sample(archive_names(archive), min(lookups, count))
+        for api in apis:
+            started = time.perf_counter()
+            zipped = opens[api](archive, bindir)
+            opened = time.perf_counter() - started
+            visible = len(zipped.names())
+            linear_walls, linear_found = timed_lookups(zipped.findfile, names[:linear])
+            started = time.perf_counter()
+            zipped.index()
+            indexing = time.perf_counter() - started
+            index_walls, index_found = timed_lookups(zipped.findfile, names)
+            zipped.close()
+            result: Dict[str, Any] = {"api": api, "archive": archive, "entries": count, "visible": visible, "open": opened,
+                                      "index": indexing, "lookups": len(index_walls), "found": index_found,
+                                      "linear_lookups": len(linear_walls), "linear_found": linear_found,
+                                      "linear_p50": percentile(linear_walls, 50), "linear_p99": percentile(linear_walls, 99),
+                                      "index_p50": percentile(index_walls, 50), "index_p99": percentile(index_walls, 99)}
+            result["speedup_p50"] = result["linear_p50"] / (result["index_p50"] or 1e-9)
+            logg.info("%s %s: linear p50 %.3fms, indexed p50 %.3fus (index %.3fs, %i of %i visible)",
+                      api, archive, result["linear_p50"] * 1000, result["index_p50"] * 1000000,
+                      indexing, visible, count)
+            if visible != count:
+                logg.warning("%s %s: only %i of %i entries visible", api, archive, visible, count)
+            results.append(result)
+    return results
+
+def extraction(entries: List[int], sizes: List[int], archives: List[str] = [], jobs: List[int] = EXTRACTJOBS,
+               maxbytes: int = 0, warmup: int = WARMUP, repeat: int = REPEAT) -> List[Dict[str, Any]]:
+    """ extract all entries into an empty directory - unzzip one after another
+        against zzipextract.py with worker threads over the libzzipmmapped binding """
+    import shutil
+    results: List[Dict[str, Any]] = []
+    archives = [os.path.abspath(archive) for archive in archives]
+    for count in entries:
+        for size in sizes:
+            if maxbytes and count * size > maxbytes:
+                logg.info("skipping %i x %i (over maxbytes)", count, size)
+                continue
+            archives.append(os.path.abspath(make_archive(count, size, "deflated")))
+    outdir = os.path.abspath(os.path.join(benchdir, "extracted"))
+    extractor = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipextract.py")
+    unzzip = os.path.abspath(bins("unzzip"))
+    env = tool_env(unzzip)
+    for archive in archives:
+        with zipfile.ZipFile(archive) as zipped:
+            infos = [info for info in zipped.infolist() if not info.is_dir()]
+        done = sum([info.file_size for info in infos])
+        tools: List[Tuple[str, List[str]]] = [("unzzip", [unzzip, archive])]
+        for threads in jobs:
+            tools.append(("zzipextract-j%i" % threads, [sys.executable, extractor, "-b", os.path.abspath(bindir),
+                                                        "-j", str(threads), "-d", outdir, archive]))
+        for tool, cmd in tools:
+            runs = []
+            for num in range(warmup + max(1, repeat)):
+                if os.path.isdir(outdir):
+                    shutil.rmtree(outdir)
+                os.makedirs(outdir)
+                run = measured(cmd, env, outdir)
+                if num >= warmup:
+                    runs.append(run)
+            failed = [run.returncode for run in runs if run.returncode]
+            if failed:
+                logg.warning("EXIT %s: %s %s", failed[0], tool, archive)
+            wall = median([run.wall for run in runs]) or 1e-9
+            result = {"tool": tool, "archive": archive, "entries": len(infos), "bytes": done,
+                      "returncode": failed and failed[0] or 0, "repeat": len(runs), "wall_median": wall,
+                      "user": median([run.user for run in runs]), "sys": median([run.sys for run in runs]),
+                      "maxrss_kb": max([run.maxrss for run in runs]), "mb_per_s": done / wall / 1000000}
+            logg.info("%s %s: %.1f MB/s (%.3fs)", tool, archive, result["mb_per_s"], wall)
+            results.append(result)
+    if os.path.isdir(outdir):
+        shutil.rmtree(outdir)
+    return results
+
+async def aio_streams(archive: str, names: List[str], streams: int, blocking: bool = False,
+                      tick: float = AIOTICK) -> Dict[str, Any]:
+    """ read the names with that many concurrent streams while a ticker measures
+        how late the event loop wakes it up - blocking reads in the loop for comparison """
+    import asyncio
+    import zzipaio
+    import zzipctypes
+    lateness: List[float] = []
+    done = 0
+    finished = False
+    async def ticker() -> None:
+        while not finished:
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lateness.append(time.perf_counter() - started - tick)
+    pending = list(names)
+    async with zzipaio.AsyncZZip(archive, bindir, max(1, min(streams, os.cpu_count() or 1) * 2)) as opened:
+        blocked = zzipctypes.ZZipDisk(archive, bindir) if blocking else None
+        async def reader() -> None:
+            nonlocal done
+            while pending:
+                name = pending.pop()
+                if blocked is not None:
+                    done += len(blocked.read(name))
+                    await asyncio.sleep(0)
+                else:
+                    async for chunk in opened.stream(name):
+                        done += len(chunk)
+        ticking = asyncio.get_running_loop().create_task(ticker())
+        await asyncio.sleep(tick)
+        started = time.perf_counter()
+        await asyncio.gather(*[reader() for _ in range(streams)])
+        wall = time.perf_counter() - started
+        finished = True
+        await ticking
+        if blocked is not None:
+            blocked.close()
+    return {"streams": streams, "blocking": blocking, "bytes": done, "wall": wall,
+            "mb_per_s": done / (wall or 1e-9) / 1000000, "ticks": len(lateness),
+            "lateness_p50": percentile(lateness, 50), "lateness_p99": percentile(lateness, 99),
+            "lateness_max": max(lateness)}
+
+def aio(entries: int, size: int, streams: List[int] = AIOSTREAMS, repeat: int = REPEAT) -> List[Dict[str, Any]]:
+    """ concurrent-stream throughput and event loop latency of zzipaio """
+    import asyncio
+    archive = make_archive(entries, size, "deflated")
+    names = archive_names(archive)
+    results: List[Dict[str, Any]] = []
+    for blocking in [True, False]:
+        for count in streams:
+            runs = [asyncio.run(aio_streams(archive, names, count, blocking)) for _ in range(max(1, repeat))]
+            result = sorted(runs, key=lambda run: run["wall"])[len(runs) // 2]
+            result.update({"archive": archive, "entries": entries, "size": size, "repeat": len(runs)})
+            logg.info("%s %i streams: %.1f MB/s, loop lateness p50 %.3fms p99 %.3fms max %.3fms",
+                      blocking and "blocking" or "zzipaio", count, result["mb_per_s"], result["lateness_p50"] * 1000,
+                      result["lateness_p99"] * 1000, result["lateness_max"] * 1000)
+            results.append(result)
+    return results
+
+def served(url: str, names: List[str], concurrency: int) -> Tuple[List[float], int, int]:
+    """ GET each name (a new connection each, as HTTP/1.0) from that many threads -
+        the latency of each request, the bytes received and the failed requests """
+    import http.client
+    import threading
+    import urllib.parse
+    address = urllib.parse.urlsplit(url)
+    walls: List[float] = []
+    counts = [0, 0]
+    lock = threading.Lock()
+    pending = list(names)
+    def client() -> None:
+        while True:
+            with lock:
+                if not pending:
+                    return
+                name = pending.pop()
+            started = time.perf_counter()
+            conn = http.client.HTTPConnection(address.hostname or "127.0.0.1", address.port)
+            try:
+                conn.request("GET", "/" + urllib.parse.quote(name))
+                response = conn.getresponse()
+                size = len(response.read())
+                failed = response.status != 200
+            except OSError:
+                size, failed = 0, True
+            finally:
+                conn.close()
+            wall = time.perf_counter() - started
+            with lock:
+                walls.append(wall)
+                counts[0] += size
+                counts[1] += failed
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return walls, counts[0], counts[1]
+
+def start_server(cmd: List[str], env: Dict[str, str], pattern: str) -> Tuple[subprocess.Popen, str]:  # type: ignore[type-arg]
+    """ a server on an ephemeral port - the url is taken from its first output line """
+    import re
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    assert proc.stdout is not None
+    line = proc.stdout.readline().decode("utf-8")
+    matched = re.search(pattern, line)
+    if not matched:
+        proc.kill()
+        proc.wait()
+        raise OSError("no server url in %r: %s" % (line, " ".join(cmd[:3])))
+    return proc, "http://127.0.0.1:%s/" % matched.group(1)
+
+def serving(entries: int, size: int, compressions: List[str], requests: int = SERVEREQUESTS,
+            concurrency: List[int] = SERVECLIENTS, seed: int = LOOKUPSEED) -> List[Dict[str, Any]]:
+    """ requests/s of zzipserve.py against python's http.server on the extracted files """
+    import shutil
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipserve.py")
+    env = tool_env(bins("zzcat"))
+    results: List[Dict[str, Any]] = []
+    for compression in compressions:
+        archive = os.path.abspath(make_archive(entries, size, compression))
+        extracted = archive[:-len(".zip")] + ".d"
+        if not os.path.isdir(extracted):
+            with zipfile.ZipFile(archive) as zipped:
+                zipped.extractall(extracted + ".tmp")
+            shutil.move(extracted + ".tmp", extracted)
+        rand = random.Random(seed)
+        names = [rand.choice(archive_names(archive)) for _ in range(requests)]
+        servers = [("http.server", [sys.executable, "-u", "-m", "http.server", "0", "--bind", "127.0.0.1",
+                                    "--directory", extracted], r"port (\d+)"),
+                   ("zzipserve", [sys.executable, "-u", server, "-b", os.path.abspath(bindir), "-p", "0", archive],
+                    r":(\d+)/")]
+        for title, cmd, pattern in servers:
+            proc, url = start_server(cmd, env, pattern)
+            try:
+                served(url, names[:10], 1)  # warmup
+                for clients in concurrency:
+                    started = time.perf_counter()
+                    walls, done, failed = served(url, names, clients)
+                    wall = time.perf_counter() - started
+                    result: Dict[str, Any] = {"server": title, "archive": archive, "compression": compression, "size": size,
+                                              "clients": clients, "requests": len(walls), "failed": failed, "bytes": done,
+                                              "wall": wall, "requests_per_s": len(walls) / (wall or 1e-9),
+                                              "p50": percentile(walls, 50), "p99": percentile(walls, 99)}
+                    logg.info("%s %s %i clients: %.0f requests/s, p50 %.3fms p99 %.3fms (%i failed)",
+                              title, archive, clients, result["requests_per_s"], result["p50"] * 1000,
+                              result["p99"] * 1000, failed)
+                    results.append(result)
+            finally:
+                proc.terminate()
+                proc.wait()
+    return results
+
+def make_package(modules: int, compiled: bool = False) -> str:
+    """ a synthetic package "benchpkg" of subpackages with 100 modules each - with
+        unchecked hash-based .pyc entries next to the sources if compiled """
+    import importlib.util
+    import marshal
+    archive = os.path.join(benchdir, "benchpkg-%i-%s.zip" % (modules, compiled and "pyc" or "py"))
+    if os.path.exists(archive):
+        return archive
+    if not os.path.isdir(benchdir):
+        os.makedirs(benchdir)
+    files: Dict[str, str] = collections.OrderedDict()
+    subpackages: Dict[str, List[str]] = collections.OrderedDict()
+    for num in range(modules):
+        subpackage = "sub%03i" % (num // 100)
+        module = "mod%05i" % num
+        subpackages.setdefault(subpackage, []).append(module)
+        files["benchpkg/%s/%s.py" % (subpackage, module)] = IMPORTMODULE.format(num=num)
+    for subpackage, names in subpackages.items():
+        files["benchpkg/%s/__init__.py" % subpackage] = "from . import %s\n" % ", ".join(names)
+    files["benchpkg/__init__.py"] = "from . import %s\n" % ", ".join(subpackages)
+    tmpfile = archive + ".tmp%i" % os.getpid()
+    with zipfile.ZipFile(tmpfile, "w", zipfile.ZIP_DEFLATED) as zipped:
+        for name, text in files.items():
+            source = text.encode("utf-8")
+            zipped.writestr(name, source)
+            if compiled:
+                code = compile(source, os.path.join(archive, name), "exec", dont_inherit=True)
+                pyc = importlib.util.MAGIC_NUMBER + (1).to_bytes(4, "little") + importlib.util.source_hash(source)
+                zipped.writestr(name + "c", pyc + marshal.dumps(code))
+    os.replace(tmpfile, archive)
+    logg.info("generated %s", archive)
+    return archive
+
+IMPORTMODULE = """
+import os
+VALUE = {num}
+class Thing{num}:
+    def __init__(self, value: int = VALUE) -> None:
+        self.value = value
+    def double(self) -> int:
+        return self.value * 2
+def compute(items: list = [1, 2, 3]) -> int:
+    total = 0
+    for item in items:
+        total += item * VALUE
+    return total
+NAMES = [os.path.join("x", str(n)) for n in range(10)]
+"""
+IMPORTERS = {
+    "zipimport": "import sys, time; started = time.perf_counter(); sys.path.insert(0, {archive!r})",
+    "zzipimport": "import sys, time; started = time.perf_counter(); sys.path.insert(0, {testdir!r}); "
+                  "import zzipimport; zzipimport.install({archive!r}, '', {bins!r})",
+}
+
+def imported(importer: str, archive: str) -> Tuple[float, float, int]:
+    """ run a python that imports benchpkg - the wall time, the setup time
+        and the cumulative -X importtime of benchpkg in microseconds """
+    setup = IMPORTERS[importer].format(archive=os.path.abspath(archive), bins=os.path.abspath(bindir),
+                                       testdir=os.path.dirname(os.path.abspath(__file__)))
+    code = setup + "; ready = time.perf_counter(); print(ready - started); import benchpkg"
+    started = time.perf_counter()
+    run = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=tool_env(bins("zzcat")))
+    wall = time.perf_counter() - started
+    if run.returncode:
+        raise OSError("%s failed: %s" % (importer, run.stderr.decode("utf-8", "replace")[-500:]))
+    cumulative = 0
+    for line in run.stderr.decode("utf-8").split("\n"):
+        if line.startswith("import time:") and line.split("|")[-1].strip() == "benchpkg":
+            cumulative = int(line.split("|")[1])
+    return wall, float(run.stdout.strip() or 0), cumulative
+
+def importtime(modules: List[int], importers: List[str] = list(IMPORTERS),
+               warmup: int = WARMUP, repeat: int = REPEAT) -> List[Dict[str, Any]]:
+    """ a python process importing all modules of a zipped package - with the stdlib
+        zipimport and with zzipimport, for an archive of sources and one with .pyc entries """
+    results: List[Dict[str, Any]] = []
+    for count in modules:
+        for compiled in [False, True]:
+            archive = make_package(count, compiled)
+            for importer in importers:
+                for _ in range(warmup):
+                    imported(importer, archive)
+                runs = [imported(importer, archive) for _ in range(max(1, repeat))]
+                result: Dict[str, Any] = {"importer": importer, "archive": archive, "modules": count, "pyc": compiled,
+                                          "repeat": len(runs), "wall_median": median([run[0] for run in runs]),
+                                          "setup_median": median([run[1] for run in runs]),
+                                          "importtime_us": median([run[2] for run in runs])}
+                logg.info("%s %s: importtime %.3fms (setup %.3fms, wall %.3fms)", importer, archive,
+                          result["importtime_us"] / 1000., result["setup_median"] * 1000, result["wall_median"] * 1000)
+                results.append(result)
+    return results
+
+def scaling(results: List[Dict[str, Any]]) -> Dict[str, float]:
+    """ the exponent of wall ~ entries**k per tool (a log-log least squares fit) -
+        about 1.0 is linear and 2.0 is quadratic in the number of entries """
+    points: Dict[str, List[Tuple[float, float]]] = collections.OrderedDict()
+    for result in results:
+        if result["returncode"] or result["wall_median"] <= 0 or result.get("listed", result["entries"]) != result["entries"]:
+            continue
+        point = (math.log(result["entries"]), math.log(result["wall_median"]))
+        points.setdefault(result["tool"], []).append(point)
+    fitted: Dict[str, float] = {}
+    for tool, xy in points.items():
+        if len(xy) < 2:
+            continue
+        mx = sum([x for x, y in xy]) / len(xy)
+        my = sum([y for x, y in xy]) / len(xy)
+        dx = sum([(x - mx) ** 2 for x, y in xy])
+        if dx:
+            fitted[tool] = sum([(x - mx) * (y - my) for x, y in xy]) / dx
+    return fitted
+
+def report_csv(results: List[Dict[str, Any]], filename: str, columns: List[str]) -> None:
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for result in results:
+            writer.writerow([result.get(column, "") for column in columns])
+    logg.info("written %s", filename)
+
+def numbers(text: str) -> List[int]:
+    """ a comma list of numbers, allowing k/m suffixes as 1000s (and K/M as 1024s) """
+    values = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        factor = 1
+        if item[-1] in "kK":
+            factor = item[-1] == "k" and 1000 or 1024
+            item = item[:-1]
+        elif item[-1] in "mM":
+            factor = item[-1] == "m" and 1000000 or 1024 * 1024
+            item = item[:-1]
+        values.append(int(item) * factor)
+    return values
+
+def report(results: Dict[str, Any], filename: str = "") -> None:
+    text = json.dumps(results, indent=1, sort_keys=True)
+    if not filename or filename == "-":
+        print(text)
+        return
+    with open(filename, "w") as f:
+        f.write(text + "\n")
+    logg.info("written %s", filename)
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] throughput|listing|lookup|findfile|importtime|extract|aio|serve...")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=bindir,
+                  help="path to the bindir to use [%default]")
+    _o.add_option("-E", "--exeext", metavar="EXT", default=exeext,
+                  help="the executable extension (automake $(EXEEXT)) [%default]")
+    _o.add_option("-B", "--benchdir", metavar="DIR", default=benchdir,
+                  help="generate (and reuse) the archives here [%default]")
+    _o.add_option("--entries", metavar="LIST", default="10,100,1000",
+                  help="entry counts of the archives [%default]")
+    _o.add_option("--sizes", metavar="LIST", default="1K,64K,1M",
+                  help="entry sizes of the archives [%default]")
+    _o.add_option("--compressions", metavar="LIST", default="stored,deflated",
+                  help="entry compressions of the archives [%default]")
+    _o.add_option("--maxbytes", metavar="SIZE", default="256M",
+                  help="skip archives over this uncompressed size [%default]")
+    _o.add_option("--tools", metavar="LIST", default="",
+                  help="the binaries to run [%s] or for listing [%s]" % (",".join(CATTOOLS), ",".join(LISTTOOLS)))
+    _o.add_option("--scale", metavar="LIST", default="1k,10k,100k,1m",
+                  help="entry counts of the listing archives [%default]")
+    _o.add_option("--csv", metavar="FILE", default="",
+                  help="write the listing results as csv here [%default]")
+    _o.add_option("--lookups", metavar="N", type="int", default=LOOKUPS,
+                  help="random member names to fetch [%default]")
+    _o.add_option("--lookup-entries", metavar="N", default="50k",
+                  help="entry count of the lookup archive (zip64 is not supported) [%default]")
+    _o.add_option("--find-entries", metavar="LIST", default="1k,100k,1m",
+                  help="entry counts of the findfile archives [%default]")
+    _o.add_option("--find-apis", metavar="LIST", default=",".join(FINDAPIS),
+                  help="the zzipctypes apis for findfile [%default]")
+    _o.add_option("--find-linear", metavar="N", type="int", default=FINDLINEAR,
+                  help="lookups with the linear search [%default]")
+    _o.add_option("--extract-entries", metavar="LIST", default="100,1000",
+                  help="entry counts of the extract archives [%default]")
+    _o.add_option("--extract-sizes", metavar="LIST", default="64K,1M",
+                  help="entry sizes of the extract archives [%default]")
+    _o.add_option("--extract-archives", metavar="LIST", default="",
+                  help="extract these archives as well (like test5.zip) [%default]")
+    _o.add_option("--extract-jobs", metavar="LIST", default=",".join(map(str, EXTRACTJOBS)),
+                  help="worker threads of zzipextract [%default]")
+    _o.add_option("--aio-entries", metavar="N", default="200",
+                  help="entry count of the aio archive [%default]")
+    _o.add_option("--aio-size", metavar="SIZE", default="256K",
+                  help="entry size of the aio archive [%default]")
+    _o.add_option("--aio-streams", metavar="LIST", default=",".join(map(str, AIOSTREAMS)),
+                  help="concurrent streams [%default]")
+    _o.add_option("--serve-entries", metavar="N", default="1000",
+                  help="entry count of the serve archives [%default]")
+    _o.add_option("--serve-size", metavar="SIZE", default="16K",
+                  help="entry size of the serve archives [%default]")
+    _o.add_option("--serve-requests", metavar="N", type="int", default=SERVEREQUESTS,
+                  help="requests per load run [%default]")
+    _o.add_option("--serve-clients", metavar="LIST", default=",".join(map(str, SERVECLIENTS)),
+                  help="concurrent clients [%default]")
+    _o.add_option("--import-modules", metavar="LIST", default="1k,5k",
+                  help="module counts of the importtime package [%default]")
+    _o.add_option("--importers", metavar="LIST", default=",".join(IMPORTERS),
+                  help="the importers for importtime [%default]")
+    _o.add_option("-w", "--warmup", metavar="N", type="int", default=WARMUP,
+                  help="runs before measuring [%default]")
+    _o.add_option("-r", "--repeat", metavar="N", type="int", default=REPEAT,
+                  help="measured runs [%default]")
+    _o.add_option("-o", "--output", metavar="FILE", default="-",
+                  help="write the json results here [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    bindir = opt.bindir
+    exeext = opt.exeext
+    benchdir = opt.benchdir
+    if not args:
+        args = ["throughput"]
+    results: Dict[str, Any] = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "uname": list(os.uname())}
+    for command in args:
+        if command == "throughput":
+            tools = opt.tools and opt.tools.split(",") or CATTOOLS
+            results[command] = throughput(numbers(opt.entries), numbers(opt.sizes),
+                                          opt.compressions.split(","), tools,
+                                          numbers(opt.maxbytes)[0], opt.warmup, opt.repeat)
+        elif command == "listing":
+            tools = opt.tools and opt.tools.split(",") or LISTTOOLS
+            results[command] = listing(numbers(opt.scale), tools, LISTSIZE, opt.warmup, opt.repeat)
+            results["listing_scaling"] = scaling(results[command])
+            if opt.csv:
+                report_csv(results[command], opt.csv, ["tool", "entries", "listed", "returncode", "wall_median", "wall_min",
+                                                       "us_per_entry", "user", "sys", "maxrss_kb", "maxrss_floor_kb"])
+        elif command == "lookup":
+            tools = opt.tools and opt.tools.split(",") or CATTOOLS
+            results[command] = lookup(numbers(opt.lookup_entries)[0], 1024, opt.lookups, tools, opt.warmup)
+        elif command == "findfile":
+            results[command] = findfile(numbers(opt.find_entries), opt.lookups, opt.find_apis.split(","),
+                                        opt.find_linear)
+        elif command == "extract":
+            archives = [archive for archive in opt.extract_archives.split(",") if archive]
+            results[command] = extraction(numbers(opt.extract_entries), numbers(opt.extract_sizes), archives,
+                                          numbers(opt.extract_jobs), numbers(opt.maxbytes)[0], opt.warmup, opt.repeat)
+        elif command == "aio":
+            results[command] = aio(numbers(opt.aio_entries)[0], numbers(opt.aio_size)[0],
+                                   numbers(opt.aio_streams), opt.repeat)
+        elif command == "serve":
+            results[command] = serving(numbers(opt.serve_entries)[0], numbers(opt.serve_size)[0],
+                                       opt.compressions.split(","), opt.serve_requests, numbers(opt.serve_clients))
+        elif command == "importtime":
+            results[command] = importtime(numbers(opt.import_modules), opt.importers.split(","),
+                                          opt.warmup, opt.repeat)
+        else:
+            _o.error("unknown benchmark %s" % command)
+    report(results, opt.output)
@@ -0,0 +1,665 @@
+#! /usr/bin/env python3
+""" A ctypes binding to the zzip libraries of the build tree - so that the
+    tests can check the content of a zip archive in-process without starting
+    a bins/ tool for each assertion. It wraps the three access layers:
+    ZZipDir for zzip_dir_open/zzip_file_open/zzip_read (libzzip),
+    ZZipDisk for zzip_disk_mmap/zzip_disk_findfile/zzip_disk_fread and
+    ZZipMemDisk for zzip_mem_disk_open/zzip_mem_disk_findfile (libzzipmmapped).
+    ZZipMapped is a zero-copy reader - stored entries are returned as a
+    memoryview into the mapped archive and deflated entries are streamed.
+    EntryCache keeps the content of small entries that are read again. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Dict, Tuple, Iterator, Callable, Any, Protocol, cast
+import collections
+import ctypes
+import errno
+import io
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+logg = logging.getLogger("zzipctypes")
+
+bindir = os.path.join("..", "bins")
+libdir = os.environ.get("ZZIP_LIBDIR", "")
+READSIZE = 64 * 1024
+CACHESIZE = 64 * 1024 * 1024
+CACHEENTRY = 1024 * 1024  # larger entries are not cached
+
+c_char_p = ctypes.c_char_p
+c_void_p = ctypes.c_void_p
+c_int = ctypes.c_int
+c_long = ctypes.c_long
+c_size_t = ctypes.c_size_t
+c_ssize_t = ctypes.c_ssize_t
+zzip_off_t = ctypes.c_long  # off_t (the build does not rename for largefile)
+
+class ZZipError(OSError):
+    pass
+
+class ZZIP_DIRENT(ctypes.Structure):
+    _fields_ = [("d_compr", c_int), ("d_csize", c_int), ("st_size", c_int), ("d_name", c_char_p)]
+
+class ZZIP_DISK(ctypes.Structure):
+    _fields_ = [("buffer", c_void_p), ("endbuf", c_void_p), ("reserved", c_void_p), ("user", c_void_p),
+                ("flags", c_long), ("mapped", c_long), ("unused", c_long), ("code", c_long)]
+
+class ZZIP_MEM_ENTRY(ctypes.Structure):
+    pass
+ZZIP_MEM_ENTRY._fields_ = [
+    ("zz_next", ctypes.POINTER(ZZIP_MEM_ENTRY)), ("zz_name", c_char_p), ("zz_data", c_void_p),
+    ("zz_flags", c_int), ("zz_compr", c_int), ("zz_mktime", c_long), ("zz_crc32", c_long),
+    ("zz_csize", zzip_off_t), ("zz_usize", zzip_off_t), ("zz_offset", zzip_off_t),
+    ("zz_diskstart", c_int), ("zz_filetype", c_int), ("zz_comment", c_char_p),
+    ("zz_ext", c_void_p * 3), ("zz_extlen", c_size_t * 3)]
+
+class ZZIP_MEM_DISK(ctypes.Structure):
+    _fields_ = [("disk", ctypes.POINTER(ZZIP_DISK)), ("list", ctypes.POINTER(ZZIP_MEM_ENTRY)),
+                ("last", ctypes.POINTER(ZZIP_MEM_ENTRY))]
+
+def library_dirs(bins: Optional[str] = None) -> List[str]:
+    """ zzip/.libs of an automake build and zzip/ of a cmake build (like zziptests.shell) """
+    if libdir:
+        return [libdir]
+    build = os.path.dirname(os.path.realpath(bins or bindir))
+    return [os.path.join(build, "zzip", ".libs"), os.path.join(build, "zzip")]
+
+def find_library(name: str, bins: Optional[str] = None) -> Optional[str]:
+    """ the shared library file for 'zzip' or 'zzipmmapped' in the build tree """
+    for libs in library_dirs(bins):
+        if not os.path.isdir(libs):
+            continue
+        found = []
+        for filename in os.listdir(libs):
+            base = filename
+            for prefix in ["lib", "cyg"]:
+                if base.startswith(prefix):
+                    base = base[len(prefix):]
+            if not base.startswith(name) or base[len(name):len(name) + 1] not in [".", "-"]:
+                continue
+            if ".so" in base or base.endswith(".dylib") or base.endswith(".dll"):
+                found.append(filename)
+        if found:
+            return os.path.join(libs, sorted(found, key=len)[0])
+    return None
+
+_libraries: Dict[str, Any] = {}
+def library(name: str, bins: Optional[str] = None) -> Any:
+    """ the loaded ctypes.CDLL with the function prototypes declared - memoized """
+    if name not in _libraries:
+        filename = find_library(name, bins)
+        if not filename:
+            raise ZZipError("no lib%s found in %s" % (name, " or ".join(library_dirs(bins))))
+        logg.debug("loading %s", filename)
+        lib = ctypes.CDLL(filename, use_errno=True)
+        declare(lib, PROTOTYPES[name])
+        _libraries[name] = lib
+    return _libraries[name]
+
+def available(bins: Optional[str] = None) -> bool:
+    try:
+        library("zzip", bins)
+        library("zzipmmapped", bins)
+        return True
+    except OSError as e:
+        logg.debug("zzipctypes: %s", e)
+        return False
+
+def declare(lib: Any, prototypes: Dict[str, List[Any]]) -> None:
+    for funcname, types in prototypes.items():
+        func = getattr(lib, funcname)
+        func.restype = types[0]
+        func.argtypes = types[1:]
+
+P_DISK = ctypes.POINTER(ZZIP_DISK)
+P_MEM_DISK = ctypes.POINTER(ZZIP_MEM_DISK)
+P_MEM_ENTRY = ctypes.POINTER(ZZIP_MEM_ENTRY)
+
+# funcname -> [restype, argtypes...]
+PROTOTYPES: Dict[str, Dict[str, List[Any]]] = {
+    "zzip": {
+        "zzip_dir_open": [c_void_p, c_char_p, ctypes.POINTER(c_int)],
+        "zzip_dir_close": [c_int, c_void_p],
+        "zzip_dir_read": [c_int, c_void_p, ctypes.POINTER(ZZIP_DIRENT)],
+        "zzip_rewinddir": [None, c_void_p],
+        "zzip_file_open": [c_void_p, c_void_p, c_char_p, c_int],
+        "zzip_file_close": [c_int, c_void_p],
+        "zzip_read": [c_ssize_t, c_void_p, c_void_p, c_size_t],
+        "zzip_strerror": [c_char_p, c_int],
+    },
+    "zzipmmapped": {
+        "zzip_disk_mmap": [P_DISK, c_int],
+        "zzip_disk_open": [P_DISK, c_char_p],
+        "zzip_disk_buffer": [P_DISK, c_void_p, c_size_t],
+        "zzip_disk_close": [c_int, P_DISK],
+        "zzip_disk_findfirst": [c_void_p, P_DISK],
+        "zzip_disk_findnext": [c_void_p, P_DISK, c_void_p],
+        "zzip_disk_findfile": [c_void_p, P_DISK, c_char_p, c_void_p, c_void_p],
+        "zzip_disk_findmatch": [c_void_p, P_DISK, c_char_p, c_void_p, c_void_p, c_int],
+        "zzip_disk_index": [c_long, P_DISK],
+        "zzip_disk_unindex": [None, P_DISK],
+        "zzip_disk_entry_strdup_name": [c_void_p, P_DISK, c_void_p],
+        "zzip_disk_entry_to_data": [c_void_p, P_DISK, c_void_p],
+        "zzip_disk_entry_fopen": [c_void_p, P_DISK, c_void_p],
+        "zzip_disk_fread": [c_size_t, c_void_p, c_size_t, c_size_t, c_void_p],
+        "zzip_disk_fclose": [c_int, c_void_p],
+        "zzip_mem_disk_open": [P_MEM_DISK, c_char_p],
+        "zzip_mem_disk_open_sidecar": [P_MEM_DISK, c_char_p, c_char_p],
+        "zzip_mem_disk_close": [None, P_MEM_DISK],
+        "zzip_mem_disk_findfile": [P_MEM_ENTRY, P_MEM_DISK, c_char_p, P_MEM_ENTRY, c_void_p],
+        "zzip_mem_disk_findmatch": [P_MEM_ENTRY, P_MEM_DISK, c_char_p, P_MEM_ENTRY, c_void_p, c_int],
+        "zzip_mem_disk_index": [c_long, P_MEM_DISK],
+        "zzip_mem_disk_unindex": [None, P_MEM_DISK],
+        "zzip_mem_entry_fopen": [c_void_p, P_MEM_DISK, P_MEM_ENTRY],
+        "zzip_mem_disk_fread": [c_size_t, c_void_p, c_size_t, c_size_t, c_void_p],
+        "zzip_mem_disk_fclose": [c_int, c_void_p],
+    },
+}
+
+_libc = ctypes.CDLL(None)
+_libc.free.argtypes = [c_void_p]
+_libc.free.restype = None
+
+def strdup_result(ptr: Optional[int]) -> str:
+    """ decode and free() a zzip__new__ char* """
+    if not ptr:
+        return ""
+    try:
+        return os.fsdecode(ctypes.string_at(ptr))
+    finally:
+        _libc.free(ptr)
+
+def errno_error(message: str, filename: str) -> ZZipError:
+    err = ctypes.get_errno()
+    return ZZipError(err, "%s: %s" % (message, os.strerror(err) if err else "failed"), filename)
+
+def readall(fread: Any, handle: int, size: int = READSIZE) -> bytes:
+    """ the zzip_disk_fread loop over an opened file - until it returns 0 """
+    chunks = []
+    buf = ctypes.create_string_buffer(size)
+    while True:
+        done = fread(buf, 1, size, handle)
+        if not done:
+            break
+        chunks.append(buf.raw[:done])
+    return b"".join(chunks)
+
+class ZZipDir:
+    """ the zzip_dir_open api of libzzip (which zzcat and zzdir use) """
+    def __init__(self, filename: str, bins: Optional[str] = None) -> None:
+        self.handle = None
+        self.lib = library("zzip", bins)
+        self.filename = filename
+        err = c_int(0)
+        self.handle = self.lib.zzip_dir_open(os.fsencode(filename), ctypes.byref(err))
+        if not self.handle:
+            message = self.lib.zzip_strerror(err.value)
+            raise ZZipError(2, os.fsdecode(message or b"zzip_dir_open failed"), filename)
+    def close(self) -> None:
+        if self.handle:
+            self.lib.zzip_dir_close(self.handle)
+            self.handle = None
+    def __enter__(self) -> "ZZipDir":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def __del__(self) -> None:
+        self.close()
+    def entries(self) -> Iterator[ZZIP_DIRENT]:
+        self.lib.zzip_rewinddir(self.handle)
+        while True:
+            dirent = ZZIP_DIRENT()
+            if not self.lib.zzip_dir_read(self.handle, ctypes.byref(dirent)):
+                break
+            yield dirent
+    def names(self) -> List[str]:
+        return [os.fsdecode(dirent.d_name) for dirent in self.entries()]
+    def read(self, name: str, size: int = READSIZE) -> bytes:
+        fp = self.lib.zzip_file_open(self.handle, os.fsencode(name), os.O_RDONLY)
+        if not fp:
+            raise errno_error("zzip_file_open %s" % name, self.filename)
+        try:
+            chunks = []
+            buf = ctypes.create_string_buffer(size)
+            while True:
+                done = self.lib.zzip_read(fp, buf, size)
+                if done < 0:
+                    raise errno_error("zzip_read %s" % name, self.filename)
+                if not done:
+                    break
+                chunks.append(buf.raw[:done])
+            return b"".join(chunks)
+        finally:
+            self.lib.zzip_file_close(fp)
+
+class ZZipDisk:
+    """ the zzip_disk_mmap api of libzzipmmapped (which unzzip-big uses) """
+    def __init__(self, filename: str, bins: Optional[str] = None) -> None:
+        self.disk = None
+        self.lib = library("zzipmmapped", bins)
+        self.filename = filename
+        fd = os.open(filename, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            self.disk = self.lib.zzip_disk_mmap(fd)  # the mapping stays valid after close(fd)
+        finally:
+            os.close(fd)
+        if not self.disk:
+            # a build without _USE_MMAP - zzip_disk_open reads the archive into a buffer
+            self.disk = self.lib.zzip_disk_open(os.fsencode(filename))
+        if not self.disk:
+            raise errno_error("zzip_disk_open", filename)
+    def close(self) -> None:
+        if self.disk:
+            self.lib.zzip_disk_close(self.disk)
+            self.disk = None
+    def __enter__(self) -> "ZZipDisk":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def __del__(self) -> None:
+        self.close()
+    def entries(self) -> Iterator[int]:
+        """ the ZZIP_DISK_ENTRY* of the central directory """
+        entry = self.lib.zzip_disk_findfirst(self.disk)
+        while entry:
+            yield entry
+            entry = self.lib.zzip_disk_findnext(self.disk, entry)
+    def entry_name(self, entry: int) -> str:
+        return strdup_result(self.lib.zzip_disk_entry_strdup_name(self.disk, entry))
+    def names(self) -> List[str]:
+        return [self.entry_name(entry) for entry in self.entries()]
+    def findfile(self, name: str) -> Optional[int]:
+        entry = self.lib.zzip_disk_findfile(self.disk, os.fsencode(name), None, None)
+        return entry or None
+    def findmatch(self, filespec: str, flags: int = 0) -> Iterator[int]:
+        """ the entries matching the fnmatch filespec (in name order with an index) """
+        entry = None
+        while True:
+            entry = self.lib.zzip_disk_findmatch(self.disk, os.fsencode(filespec), entry, None, flags)
+            if not entry:
+                break
+            yield entry
+    def index(self) -> int:
+        """ zzip_disk_index - the number of entries """
+        count: int = self.lib.zzip_disk_index(self.disk)
+        if count < 0:
+            raise errno_error("zzip_disk_index", self.filename)
+        return count
+    def read_entry(self, entry: int, size: int = READSIZE) -> bytes:
+        fp = self.lib.zzip_disk_entry_fopen(self.disk, entry)
+        if not fp:
+            raise errno_error("zzip_disk_entry_fopen %s" % self.entry_name(entry), self.filename)
+        try:
+            return readall(self.lib.zzip_disk_fread, fp, size)
+        finally:
+            self.lib.zzip_disk_fclose(fp)
+    def read(self, name: str, size: int = READSIZE) -> bytes:
+        entry = self.findfile(name)
+        if not entry:
+            raise ZZipError(2, "zzip_disk_findfile %s: not found" % name, self.filename)
+        return self.read_entry(entry, size)
+
+class ZZipMemDisk:
+    """ the zzip_mem_disk_open api of libzzipmmapped (which unzzip-mem uses) - with a
+        sidecar path it uses zzip_mem_disk_open_sidecar to load the entries from it """
+    def __init__(self, filename: str, bins: Optional[str] = None, sidecar: Optional[str] = None) -> None:
+        self.dir = None
+        self.lib = library("zzipmmapped", bins)
+        self.filename = filename
+        if sidecar is None:
+            self.dir = self.lib.zzip_mem_disk_open(os.fsencode(filename))
+        else:
+            self.dir = self.lib.zzip_mem_disk_open_sidecar(os.fsencode(filename), os.fsencode(sidecar))
+        if not self.dir:
+            raise errno_error("zzip_mem_disk_open", filename)
+    def close(self) -> None:
+        if self.dir:
+            self.lib.zzip_mem_disk_close(self.dir)
+            self.dir = None
+    def __enter__(self) -> "ZZipMemDisk":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def __del__(self) -> None:
+        self.close()
+    def entries(self) -> Iterator[ZZIP_MEM_ENTRY]:
+        if not self.dir:
+            raise ZZipError(errno.EBADF, "closed", self.filename)
+        entry = self.dir.contents.list
+        while entry:
+            yield entry.contents
+            entry = entry.contents.zz_next
+    def names(self) -> List[str]:
+        return [os.fsdecode(entry.zz_name) for entry in self.entries()]
+    def findfile(self, name: str) -> Optional[Any]:
+        """ the ZZIP_MEM_ENTRY* (check .contents for the fields) """
+        entry = self.lib.zzip_mem_disk_findfile(self.dir, os.fsencode(name), None, None)
+        return entry or None
+    def findmatch(self, filespec: str, flags: int = 0) -> Iterator[Any]:
+        """ the ZZIP_MEM_ENTRY* matching the fnmatch filespec (in name order with an index) """
+        entry = None
+        while True:
+            entry = self.lib.zzip_mem_disk_findmatch(self.dir, os.fsencode(filespec), entry, None, flags)
+            if not entry:
+                break
+            yield entry
+    def entry_name(self, entry: Any) -> str:
+        return os.fsdecode(entry.contents.zz_name)
+    def index(self) -> int:
+        """ zzip_mem_disk_index - the number of entries """
+        count: int = self.lib.zzip_mem_disk_index(self.dir)
+        if count < 0:
+            raise errno_error("zzip_mem_disk_index", self.filename)
+        return count
+    def read_entry(self, entry: Any, size: int = READSIZE) -> bytes:
+        fp = self.lib.zzip_mem_entry_fopen(self.dir, entry)
+        if not fp:
+            raise errno_error("zzip_mem_entry_fopen %s" % os.fsdecode(entry.contents.zz_name), self.filename)
+        try:
+            return readall(self.lib.zzip_mem_disk_fread, fp, size)
+        finally:
+            self.lib.zzip_mem_disk_fclose(fp)
+    def read(self, name: str, size: int = READSIZE) -> bytes:
+        entry = self.findfile(name)
+        if not entry:
+            raise ZZipError(2, "zzip_mem_disk_findfile %s: not found" % name, self.filename)
+        return self.read_entry(entry, size)
+
+ZZIP_IS_STORED = 0
+ZZIP_IS_DEFLATED = 8
+# flags, compr, crc32, csize, usize, namlen, extras of a struct zzip_disk_entry (format.h)
+DISK_ENTRY = struct.Struct("<8xHH4xIIIHH")
+DISK_ENTRY_SIZE = 46  # the name and the extras follow
+EXTRA_BLOCK = struct.Struct("<HH")  # datatype, datasize
+EXTRA_ZIP64 = 0x0001
+ZIP64_MARKER = 0xFFFFFFFF
+
+def zip64_sizes(extras: bytes, csize: int, usize: int) -> Tuple[int, int]:
+    """ the csize and usize from the ZIP64 extra block - only the ones at the marker
+        are in there, the usize comes first """
+    pos = 0
+    while pos + EXTRA_BLOCK.size <= len(extras):
+        datatype, datasize = EXTRA_BLOCK.unpack_from(extras, pos)
+        pos += EXTRA_BLOCK.size
+        if datatype == EXTRA_ZIP64:
+            block = extras[pos:pos + datasize]
+            if usize == ZIP64_MARKER and len(block) >= 8:
+                usize, = struct.unpack_from("<Q", block)
+                block = block[8:]
+            if csize == ZIP64_MARKER and len(block) >= 8:
+                csize, = struct.unpack_from("<Q", block)
+            break
+        pos += datasize
+    return csize, usize
+
+ZZipInfo = collections.namedtuple("ZZipInfo", ["name", "flags", "compr", "crc32", "csize", "usize", "offset"])
+
+class EntryReader(io.RawIOBase):
+    """ the stream of one entry in the mapping - stored data is sliced and
+        deflated data is inflated chunkwise. The crc32 is checked at the end. """
+    def __init__(self, view: memoryview, info: ZZipInfo, chunk: int = READSIZE) -> None:
+        super().__init__()
+        self.view = view
+        self.info = info
+        self.chunk = chunk
+        self.pos = 0
+        self.crc = 0
+        self.done = 0
+        self.inflate = zlib.decompressobj(-zlib.MAX_WBITS) if info.compr == ZZIP_IS_DEFLATED else None
+    def readable(self) -> bool:
+        return True
+    def readinto(self, buf: Any) -> int:
+        size = len(buf)
+        if not size:
+            return 0
+        if self.inflate is None:
+            data: Any = self.view[self.pos:self.pos + size]
+            self.pos += len(data)
+        else:
+            data = b""
+            while not data and not self.inflate.eof:
+                if self.inflate.unconsumed_tail:
+                    data = self.inflate.decompress(self.inflate.unconsumed_tail, size)
+                elif self.pos < len(self.view):
+                    block = self.view[self.pos:self.pos + self.chunk]
+                    self.pos += len(block)
+                    data = self.inflate.decompress(block, size)
+                else:
+                    data = self.inflate.decompress(b"", size)
+                    if not data:
+                        raise ZZipError(errno.EIO, "truncated deflate data", self.info.name)
+        done = len(data)
+        if not done:
+            self.check()
+            return 0
+        buf[:done] = data
+        self.crc = zlib.crc32(data, self.crc)
+        self.done += done
+        return done
+    def check(self) -> None:
+        if self.done != self.info.usize:
+            raise ZZipError(errno.EIO, "size mismatch %i (expected %i)" % (self.done, self.info.usize), self.info.name)
+        if self.crc != self.info.crc32:
+            raise ZZipError(errno.EIO, "crc32 mismatch %08x (expected %08x)" % (self.crc, self.info.crc32), self.info.name)
+
+class ZZipMapped:
+    """ zero-copy access - the archive is mapped here and wrapped with zzip_disk_buffer,
+        so that zzip_disk_entry_to_data points into the mapping. A sidecar (see zzipsidecar)
+        answers info() and infolist() without walking the central directory - it is
+        closed along with this. """
+    def __init__(self, filename: str, bins: Optional[str] = None, sidecar: Any = None) -> None:
+        self.disk = None
+        self.sidecar = sidecar
+        self.mapped: Optional[mmap.mmap] = None
+        self.lib = library("zzipmmapped", bins)
+        self.filename = filename
+        with open(filename, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                raise ZZipError(errno.EINVAL, "empty file", filename)
+            # ACCESS_COPY is a private mapping (never written) - ctypes needs a writable buffer
+            self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.buffer = memoryview(self.mapped)
+        self.address = ctypes.c_char.from_buffer(self.mapped)
+        self.base = ctypes.addressof(self.address)
+        self.disk = self.lib.zzip_disk_buffer(self.base, len(self.mapped))
+        if not self.disk:
+            raise errno_error("zzip_disk_buffer", filename)
+    def close(self) -> None:
+        """ the mapping stays alive as long as views into it are held elsewhere """
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+        if self.disk:
+            self.lib.zzip_disk_close(self.disk)
+            self.disk = None
+        if self.mapped is not None:
+            del self.address
+            self.buffer.release()
+            try:
+                self.mapped.close()
+            except BufferError:
+                pass
+            self.mapped = None
+    def __enter__(self) -> "ZZipMapped":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def __del__(self) -> None:
+        self.close()
+    def entries(self) -> Iterator[int]:
+        entry = self.lib.zzip_disk_findfirst(self.disk)
+        while entry:
+            yield entry
+            entry = self.lib.zzip_disk_findnext(self.disk, entry)
+    def names(self) -> List[str]:
+        if self.sidecar is not None:
+            return [info.name for info in self.sidecar.infolist()]
+        return [strdup_result(self.lib.zzip_disk_entry_strdup_name(self.disk, entry)) for entry in self.entries()]
+    def entry_info(self, entry: int, name: str = "") -> ZZipInfo:
+        flags, compr, crc32, csize, usize, namlen, extras = DISK_ENTRY.unpack_from(self.buffer, entry - self.base)
+        if ZIP64_MARKER in [csize, usize]:
+            start = entry - self.base + DISK_ENTRY_SIZE + namlen
+            csize, usize = zip64_sizes(bytes(self.buffer[start:start + extras]), csize, usize)
+        name = name or strdup_result(self.lib.zzip_disk_entry_strdup_name(self.disk, entry))
+        data = self.lib.zzip_disk_entry_to_data(self.disk, entry)
+        if not data or data - self.base + csize > len(self.buffer):
+            raise ZZipError(errno.EBADMSG, "entry data out of range: %s" % name, self.filename)
+        return ZZipInfo(name, flags, compr, crc32, csize, usize, data - self.base)
+    def info(self, name: str) -> ZZipInfo:
+        if self.sidecar is not None:
+            found: Optional[ZZipInfo] = self.sidecar.find(name)
+            if not found:
+                raise ZZipError(errno.ENOENT, "sidecar %s: not found" % name, self.filename)
+            return found
+        entry = self.lib.zzip_disk_findfile(self.disk, os.fsencode(name), None, None)
+        if not entry:
+            raise ZZipError(errno.ENOENT, "zzip_disk_findfile %s: not found" % name, self.filename)
+        return self.entry_info(entry, name)
+    def index(self) -> int:
+        """ zzip_disk_index - makes info() and view() an O(1) lookup """
+        count: int = self.lib.zzip_disk_index(self.disk)
+        if count < 0:
+            raise errno_error("zzip_disk_index", self.filename)
+        return count
+    def infolist(self) -> List[ZZipInfo]:
+        if self.sidecar is not None:
+            return cast(List[ZZipInfo], self.sidecar.infolist())
+        return [self.entry_info(entry) for entry in self.entries()]
+    def data(self, info: ZZipInfo) -> memoryview:
+        """ the (compressed) data of the entry - a view into the mapping """
+        if info.flags & 1:
+            raise ZZipError(errno.EPERM, "encrypted entry: %s" % info.name, self.filename)
+        return self.buffer[info.offset:info.offset + info.csize]
+    def view(self, name: str) -> memoryview:
+        """ the content of a stored entry without a copy """
+        info = self.info(name)
+        if info.compr != ZZIP_IS_STORED:
+            raise ZZipError(errno.EINVAL, "not a stored entry (compr %i): %s" % (info.compr, name), self.filename)
+        return self.data(info)
+    def open(self, name: str, chunk: int = READSIZE) -> io.BufferedReader:
+        """ a stream over any stored or deflated entry """
+        info = self.info(name)
+        if info.compr not in [ZZIP_IS_STORED, ZZIP_IS_DEFLATED]:
+            raise ZZipError(errno.EINVAL, "unsupported compression %i: %s" % (info.compr, name), self.filename)
+        return io.BufferedReader(EntryReader(self.data(info), info, chunk), chunk)
+    def read(self, name: str) -> bytes:
+        with self.open(name) as f:
+            return f.read()
+
+class ZZipArchive(Protocol):
+    """ what the four apis have in common """
+    def __enter__(self) -> "ZZipArchive": ...
+    def __exit__(self, *exc: Any) -> None: ...
+    def close(self) -> None: ...
+    def names(self) -> List[str]: ...
+    def read(self, name: str) -> bytes: ...
+
+ZZipOpen = Callable[[str, Optional[str]], ZZipArchive]
+
+APIS: Dict[str, ZZipOpen] = {"dir": ZZipDir, "disk": ZZipDisk, "mem": ZZipMemDisk, "mapped": ZZipMapped}
+
+class EntryCache:
+    """ the decompressed content of small entries by (archive path, entry name) - least
+        recently used entries are evicted when over maxbytes. The archive is stat'ed on
+        each read - a changed size, mtime or inode drops all entries of that archive. """
+    def __init__(self, maxbytes: int = CACHESIZE, maxentry: int = CACHEENTRY, api: str = "dir",
+                 bins: Optional[str] = None) -> None:
+        self.maxbytes = maxbytes
+        self.maxentry = maxentry
+        self.api = api
+        self.bins = bins
+        self.lock = threading.Lock()
+        self.entries: "collections.OrderedDict[Tuple[str, str], bytes]" = collections.OrderedDict()
+        self.versions: Dict[str, Tuple[int, int, int, int]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    def version(self, archive: str) -> Tuple[int, int, int, int]:
+        status = os.stat(archive)
+        return (status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns)
+    def invalidate(self, archive: str) -> int:
+        """ drop the entries of the archive - returns their number """
+        with self.lock:
+            return self._invalidate(os.path.abspath(archive))
+    def _invalidate(self, archive: str) -> int:
+        dropped = [key for key in self.entries if key[0] == archive]
+        for key in dropped:
+            self.size -= len(self.entries.pop(key))
+        self.versions.pop(archive, None)
+        self.invalidations += 1
+        return len(dropped)
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.size = 0
+    def read(self, filename: str, name: str) -> bytes:
+        """ the entry content - the archive is only opened on a miss """
+        archive = os.path.abspath(filename)
+        key = (archive, name)
+        version = self.version(archive)
+        with self.lock:
+            if self.versions.get(archive, version) != version:
+                logg.debug("%s: changed, dropping its entries", archive)
+                self._invalidate(archive)
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        with APIS[self.api](archive, self.bins) as zipped:
+            data: bytes = zipped.read(name)
+        if len(data) > self.maxentry:
+            return data
+        with self.lock:
+            if self.versions.setdefault(archive, version) != version:
+                return data  # changed while reading
+            if key not in self.entries:
+                self.entries[key] = data
+                self.size += len(data)
+            while self.size > self.maxbytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+        return data
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations, "entries": len(self.entries), "bytes": self.size}
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] zipfile [names...]")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=bindir,
+                  help="the bins/ of the build tree (its ../zzip has the libraries) [%default]")
+    _o.add_option("-L", "--libdir", metavar="DIR", default=libdir,
+                  help="load the libraries from here instead [%default]")
+    _o.add_option("-a", "--api", metavar="NAME", default="disk",
+                  help="one of %s [%%default]" % ", ".join(APIS))
+    _o.add_option("-l", "--list", action="store_true", default=False,
+                  help="list the names instead of printing the content")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    libdir = opt.libdir
+    if opt.api not in APIS:
+        _o.error("unknown api %s" % opt.api)
+    if not args:
+        _o.error("no zipfile given")
+    with APIS[opt.api](args[0], opt.bindir) as zipped:
+        names = args[1:] or zipped.names()
+        for name in names:
+            if opt.list:
+                print(name)
+            else:
+                sys.stdout.buffer.write(zipped.read(name))
@@ -0,0 +1,165 @@
+#! /usr/bin/env python3
+""" Extracts a zip archive with worker threads - the entries are sharded by their
+    compressed size (the largest first, each to the least loaded worker) and every
+    worker has its own ZZIP_DISK handle from zzip_disk_buffer over one shared
+    mapping of the archive. The inflate is done by zzip_disk_fread which runs
+    without the GIL (a ctypes call), writing straight into the mapping of an
+    output file that was preallocated to the uncompressed size. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Dict, Tuple, Any
+import concurrent.futures
+import ctypes
+import errno
+import heapq
+import logging
+import mmap
+import os
+import sys
+import time
+import zlib
+
+from zzipctypes import ZZipMapped, ZZipInfo, ZZipError, errno_error
+
+logg = logging.getLogger("zzipextract")
+
+CHUNK = 1024 * 1024
+
+Work = Tuple[int, ZZipInfo]  # the ZZIP_DISK_ENTRY* and its info
+
+def plan(works: List[Work], jobs: int) -> List[List[Work]]:
+    """ longest processing time first - the compressed size is the inflate work """
+    shards: List[List[Work]] = [[] for _ in range(max(1, jobs))]
+    loads = [(0, num) for num in range(len(shards))]
+    for work in sorted(works, key=lambda work: work[1].csize, reverse=True):
+        load, num = heapq.heappop(loads)
+        shards[num].append(work)
+        heapq.heappush(loads, (load + work[1].csize + 1, num))
+    return [shard for shard in shards if shard]
+
+def target(outdir: str, name: str) -> str:
+    """ the output path - names that would escape the outdir are refused """
+    parts = name.split("/")
+    if name.startswith("/") or ".." in parts or "\\" in name:
+        raise ZZipError(errno.EPERM, "unsafe name %s" % name, outdir)
+    return os.path.join(outdir, *[part for part in parts if part])
+
+def preallocate(fd: int, size: int) -> None:
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)  # a filesystem without fallocate
+
+class Extractor:
+    """ one archive mapping - extract() runs the workers over it """
+    def __init__(self, filename: str, bins: Optional[str] = None, crc: bool = False, chunk: int = CHUNK) -> None:
+        self.zipped = ZZipMapped(filename, bins)
+        self.lib = self.zipped.lib
+        self.filename = filename
+        self.crc = crc
+        self.chunk = chunk
+    def close(self) -> None:
+        self.zipped.close()
+    def __enter__(self) -> "Extractor":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def works(self, names: Optional[List[str]] = None) -> List[Work]:
+        works = [(entry, self.zipped.entry_info(entry)) for entry in self.zipped.entries()]
+        if names:
+            wanted = set(names)
+            works = [work for work in works if work[1].name in wanted]
+        return works
+    def extract_entry(self, disk: int, entry: int, info: ZZipInfo, outdir: str) -> int:
+        path = target(outdir, info.name)
+        if info.name.endswith("/"):
+            os.makedirs(path, exist_ok=True)
+            return 0
+        fp = self.lib.zzip_disk_entry_fopen(disk, entry)
+        if not fp:
+            raise errno_error("zzip_disk_entry_fopen %s" % info.name, self.filename)
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                if not info.usize:
+                    return 0
+                preallocate(fd, info.usize)
+                with mmap.mmap(fd, info.usize) as mapped:
+                    view = (ctypes.c_char * info.usize).from_buffer(mapped)
+                    address = ctypes.addressof(view)
+                    done = 0
+                    while done < info.usize:
+                        size = self.lib.zzip_disk_fread(address + done, 1, min(self.chunk, info.usize - done), fp)
+                        if not size:
+                            break
+                        done += size
+                    del view
+                    if done != info.usize:
+                        raise ZZipError(errno.EIO, "size mismatch %i (expected %i)" % (done, info.usize), info.name)
+                    if self.crc and zlib.crc32(mapped) != info.crc32:
+                        raise ZZipError(errno.EIO, "crc32 mismatch", info.name)
+            finally:
+                os.close(fd)
+        finally:
+            self.lib.zzip_disk_fclose(fp)
+        return done
+    def worker(self, shard: List[Work], outdir: str) -> Dict[str, Any]:
+        """ a ZZIP_DISK of its own - over the same buffer, so the entries are valid in it """
+        started = time.perf_counter()
+        disk = self.lib.zzip_disk_buffer(self.zipped.base, len(self.zipped.buffer))
+        if not disk:
+            raise errno_error("zzip_disk_buffer", self.filename)
+        done, errors = 0, []
+        try:
+            for entry, info in shard:
+                try:
+                    done += self.extract_entry(disk, entry, info, outdir)
+                except OSError as e:
+                    logg.error("%s: %s", info.name, e)
+                    errors.append(info.name)
+        finally:
+            self.lib.zzip_disk_close(disk)
+        return {"entries": len(shard), "bytes": done, "errors": errors, "wall": time.perf_counter() - started}
+    def extract(self, outdir: str, jobs: int = 0, names: Optional[List[str]] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        works = self.works(names)
+        for _, info in works:
+            try:
+                os.makedirs(os.path.dirname(target(outdir, info.name)) or outdir, exist_ok=True)
+            except ZZipError:
+                pass  # reported by the worker
+        shards = plan(works, jobs or os.cpu_count() or 1)
+        with concurrent.futures.ThreadPoolExecutor(len(shards) or 1) as pool:
+            workers = list(pool.map(lambda shard: self.worker(shard, outdir), shards))
+        wall = time.perf_counter() - started
+        done = sum([worker["bytes"] for worker in workers])
+        errors = [name for worker in workers for name in worker["errors"]]
+        logg.info("%s: %i entries, %i bytes in %.3fs by %i workers (%.1f MB/s)", self.filename, len(works),
+                  done, wall, len(shards), done / (wall or 1e-9) / 1000000)
+        return {"entries": len(works), "bytes": done, "errors": errors, "wall": wall, "workers": workers}
+
+def extract(filename: str, outdir: str = ".", jobs: int = 0, names: Optional[List[str]] = None,
+            bins: Optional[str] = None, crc: bool = False) -> Dict[str, Any]:
+    with Extractor(filename, bins, crc) as extractor:
+        return extractor.extract(outdir, jobs, names)
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] zipfile [names...]")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("-d", "--outdir", metavar="DIR", default=".",
+                  help="extract into this directory [%default]")
+    _o.add_option("-j", "--jobs", metavar="N", type="int", default=0,
+                  help="worker threads (0 = one per cpu) [%default]")
+    _o.add_option("--crc", action="store_true", default=False,
+                  help="check the crc32 of each extracted file")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if not args:
+        _o.error("no zipfile given")
+    summary = extract(args[0], opt.outdir, opt.jobs, args[1:], opt.bindir, opt.crc)
+    sys.exit(1 if summary["errors"] else 0)
@@ -0,0 +1,241 @@
+#! /usr/bin/env python3
+""" An importlib meta path finder for python modules in a zip archive - like the
+    zipimport of the standard library but reading through the ctypes binding to
+    the zzip_disk_buffer of libzzipmmapped. The module names are indexed once on
+    install (from a valid sidecar when there is one, see zzipsidecar) and each
+    import is a hash lookup into the mapped archive. Compiled code is taken from
+    the .pyc entries of the archive or from a cache of code objects - in-process
+    and optionally in a --cachedir keyed by the crc32 of the source entry. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Dict, Tuple, Any, Sequence
+import errno
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import logging
+import marshal
+import os
+import sys
+import types
+
+from zzipctypes import ZZipMapped, ZZipInfo, ZZipError
+from zzipsidecar import open_mapped
+
+logg = logging.getLogger("zzipimport")
+
+SOURCE = ".py"
+BYTECODE = ".pyc"
+PYCACHE = "__pycache__"
+INIT = "__init__"
+MAGIC = importlib.util.MAGIC_NUMBER
+CACHE_TAG = sys.implementation.cache_tag or ""
+
+# (archive, entry name, crc32) -> code object of the compiled source
+CODECACHE: Dict[Tuple[str, str, int], types.CodeType] = {}
+
+class ZZipModule:
+    """ the archive entries of a module """
+    def __init__(self, fullname: str, package: bool) -> None:
+        self.fullname = fullname
+        self.package = package
+        self.source: Optional[str] = None
+        self.bytecode: Optional[str] = None
+
+def module_name(relative: str) -> Tuple[str, bool, bool]:
+    """ the module name of an archive entry - and whether it is a package and a .pyc (or empty) """
+    if relative.endswith(SOURCE):
+        base, compiled = relative[:-len(SOURCE)], False
+    elif relative.endswith(BYTECODE):
+        base, compiled = relative[:-len(BYTECODE)], True
+        dirname, _, filename = base.rpartition("/")
+        if dirname == PYCACHE or dirname.endswith("/" + PYCACHE):
+            name, _, tag = filename.partition(".")
+            if tag != CACHE_TAG:
+                return "", False, True
+            base = dirname[:-len(PYCACHE)] + name
+    else:
+        return "", False, False
+    if base.endswith("/" + INIT):
+        return base[:-len(INIT) - 1].replace("/", "."), True, compiled
+    if base == INIT or "." in base:
+        return "", False, compiled
+    return base.replace("/", "."), False, compiled
+
+class ZZipFinder(importlib.abc.MetaPathFinder):
+    """ the modules below the prefix directory of the archive """
+    def __init__(self, archive: str, prefix: str = "", bins: Optional[str] = None, cachedir: str = "") -> None:
+        self.archive = os.path.abspath(archive)
+        self.prefix = prefix and prefix.rstrip("/") + "/"
+        self.cachedir = cachedir
+        self.zipped: Optional[ZZipMapped] = open_mapped(self.archive, bins)
+        if self.zipped.sidecar is None:
+            self.zipped.index()
+        self.modules: Dict[str, ZZipModule] = {}
+        for name in self.zipped.names():
+            if not name.startswith(self.prefix):
+                continue
+            fullname, package, compiled = module_name(name[len(self.prefix):])
+            if not fullname:
+                continue
+            module = self.modules.get(fullname)
+            if module is None or (package and not module.package):
+                module = self.modules[fullname] = ZZipModule(fullname, package)
+            elif module.package != package:
+                continue  # a package wins over a module of the same name
+            if compiled and not module.bytecode:
+                module.bytecode = name
+            elif not compiled and not module.source:
+                module.source = name
+        logg.debug("%s: %i modules", self.archive, len(self.modules))
+    def close(self) -> None:
+        if self.zipped is not None:
+            self.zipped.close()
+            self.zipped = None
+    def path(self, name: str) -> str:
+        return os.path.join(self.archive, name)
+    def find_spec(self, fullname: str, path: Optional[Sequence[str]] = None,
+                  target: Optional[types.ModuleType] = None) -> Optional[importlib.machinery.ModuleSpec]:
+        module = self.modules.get(fullname)
+        if module is None or self.zipped is None:
+            return None
+        loader = ZZipLoader(self, module)
+        spec = importlib.util.spec_from_loader(fullname, loader, origin=loader.get_filename(fullname),
+                                               is_package=module.package)
+        if spec is None:
+            return None
+        spec.has_location = True
+        if module.package:
+            spec.submodule_search_locations = [self.path(self.prefix + fullname.replace(".", "/"))]
+        return spec
+    def read(self, name: str) -> bytes:
+        if self.zipped is None:
+            raise ZZipError(errno.EBADF, "closed", self.archive)
+        return self.zipped.read(name)
+    def info(self, name: str) -> ZZipInfo:
+        if self.zipped is None:
+            raise ZZipError(errno.EBADF, "closed", self.archive)
+        return self.zipped.info(name)
+
+class ZZipLoader(importlib.abc.ExecutionLoader):
+    def __init__(self, finder: ZZipFinder, module: ZZipModule) -> None:
+        self.finder = finder
+        self.module = module
+    def is_package(self, fullname: str) -> bool:
+        return self.module.package
+    def get_filename(self, fullname: str) -> str:
+        return self.finder.path(self.module.source or self.module.bytecode or "")
+    def get_data(self, path: str) -> bytes:
+        """ for pkgutil.get_data - the path is inside the archive """
+        archive = self.finder.archive + os.sep
+        if not path.startswith(archive):
+            raise OSError("not in %s: %s" % (self.finder.archive, path))
+        try:
+            return self.finder.read(path[len(archive):].replace(os.sep, "/"))
+        except ZZipError as e:
+            raise OSError(e.errno, e.strerror, path)
+    def get_source(self, fullname: str) -> Optional[str]:
+        if not self.module.source:
+            return None
+        return importlib.util.decode_source(self.finder.read(self.module.source))
+    def get_code(self, fullname: str) -> Optional[types.CodeType]:
+        source = self.module.source
+        info = source and self.finder.info(source) or None
+        if self.module.bytecode:
+            code = self.bytecode(self.module.bytecode, info)
+            if code is not None:
+                return code
+        if not source or info is None:
+            return None
+        key = (self.finder.archive, source, info.crc32)
+        code = CODECACHE.get(key)
+        if code is None:
+            code = self.cached(info)
+        if code is None:
+            code = compile(self.finder.read(source), self.finder.path(source), "exec", dont_inherit=True)
+            self.store(info, code)
+        CODECACHE[key] = code
+        return code
+    def bytecode(self, name: str, source: Optional[ZZipInfo]) -> Optional[types.CodeType]:
+        """ the code of a .pyc entry - None if it is for another python or not for the source entry.
+            A timestamp .pyc is checked by the source size (the archive has no exact mtime). """
+        data = self.finder.read(name)
+        if data[:4] != MAGIC:
+            logg.debug("%s: bad magic", name)
+            return None
+        flags = int.from_bytes(data[4:8], "little")
+        if source is not None:
+            if flags & 1:
+                if flags & 2:
+                    expected = importlib.util.source_hash(self.finder.read(source.name))
+                    if data[8:16] != expected:
+                        logg.debug("%s: stale (source hash)", name)
+                        return None
+            elif int.from_bytes(data[12:16], "little") != source.usize & 0xFFFFFFFF:
+                logg.debug("%s: stale (source size)", name)
+                return None
+        code = marshal.loads(data[16:])
+        if not isinstance(code, types.CodeType):
+            return None
+        return code
+    def cachefile(self, info: ZZipInfo) -> str:
+        return os.path.join(self.finder.cachedir, "%s.%08x.%s.pyc" % (self.module.fullname, info.crc32, CACHE_TAG))
+    def cached(self, info: ZZipInfo) -> Optional[types.CodeType]:
+        if not self.finder.cachedir:
+            return None
+        try:
+            with open(self.cachefile(info), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if data[:4] != MAGIC:
+            return None
+        code = marshal.loads(data[4:])
+        return code if isinstance(code, types.CodeType) else None
+    def store(self, info: ZZipInfo, code: types.CodeType) -> None:
+        if not self.finder.cachedir:
+            return
+        cachefile = self.cachefile(info)
+        tmp = "%s.%i.tmp" % (cachefile, os.getpid())
+        try:
+            os.makedirs(self.finder.cachedir, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(MAGIC + marshal.dumps(code))
+            os.replace(tmp, cachefile)
+        except OSError as e:
+            logg.debug("can not cache %s: %s", cachefile, e)
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+def install(archive: str, prefix: str = "", bins: Optional[str] = None, cachedir: str = "") -> ZZipFinder:
+    """ put a finder for the archive in front of sys.meta_path """
+    finder = ZZipFinder(archive, prefix, bins, cachedir)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+def uninstall(finder: ZZipFinder) -> None:
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+    finder.close()
+
+if __name__ == "__main__":
+    import optparse
+    import runpy
+    _o = optparse.OptionParser("%prog [options] zipfile module [args...]")
+    _o.disable_interspersed_args()
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("-p", "--prefix", metavar="DIR", default="",
+                  help="the modules are in this directory of the archive [%default]")
+    _o.add_option("-c", "--cachedir", metavar="DIR", default="",
+                  help="keep the compiled code of source entries here [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if len(args) < 2:
+        _o.error("need a zipfile and a module to run")
+    install(args[0], opt.prefix, opt.bindir, opt.cachedir)
+    sys.argv = args[1:]
+    runpy.run_module(args[1], run_name="__main__", alter_sys=True)
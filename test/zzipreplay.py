@@ -0,0 +1,243 @@
+#! /usr/bin/env python3
+""" Replays a corpus of (malformed) zip files against all the access backends.
+    Every backend runs over every file in a process pool, each run with a
+    time limit and a memory limit. The outcomes are put into a matrix of
+    ok / error / timeout / crash / rss (the memory limit was hit). """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, Tuple, List, Dict, Any, Iterator
+import collections
+import logging
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+
+logg = logging.getLogger("replay")
+
+bindir = os.path.join("..", "bins")
+exeext = ""
+unzip = "unzip"
+TIMEOUT = 10.
+MEMLIMIT = 512 * 1024 * 1024
+MINSIZE = 5  # the zero-length markers of failed downloads
+
+# name -> args where {zip} is the archive and {dir} is the archive without .zip
+BACKENDS = collections.OrderedDict([
+    ("infozip-list", ["{unzip}", "-l", "{zip}"]),
+    ("infozip-cat", ["{unzip}", "-p", "{zip}"]),
+    ("unzzipdir-big", ["{bins}/unzzip-big", "-l", "{zip}"]),
+    ("unzzipdir-mem", ["{bins}/unzzip-mem", "-l", "{zip}"]),
+    ("unzzipdir-mix", ["{bins}/unzzip-mix", "-l", "{zip}"]),
+    ("unzzipdir-zap", ["{bins}/unzzip", "-l", "{zip}"]),
+    ("unzzipcat-big", ["{bins}/unzzip-big", "-p", "{zip}"]),
+    ("unzzipcat-mem", ["{bins}/unzzip-mem", "-p", "{zip}"]),
+    ("unzzipcat-mix", ["{bins}/unzzip-mix", "-p", "{zip}"]),
+    ("unzzipcat-zap", ["{bins}/unzzip", "-p", "{zip}"]),
+    ("zzdir", ["{bins}/zzdir", "{dir}"]),
+])
+OUTCOMES = ["ok", "error", "timeout", "crash", "rss"]
+CRASHES = [signal.SIGSEGV, signal.SIGBUS, signal.SIGABRT, signal.SIGFPE, signal.SIGILL, signal.SIGTRAP]
+MARKS = {"ok": ".", "error": "E", "timeout": "T", "crash": "C", "rss": "M", "skip": "-"}
+
+Outcome = collections.namedtuple("Outcome", ["filename", "backend", "outcome", "returncode", "wall", "maxrss_kb"])
+
+def which(exe: str) -> Optional[str]:
+    if os.sep in exe:
+        return exe if os.access(exe, os.X_OK) else None
+    for path in os.environ.get("PATH", "").split(os.pathsep):
+        found = os.path.join(path, exe)
+        if os.access(found, os.X_OK):
+            return found
+    return None
+
+def backend_args(backend: str, filename: str) -> Optional[List[str]]:
+    """ the command for the backend - or None if its binary is missing """
+    base = filename[:-len(".zip")] if filename.endswith(".zip") else filename
+    args = [arg.format(zip=filename, dir=base, bins=bindir, unzip=unzip) for arg in BACKENDS[backend]]
+    if args[0].startswith(bindir) and exeext:
+        args[0] += exeext
+    exe = which(args[0])
+    if not exe:
+        return None
+    return [exe] + args[1:]
+
+def tool_env(exe: str) -> Dict[str, str]:
+    """ LD_LIBRARY_PATH to the zzip/.libs of the build tree (like zziptests.shell) """
+    env = os.environ.copy()
+    build_lib = os.path.dirname(os.path.realpath(exe))
+    for up in range(3):
+        libs = os.path.join(build_lib, "zzip", ".libs")
+        if os.path.isdir(libs):
+            env["LD_LIBRARY_PATH"] = libs
+            break
+        build_lib = os.path.dirname(build_lib)
+    return env
+
+def exitcode(status: int) -> int:
+    """ the returncode of a wait status (os.waitstatus_to_exitcode is python 3.9) """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def replay_run(args: List[str], timeout: float = TIMEOUT, memlimit: int = MEMLIMIT) -> Tuple[str, int, float, int]:
+    """ run one backend with the limits - returns (outcome, returncode, wall, maxrss_kb).
+        A max RSS over the memory limit is reported as "rss". Twice the limit is set as
+        RLIMIT_DATA to stop runaway allocations (mmapped zip files are not counted). """
+    env = tool_env(args[0])
+    started = time.monotonic()
+    pid = os.fork()
+    if not pid:
+        try:
+            null = os.open(os.devnull, os.O_RDWR)
+            os.dup2(null, 0)
+            os.dup2(null, 1)
+            os.dup2(null, 2)
+            if memlimit:
+                resource.setrlimit(resource.RLIMIT_DATA, (2 * memlimit, 2 * memlimit))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            os.execve(args[0], args, env)
+        finally:
+            os._exit(127)
+    expired = threading.Event()
+    def kill() -> None:
+        expired.set()
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        _, status, usage = os.wait4(pid, 0)
+    finally:
+        timer.cancel()
+    wall = time.monotonic() - started
+    maxrss = int(usage.ru_maxrss)
+    returncode = exitcode(status)
+    if expired.is_set():
+        outcome = "timeout"
+    elif memlimit and maxrss * 1024 > memlimit:
+        outcome = "rss"
+    elif returncode < 0 and -returncode in CRASHES:
+        outcome = "crash"
+    elif returncode:
+        outcome = "error"
+    else:
+        outcome = "ok"
+    return outcome, returncode, wall, maxrss
+
+def replay_task(task: Tuple[str, str, float, int]) -> Outcome:
+    filename, backend, timeout, memlimit = task
+    args = backend_args(backend, filename)
+    if not args:
+        return Outcome(filename, backend, "skip", 0, 0., 0)
+    outcome, returncode, wall, maxrss = replay_run(args, timeout, memlimit)
+    if outcome not in ["ok", "error"]:
+        logg.warning("%s %s: %s (%s)", backend, filename, outcome, returncode)
+    return Outcome(filename, backend, outcome, returncode, wall, maxrss)
+
+def corpus(paths: List[str], minsize: int = MINSIZE) -> Iterator[str]:
+    """ the files in these directories (recursively) """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                filename = os.path.join(dirpath, name)
+                if os.path.getsize(filename) >= minsize:
+                    yield filename
+
+def replay(filenames: List[str], backends: List[str], jobs: int = 0,
+           timeout: float = TIMEOUT, memlimit: int = MEMLIMIT) -> List[Outcome]:
+    tasks = [(filename, backend, timeout, memlimit) for filename in filenames for backend in backends]
+    if jobs == 1:
+        return [replay_task(task) for task in tasks]
+    pool = multiprocessing.Pool(jobs or None)
+    try:
+        results = list(pool.imap_unordered(replay_task, tasks, chunksize=4))
+    finally:
+        pool.close()
+        pool.join()
+    order = dict([((task[0], task[1]), num) for num, task in enumerate(tasks)])
+    results.sort(key=lambda item: order[(item.filename, item.backend)])
+    return results
+
+def matrix(results: List[Outcome]) -> Dict[str, Any]:
+    """ the outcome per file and backend - and the counts per backend """
+    files: Dict[str, Dict[str, Any]] = collections.OrderedDict()
+    summary: Dict[str, Dict[str, int]] = collections.OrderedDict()
+    for item in results:
+        files.setdefault(item.filename, collections.OrderedDict())[item.backend] = {
+            "outcome": item.outcome, "returncode": item.returncode,
+            "wall": item.wall, "maxrss_kb": item.maxrss_kb}
+        counts = summary.setdefault(item.backend, collections.OrderedDict([(name, 0) for name in OUTCOMES]))
+        counts[item.outcome] = counts.get(item.outcome, 0) + 1
+    return {"files": files, "summary": summary}
+
+def matrix_text(results: List[Outcome], backends: List[str]) -> str:
+    """ one line per file with a mark per backend column """
+    marks: Dict[str, Dict[str, str]] = collections.OrderedDict()
+    for item in results:
+        marks.setdefault(item.filename, {})[item.backend] = MARKS.get(item.outcome, "?")
+    lines = []
+    for num, backend in enumerate(backends):
+        lines.append("%s%s" % ("| " * num, backend))
+    for filename, found in marks.items():
+        lines.append(" ".join([found.get(backend, " ") for backend in backends]) + "  " + filename)
+    lines.append("(%s)" % ", ".join(["%s=%s" % (mark, outcome) for outcome, mark in MARKS.items()]))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] corpusdir|zipfile...")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=bindir,
+                  help="path to the bindir to use [%default]")
+    _o.add_option("-E", "--exeext", metavar="EXT", default=exeext,
+                  help="the executable extension (automake $(EXEEXT)) [%default]")
+    _o.add_option("-U", "--unzip", metavar="EXE", default=unzip,
+                  help="name or path to infozip unzip [%default]")
+    _o.add_option("--backends", metavar="LIST", default=",".join(BACKENDS),
+                  help="the backends to run [%default]")
+    _o.add_option("-j", "--jobs", metavar="N", type="int", default=0,
+                  help="worker processes (0 = one per cpu) [%default]")
+    _o.add_option("-t", "--timeout", metavar="SECS", type="float", default=TIMEOUT,
+                  help="time limit per run [%default]")
+    _o.add_option("-m", "--memlimit", metavar="MB", type="int", default=MEMLIMIT // 1024 // 1024,
+                  help="memory limit per run (0 = none) [%default]")
+    _o.add_option("--fail-on", metavar="LIST", default="timeout,crash,rss",
+                  help="exit with an error on these outcomes [%default]")
+    _o.add_option("-o", "--output", metavar="FILE", default="",
+                  help="write the json matrix here [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    bindir = opt.bindir
+    exeext = opt.exeext
+    unzip = opt.unzip
+    backends = [backend for backend in opt.backends.split(",") if backend]
+    for backend in backends:
+        if backend not in BACKENDS:
+            _o.error("unknown backend %s" % backend)
+    if not args:
+        _o.error("no corpus given")
+    filenames = list(corpus(args))
+    started = time.monotonic()
+    results = replay(filenames, backends, opt.jobs, opt.timeout, opt.memlimit * 1024 * 1024)
+    logg.info("replayed %i files x %i backends in %.3fs", len(filenames), len(backends), time.monotonic() - started)
+    print(matrix_text(results, backends))
+    if opt.output:
+        with open(opt.output, "w") as f:
+            json.dump(matrix(results), f, indent=1)
+        logg.info("written %s", opt.output)
+    failing = opt.fail_on.split(",")
+    if [item for item in results if item.outcome in failing]:
+        sys.exit(1)
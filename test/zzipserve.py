@@ -0,0 +1,181 @@
+#! /usr/bin/env python3
+""" A small HTTP server for the entries of a zip archive over the ctypes binding.
+    The url path is looked up in the name index of the mapped archive (zzip_disk_index
+    or a valid sidecar, see zzipsidecar). Stored entries are sent with os.sendfile
+    from their data offset in the archive file. Deflated entries are streamed through
+    inflate - or served from the EntryCache when they are poorly compressed or a
+    range of them is requested. The ETag is the crc32 and size of the entry. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, Tuple, Any
+import email.utils
+import http.server
+import logging
+import mimetypes
+import os
+import re
+import sys
+import urllib.parse
+
+from zzipctypes import ZZipMapped, ZZipInfo, ZZipError, EntryCache, READSIZE
+from zzipctypes import ZZIP_IS_STORED, ZZIP_IS_DEFLATED
+from zzipsidecar import open_mapped
+
+logg = logging.getLogger("zzipserve")
+
+HOST = "127.0.0.1"
+PORT = 8080
+INDEX = "index.html"
+POOR = 0.9  # csize/usize over this is served from the cache
+CACHESIZE = 64 * 1024 * 1024
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def etag(info: ZZipInfo) -> str:
+    return '"%08x-%x"' % (info.crc32, info.usize)
+
+def byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """ the (start, end) of a single "bytes=" range - end is exclusive. Returns None
+        for a syntax that is ignored (like multiple ranges) and (size, size) for
+        an unsatisfiable range. """
+    matched = RANGE.match(header.strip())
+    if not matched or not (matched.group(1) or matched.group(2)):
+        return None
+    first, last = matched.group(1), matched.group(2)
+    if not first:
+        suffix = int(last)
+        if not suffix:
+            return size, size
+        return max(0, size - suffix), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or end <= start:
+        return size, size
+    return start, end
+
+class ZZipServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    def __init__(self, address: Tuple[str, int], archive: str, prefix: str = "",
+                 bins: Optional[str] = None, cachesize: int = CACHESIZE) -> None:
+        self.archive = os.path.abspath(archive)
+        self.prefix = prefix and prefix.strip("/") + "/"
+        self.zipped: ZZipMapped = open_mapped(self.archive, bins)
+        if self.zipped.sidecar is None:
+            self.zipped.index()
+        self.fd = os.open(self.archive, os.O_RDONLY)
+        self.cache = EntryCache(cachesize, cachesize // 4, "mapped", bins)
+        self.modified = email.utils.formatdate(os.fstat(self.fd).st_mtime, usegmt=True)
+        http.server.ThreadingHTTPServer.__init__(self, address, ZZipHandler)
+    def server_close(self) -> None:
+        http.server.ThreadingHTTPServer.server_close(self)
+        self.zipped.close()
+        os.close(self.fd)
+    def lookup(self, path: str) -> Optional[ZZipInfo]:
+        name = urllib.parse.unquote(urllib.parse.urlsplit(path).path).lstrip("/")
+        if not name or name.endswith("/"):
+            name += INDEX
+        try:
+            return self.zipped.info(self.prefix + name)
+        except ZZipError:
+            return None
+
+class ZZipHandler(http.server.BaseHTTPRequestHandler):
+    server: ZZipServer
+    server_version = "zzipserve"
+    def log_message(self, format: str, *args: Any) -> None:
+        logg.debug("%s %s", self.address_string(), format % args)
+    def do_HEAD(self) -> None:
+        self.serve(False)
+    def do_GET(self) -> None:
+        self.serve(True)
+    def serve(self, body: bool) -> None:
+        info = self.server.lookup(self.path)
+        if info is None:
+            self.send_error(404)
+            return
+        if info.compr not in [ZZIP_IS_STORED, ZZIP_IS_DEFLATED] or info.flags & 1:
+            self.send_error(501, "unsupported compression %i" % info.compr)
+            return
+        tag = etag(info)
+        if tag in [item.strip() for item in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.end_headers()
+            return
+        start, end = 0, info.usize
+        ranged = self.headers.get("Range")
+        if ranged and self.headers.get("If-Range", tag) == tag:
+            found = byte_range(ranged, info.usize)
+            if found == (info.usize, info.usize):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%i" % info.usize)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if found:
+                start, end = found
+        partial = (start, end) != (0, info.usize)
+        self.send_response(partial and 206 or 200)
+        self.send_header("Content-Type", mimetypes.guess_type(info.name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", tag)
+        self.send_header("Last-Modified", self.server.modified)
+        self.send_header("Accept-Ranges", "bytes")
+        if partial:
+            self.send_header("Content-Range", "bytes %i-%i/%i" % (start, end - 1, info.usize))
+        self.end_headers()
+        if not body or start == end:
+            return
+        if info.compr == ZZIP_IS_STORED:
+            self.sendfile(info.offset + start, end - start)
+        elif partial or info.csize >= info.usize * POOR:
+            self.wfile.write(self.server.cache.read(self.server.archive, info.name)[start:end])
+        else:
+            with self.server.zipped.open(info.name) as f:
+                while True:
+                    chunk = f.read(READSIZE)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+    def sendfile(self, offset: int, count: int) -> None:
+        """ from the archive file to the socket without a copy through python """
+        if not hasattr(os, "sendfile"):
+            self.wfile.write(self.server.zipped.buffer[offset:offset + count])
+            return
+        socket = self.connection.fileno()
+        while count > 0:
+            sent = os.sendfile(socket, self.server.fd, offset, count)
+            if not sent:
+                raise OSError("sendfile: connection closed")
+            offset += sent
+            count -= sent
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] zipfile")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("--host", metavar="ADDR", default=HOST,
+                  help="listen on this address [%default]")
+    _o.add_option("-p", "--port", metavar="PORT", type="int", default=PORT,
+                  help="listen on this port [%default]")
+    _o.add_option("--prefix", metavar="DIR", default="",
+                  help="serve the entries in this directory of the archive [%default]")
+    _o.add_option("--cache", metavar="MB", type="int", default=CACHESIZE // 1024 // 1024,
+                  help="the size of the cache for inflated entries [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if len(args) != 1:
+        _o.error("need one zipfile")
+    server = ZZipServer((opt.host, opt.port), args[0], opt.prefix, opt.bindir, opt.cache * 1024 * 1024)
+    logg.info("serving %s on http://%s:%i/", args[0], opt.host, server.server_address[1])
+    print("http://%s:%i/" % (opt.host, server.server_address[1]), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    sys.exit(0)
@@ -0,0 +1,306 @@
+#! /usr/bin/env python3
+""" A sidecar index for a zip archive - the central directory as it was seen by
+    zziplib, written once into a file next to the archive (".zzipidx"). The sidecar
+    has a hash table on the entry names and a fixed-size record per entry (offsets,
+    sizes, crc32, compression method). It is only used while the archive has the
+    same size, mtime and central directory offset as at the time of writing - a
+    stale sidecar is ignored.
+
+    On the python side open_mapped() attaches it to a ZZipMapped (see zzipctypes)
+    so that its info, names and infolist map the sidecar instead of walking the
+    central directory. In the C library it is opt-in: zzip_mem_disk_open_sidecar
+    makes the entries of a ZZIP_MEM_DISK from the sidecar records (open_memdisk
+    here) - the other open functions (zzip_open, zzip_disk_open, zzip_mem_disk_open)
+    do not know about it and still parse the central directory on each open. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Tuple, Any
+import errno
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+from zzipctypes import ZZipMapped, ZZipMemDisk, ZZipInfo, ZZipError
+
+logg = logging.getLogger("zzipsidecar")
+
+SUFFIX = ".zzipidx"
+MAGIC = b"ZZIPIDX1"
+VERSION = 1
+# magic, version, recordsize, archive size, archive mtime_ns, cd offset, cd size,
+# count, slots, records offset, slots offset, names offset, names size
+HEADER = struct.Struct("<8sHHQqQQIIQQQQ")
+HEADERSIZE = 128
+# cd offset, data offset, csize, usize, name offset, name length, crc32, name hash, compr, flags
+RECORD = struct.Struct("<QQQQQIIIHH")
+RECORD_NAME = struct.Struct("<32xQIII")  # name offset, name length, crc32, name hash
+SLOT = struct.Struct("<I")
+CD_ENTRY = struct.Struct("<4s24xHHH12x")  # magic, namlen, extras, comment (46 bytes)
+CD_MAGIC = b"PK\x01\x02"
+CD_ENDS = [b"PK\x05\x06", b"PK\x06\x06"]
+
+def sidecar_path(archive: str) -> str:
+    return archive + SUFFIX
+
+def name_hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+def slots_for(count: int) -> int:
+    slots = 16
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+def directory(zipped: ZZipMapped) -> Tuple[int, int, List[Tuple[int, ZZipInfo]]]:
+    """ the central directory (offset, size) and its entries as zziplib sees them """
+    entries = [(entry - zipped.base, zipped.entry_info(entry)) for entry in zipped.entries()]
+    if not entries:
+        return 0, 0, entries
+    first = entries[0][0]
+    last = entries[-1][0]
+    _, namlen, extras, comment = CD_ENTRY.unpack_from(zipped.buffer, last)
+    return first, last + CD_ENTRY.size + namlen + extras + comment - first, entries
+
+def generate(archive: str, bins: Optional[str] = None) -> bytes:
+    """ the sidecar content for the archive """
+    status = os.stat(archive)
+    with ZZipMapped(archive, bins) as zipped:
+        cd_offset, cd_size, entries = directory(zipped)
+    count = len(entries)
+    slots = slots_for(count)
+    table = [0] * slots
+    records = bytearray()
+    names = bytearray()
+    for num, (cdoff, info) in enumerate(entries):
+        name = os.fsencode(info.name)
+        hashed = name_hash(name)
+        records += RECORD.pack(cdoff, info.offset, info.csize, info.usize, len(names), len(name),
+                               info.crc32, hashed, info.compr, info.flags)
+        names += name + b"\0"
+        pos = hashed & (slots - 1)
+        while table[pos]:
+            known = entries[table[pos] - 1][1]
+            if os.fsencode(known.name) == name:
+                break  # the first of duplicate names wins
+            pos = (pos + 1) & (slots - 1)
+        else:
+            table[pos] = num + 1
+    records_offset = HEADERSIZE
+    slots_offset = records_offset + len(records)
+    names_offset = slots_offset + slots * SLOT.size
+    header = HEADER.pack(MAGIC, VERSION, RECORD.size, status.st_size, status.st_mtime_ns, cd_offset, cd_size,
+                         count, slots, records_offset, slots_offset, names_offset, len(names))
+    return header.ljust(HEADERSIZE, b"\0") + bytes(records) + struct.pack("<%iI" % slots, *table) + bytes(names)
+
+def write(archive: str, sidecar: Optional[str] = None, bins: Optional[str] = None) -> str:
+    """ (re)generate the sidecar - it is replaced atomically for concurrent readers """
+    sidecar = sidecar or sidecar_path(archive)
+    data = generate(archive, bins)
+    tmp = "%s.%i.tmp" % (sidecar, os.getpid())
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, sidecar)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    logg.info("written %s (%i bytes)", sidecar, len(data))
+    return sidecar
+
+class Sidecar:
+    """ a mapped sidecar - use Sidecar.load() which returns None if it is missing or stale """
+    def __init__(self, archive: str, sidecar: str, mapped: mmap.mmap) -> None:
+        self.archive = archive
+        self.sidecar = sidecar
+        self.mapped: Optional[mmap.mmap] = mapped
+        (magic, version, recordsize, self.archive_size, self.archive_mtime_ns, self.cd_offset, self.cd_size,
+         self.count, self.slots, self.records_offset, self.slots_offset, self.names_offset,
+         self.names_size) = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION or recordsize != RECORD.size:
+            raise ZZipError(errno.EINVAL, "not a sidecar of version %i" % VERSION, sidecar)
+        if self.names_offset + self.names_size > len(mapped) or self.slots & (self.slots - 1):
+            raise ZZipError(errno.EINVAL, "truncated sidecar", sidecar)
+    @classmethod
+    def load(cls, archive: str, sidecar: Optional[str] = None) -> Optional["Sidecar"]:
+        sidecar = sidecar or sidecar_path(archive)
+        try:
+            with open(sidecar, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logg.debug("no sidecar %s: %s", sidecar, e)
+            return None
+        try:
+            found = cls(archive, sidecar, mapped)
+        except (ZZipError, struct.error) as e:
+            logg.warning("bad sidecar %s: %s", sidecar, e)
+            mapped.close()
+            return None
+        problem = found.stale()
+        if problem:
+            logg.info("stale sidecar %s: %s", sidecar, problem)
+            found.close()
+            return None
+        return found
+    def stale(self) -> str:
+        """ the reason why the sidecar does not describe the archive (or empty if it does) """
+        try:
+            status = os.stat(self.archive)
+            if status.st_size != self.archive_size:
+                return "archive size %i (expected %i)" % (status.st_size, self.archive_size)
+            if status.st_mtime_ns != self.archive_mtime_ns:
+                return "archive mtime changed"
+            if not self.count:
+                return ""
+            if self.cd_offset + self.cd_size + 4 > status.st_size:
+                return "central directory out of range"
+            fd = os.open(self.archive, os.O_RDONLY)
+            try:
+                if os.pread(fd, 4, self.cd_offset) != CD_MAGIC:
+                    return "no central directory at %i" % self.cd_offset
+                if os.pread(fd, 4, self.cd_offset + self.cd_size) not in CD_ENDS:
+                    return "no central directory end at %i" % (self.cd_offset + self.cd_size)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            return str(e)
+        return ""
+    def close(self) -> None:
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+    def __enter__(self) -> "Sidecar":
+        return self
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    def __len__(self) -> int:
+        return int(self.count)
+    def record(self, num: int, name: Optional[bytes] = None) -> ZZipInfo:
+        assert self.mapped is not None
+        (cdoff, dataoff, csize, usize, nameoff, namelen, crc32, hashed,
+         compr, flags) = RECORD.unpack_from(self.mapped, self.records_offset + num * RECORD.size)
+        if name is None:
+            start = self.names_offset + nameoff
+            name = self.mapped[start:start + namelen]
+        return ZZipInfo(os.fsdecode(name), flags, compr, crc32, csize, usize, dataoff)
+    def find(self, name: str) -> Optional[ZZipInfo]:
+        """ the entry by its name - an O(1) lookup in the hash table """
+        assert self.mapped is not None
+        encoded = os.fsencode(name)
+        hashed = name_hash(encoded)
+        mask = self.slots - 1
+        pos = hashed & mask
+        while True:
+            num = SLOT.unpack_from(self.mapped, self.slots_offset + pos * SLOT.size)[0]
+            if not num:
+                return None
+            offset = self.records_offset + (num - 1) * RECORD.size
+            nameoff, namelen, _, known = RECORD_NAME.unpack_from(self.mapped, offset)
+            if known == hashed and namelen == len(encoded):
+                start = self.names_offset + nameoff
+                if self.mapped[start:start + namelen] == encoded:
+                    return self.record(num - 1, encoded)
+            pos = (pos + 1) & mask
+    def infolist(self) -> List[ZZipInfo]:
+        """ all entries in the order of the central directory """
+        return [self.record(num) for num in range(self.count)]
+
+def open_mapped(archive: str, bins: Optional[str] = None, sidecar: Optional[str] = None) -> ZZipMapped:
+    """ a ZZipMapped that answers lookups from a valid sidecar (if there is one) """
+    return ZZipMapped(archive, bins, Sidecar.load(archive, sidecar))
+
+def open_memdisk(archive: str, bins: Optional[str] = None, sidecar: Optional[str] = None) -> ZZipMemDisk:
+    """ a ZZipMemDisk from zzip_mem_disk_open_sidecar (which parses the archive if the sidecar is stale) """
+    return ZZipMemDisk(archive, bins, sidecar or sidecar_path(archive))
+
+def verify(archive: str, sidecar: Optional[str] = None, bins: Optional[str] = None) -> str:
+    """ the problem with the sidecar (or empty if it is valid) - it is compared
+        with a freshly generated one as the archive could be changed in place """
+    sidecar = sidecar or sidecar_path(archive)
+    found = Sidecar.load(archive, sidecar)
+    if found is None:
+        return "missing or stale sidecar"
+    found.close()
+    with open(sidecar, "rb") as f:
+        if f.read() != generate(archive, bins):
+            return "sidecar differs from the archive"
+    return ""
+
+def timing(archive: str, lookups: int = 100, repeat: int = 5, bins: Optional[str] = None) -> List[Tuple[str, float]]:
+    """ best-of time to open the archive and look up some names - with and without the sidecar """
+    with ZZipMapped(archive, bins) as zipped:
+        names = zipped.names()
+    names = names[::max(1, len(names) // lookups)][:lookups]
+    def mem_open() -> None:
+        with ZZipMemDisk(archive, bins) as zipped:
+            for name in names:
+                zipped.findfile(name)
+    def mapped_open() -> None:
+        with ZZipMapped(archive, bins) as zipped:
+            for name in names:
+                zipped.info(name)
+    def mem_sidecar_open() -> None:
+        with open_memdisk(archive, bins) as zipped:
+            for name in names:
+                zipped.findfile(name)
+    def sidecar_open() -> None:
+        found = Sidecar.load(archive)
+        if found is None:
+            raise ZZipError(errno.ENOENT, "no valid sidecar", sidecar_path(archive))
+        with found:
+            for name in names:
+                found.find(name)
+    results = []
+    for title, func in [("zzip_mem_disk_open", mem_open), ("zzip_mem_disk_open_sidecar", mem_sidecar_open),
+                        ("zzip_disk_buffer", mapped_open), ("sidecar", sidecar_open)]:
+        best = 0.
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            took = time.perf_counter() - started
+            best = min(best, took) if best else took
+        results.append((title, best))
+    return results
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] generate|verify|timing zipfile...",
+                               description="The sidecar is used by the ctypes binding (open_mapped) and by "
+                               "zzip_mem_disk_open_sidecar - the other open functions of the C library "
+                               "do not read it.")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("-o", "--sidecar", metavar="FILE", default="",
+                  help="the sidecar path (for one zipfile) [zipfile%s]" % SUFFIX)
+    _o.add_option("--lookups", metavar="N", type="int", default=100,
+                  help="names to look up in timing [%default]")
+    _o.add_option("--repeat", metavar="N", type="int", default=5,
+                  help="best of N runs in timing [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if len(args) < 2:
+        _o.error("need a command and a zipfile")
+    command, archives = args[0], args[1:]
+    if opt.sidecar and len(archives) > 1:
+        _o.error("--sidecar is for one zipfile")
+    failed = 0
+    for archive in archives:
+        if command == "generate":
+            print(write(archive, opt.sidecar or None, opt.bindir))
+        elif command == "verify":
+            problem = verify(archive, opt.sidecar or None, opt.bindir)
+            print("%s: %s" % (archive, problem or "OK"))
+            if problem:
+                failed += 1
+        elif command == "timing":
+            for title, took in timing(archive, opt.lookups, opt.repeat, opt.bindir):
+                print("%s: %-26s %.6fs" % (archive, title, took))
+        else:
+            _o.error("unknown command %s" % command)
+    sys.exit(1 if failed else 0)
@@ -1,5 +1,5 @@
 #! /usr/bin/env python3
-from typing import Union, Optional, Tuple, List, Dict, Sequence, Iterator, cast
+from typing import Union, Optional, Tuple, List, Dict, Set, Sequence, Iterator, Type, Any, cast
 import unittest
 import subprocess
 import logging
@@ -11,6 +11,14 @@ import shutil
 import random
 import re
 import errno
+import shlex
+import time
+import json
+import tempfile
+import hashlib
+import traceback
+import multiprocessing
+import threading
 from fnmatch import fnmatchcase as matches
 
 try:
@@ -39,7 +47,18 @@ exeext = ""
 bindir = os.path.join("..", "bins")
 downloaddir = "tmp.download"
 downloadonly = False
+downloadmirror = os.environ.get("ZZIP_TESTMIRROR", "")
+downloadmanifest = ""  # default is downloads.json in the downloaddir
 nodownloads = False
+fixturesdir = "tmp.fixtures"
+refresh_fixtures = False
+RUSAGE: Optional[Dict[str, List[Dict[str, Any]]]] = None  # per test - when enabled
+RUSAGE_WARN_WALL = 10.
+RUSAGE_WARN_MAXRSS = 512 * 1024
+RESULTCACHE = ""  # the results file - when enabled
+RESULTS: Dict[str, Dict[str, Any]] = {}  # the cached passes of the last run
+DEPENDS: Dict[str, Set[str]] = {}  # per test - the files it used in this run
+UNCACHED = ""  # in the DEPENDS of a test - its files are not known
 KEEP = False
 
 def yesno(text: str) -> bool:
@@ -63,6 +82,256 @@ def decodes(text: Union[str, bytes]) -> str:
 def shell_string(command: List[str]) -> str:
     return " ".join(["'%s'" % arg.replace("'", "\\'") for arg in command])
 
+_tool_versions: Dict[str, str] = {}
+def tool_version(exe: str) -> str:
+    """ the first lines of 'exe -v' (the zip version) - memoized """
+    if exe not in _tool_versions:
+        run = subprocess.Popen([exe, "-v"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        out, err = run.communicate()
+        _tool_versions[exe] = "\n".join(decodes(out).split("\n")[:3])
+    return _tool_versions[exe]
+
+GENTEXT_SEED = 1234567891234567890
+GENTEXT_CHARS = "       abcdefghijklmnopqrstuvwxyz\n"
+GENTEXT_BULK = 0x10000
+
+def gentext_chars(size: int) -> str:
+    """ the original generator - each char by random.choice not repeating the last two """
+    random.seed(GENTEXT_SEED)
+    result = StringIO()
+    old1 = ''
+    old2 = ''
+    for i in range(size):
+        while True:
+            x = random.choice(GENTEXT_CHARS)
+            if x == old1 or x == old2: continue
+            old1 = old2
+            old2 = x
+            break
+        result.write(x)
+    return cast(str, result.getvalue())
+
+# random.choice(GENTEXT_CHARS) takes the top 6 bits of a 32bit mersenne twister
+# word (the fourth byte of the little-endian getrandbits) and retries if >= 34.
+GENTEXT_TABLE = bytes([(b >> 2) < len(GENTEXT_CHARS) and ord(GENTEXT_CHARS[b >> 2]) or 0 for b in range(256)])
+GENTEXT_DELETE = bytes([b for b in range(256) if (b >> 2) >= len(GENTEXT_CHARS)])
+
+class GenText:
+    """ gentext_chars as one master sequence being extended in bulk """
+    def __init__(self) -> None:
+        self.random = random.Random(GENTEXT_SEED)
+        self.chars: List[str] = []
+        self.text = ""
+        self.old1 = ""
+        self.old2 = ""
+    def extend(self, size: int) -> None:
+        chars = self.chars
+        old1, old2 = self.old1, self.old2
+        while len(chars) < size:
+            words = self.random.getrandbits(32 * GENTEXT_BULK).to_bytes(4 * GENTEXT_BULK, "little")
+            choices = words[3::4].translate(GENTEXT_TABLE, GENTEXT_DELETE).decode("ascii")
+            for x in choices:
+                if x == old1 or x == old2: continue
+                old1 = old2
+                old2 = x
+                chars.append(x)
+        self.old1, self.old2 = old1, old2
+        self.text = "".join(chars)
+    def __call__(self, size: int) -> str:
+        if len(self.text) < size:
+            self.extend(size)
+        return self.text[:size]
+
+gentext = GenText()
+
+SHELL_META = set("|&;<>()$`\\\"'*?[]{}#~%\n")
+def shell_split(command: str) -> Optional[List[str]]:
+    """ the args of a simple command that can run without /bin/sh """
+    if SHELL_META & set(command):
+        return None
+    args = shlex.split(command)
+    if not args or "=" in args[0]:
+        return None
+    return args
+
+def rusage_popen(command: List[str], shell: bool, sh_command: str, **kwargs: Any) -> Tuple["subprocess.Popen[bytes]", bool]:
+    """ a split command (shell=False) that can not be started is run by the shell to report it """
+    try:
+        return subprocess.Popen(command, shell=shell, **kwargs), shell
+    except OSError:
+        if shell: raise
+        return subprocess.Popen([sh_command], shell=True, **kwargs), True
+
+def exitcode(status: int) -> int:
+    """ the returncode of a wait status (os.waitstatus_to_exitcode is python 3.9) """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def rusage_wait(run: "subprocess.Popen[bytes]") -> Any:
+    """ reap the child with os.wait4 (instead of run.wait) to get its resource.struct_rusage """
+    _, status, usage = os.wait4(run.pid, 0)
+    run.returncode = exitcode(status)
+    return usage
+
+def get_test_name() -> str:
+    """ the test_xxx function running this (or the empty string) """
+    frame = inspect.currentframe()
+    while frame:
+        if frame.f_code.co_name.startswith("test_"):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return ""
+
+def rusage_record(usage: Any, sh_command: str, returncode: int, wall: float, shell: bool) -> None:
+    if RUSAGE is None:
+        return
+    item = {"command": sh_command, "shell": shell, "returncode": returncode, "wall": wall,
+            "user": usage.ru_utime, "sys": usage.ru_stime, "maxrss_kb": usage.ru_maxrss,
+            "inblock": usage.ru_inblock, "oublock": usage.ru_oublock}
+    RUSAGE.setdefault(get_test_name(), []).append(item)
+    if wall > RUSAGE_WARN_WALL or usage.ru_maxrss > RUSAGE_WARN_MAXRSS:
+        logg.warning("%.3fs %iKB: %s", wall, usage.ru_maxrss, sh_command)
+
+def rusage_summary(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """ the sum of the times and block io and the max of the RSS of all calls in a test """
+    summary: Dict[str, Any] = {"calls": len(items)}
+    for name in ["wall", "user", "sys", "inblock", "oublock"]:
+        summary[name] = sum([item[name] for item in items])
+    summary["maxrss_kb"] = max([item["maxrss_kb"] for item in items] + [0])
+    summary["commands"] = items
+    return summary
+
+def rusage_report(resources: Dict[str, List[Dict[str, Any]]], filename: str) -> None:
+    """ the json sidecar - the ru_maxrss of a child does not go below the RSS of
+        this python process, so that floor is reported as well """
+    floor = rusage_wait(subprocess.Popen(["true"], stdout=subprocess.DEVNULL))
+    tests = dict([(testname, rusage_summary(items)) for testname, items in resources.items()])
+    data = {"maxrss_floor_kb": floor.ru_maxrss, "tests": tests}
+    with open(filename, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    logg.info("resource usage into %s", filename)
+
+def rusage_filename(xmlresults: str) -> str:
+    return os.path.splitext(xmlresults)[0] + ".rusage.json"
+
+# result cache ...............................................
+def sha256sum(filename: str) -> str:
+    md = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            md.update(block)
+    return md.hexdigest()
+
+_filehashes: Dict[Tuple[str, int, int], str] = {}
+def filehash(filename: str) -> str:
+    """ sha256 of the file - memoized by name, size and mtime """
+    if not os.path.isfile(filename):
+        return ""
+    stat = os.stat(filename)
+    key = (filename, stat.st_size, stat.st_mtime_ns)
+    if key not in _filehashes:
+        _filehashes[key] = sha256sum(filename)
+    return _filehashes[key]
+
+def library_files(exe: str) -> List[str]:
+    """ the zzip libraries of the build tree - and the real binary of a libtool wrapper """
+    found = []
+    bins_dir = os.path.dirname(os.path.realpath(exe))
+    libtool_exe = os.path.join(bins_dir, ".libs", os.path.basename(exe))
+    if os.path.isfile(libtool_exe):
+        found.append(libtool_exe)
+    for libs in [os.path.join(os.path.dirname(bins_dir), "zzip"), os.path.join(os.path.dirname(bins_dir), "zzip", ".libs")]:
+        if os.path.isdir(libs):
+            for name in sorted(os.listdir(libs)):
+                if name.startswith("libzzip") and (".so" in name or name.endswith(".dylib") or name.endswith(".dll")):
+                    found.append(os.path.realpath(os.path.join(libs, name)))
+    return found
+
+def depends(filename: str, testname: str = "") -> None:
+    """ declare that the running test uses this file (binary, library or input) """
+    if not RESULTCACHE:
+        return
+    testname = testname or get_test_name()
+    if not testname or fixture_test(testname):
+        return
+    if os.path.isfile(filename):
+        DEPENDS.setdefault(testname, set()).add(os.path.realpath(filename))
+
+def depends_args(args: List[str], cwd: Optional[str] = None) -> None:
+    """ the args that are files - relative to the cwd or the dir of a "cd DIR" before them """
+    if not RESULTCACHE:
+        return
+    testname = get_test_name()
+    changedir = False
+    for arg in args:
+        if changedir:
+            changedir = False
+            if SHELL_META & set(arg):
+                DEPENDS.setdefault(testname, set()).add(UNCACHED)  # a cd that we can not follow
+                return
+            cwd = os.path.join(cwd or "", arg)
+        elif arg == "cd":
+            changedir = True
+        elif not arg.startswith("-"):
+            depends(os.path.join(cwd or "", arg), testname)
+
+_helpers_source = ""
+def helpers_source() -> str:
+    """ this file without the test methods - a change to a shared helper (like shell,
+        cached_fixture, gentext or uses_bins) does invalidate all cached results """
+    global _helpers_source
+    if not _helpers_source:
+        with open(os.path.abspath(__file__), encoding="utf-8") as f:
+            text = f.read()
+        for classname in sorted(list(globals())):
+            if classname.endswith("Test"):
+                for name, method in sorted(globals()[classname].__dict__.items()):
+                    if name.startswith("test_"):
+                        text = text.replace(inspect.getsource(method), "")
+        _helpers_source = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return _helpers_source
+
+def test_source(testname: str) -> str:
+    """ a hash over the source of the test method and of the helpers """
+    for classname in sorted(list(globals())):
+        if classname.endswith("Test") and hasattr(globals()[classname], testname):
+            method = getattr(globals()[classname], testname)
+            source = helpers_source() + inspect.getsource(method)
+            return hashlib.sha256(source.encode("utf-8")).hexdigest()
+    return ""
+
+def cached_pass(testname: str) -> bool:
+    """ the test passed in the last run and its source and dependencies did not change """
+    entry = RESULTS.get(testname)
+    if not entry or not entry.get("files"):
+        return False
+    if entry.get("source") != test_source(testname):
+        return False
+    for filename, hashed in entry["files"].items():
+        if filehash(filename) != hashed:
+            return False
+    return True
+
+def results_load(filename: str) -> Dict[str, Dict[str, Any]]:
+    if not filename or not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return cast(Dict[str, Dict[str, Any]], json.load(f))
+
+def results_save(filename: str, passed: List[str], failed: List[str], depends: Dict[str, Set[str]]) -> None:
+    """ add the passed tests (that used some files) and drop the failed ones """
+    results = results_load(filename)
+    for testname in failed:
+        results.pop(testname, None)
+    for testname in passed:
+        if testname in depends and UNCACHED not in depends[testname]:
+            results[testname] = {"source": test_source(testname),
+                                 "files": dict([(name, filehash(name)) for name in sorted(depends[testname])])}
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    logg.info("results cache %s (%i tests)", filename, len(results))
+
 Shell = collections.namedtuple("Shell", ["returncode", "output", "errors", "shell"])
 def shell(command: Union[str, List[str]], shell: bool = True,  # ..
           # ..
@@ -71,9 +340,16 @@ def shell(command: Union[str, List[str]], shell: bool = True,  # ..
     returncodes = returncodes or [None, 0]
     if isinstance(command, basestring):
         sh_command = command
-        command = [command]
+        args = RUSAGE is not None and shell and shell_split(command)
+        if args:  # the rusage of the command itself - not of a /bin/sh around it
+            command = args
+            shell = False
+        else:
+            command = [command]
     else:
         sh_command = shell_string(command)
+    if RESULTCACHE:
+        depends_args(shell_split(sh_command) or sh_command.split(), cwd)
     if not env:
         env = os.environ.copy()
     if lang:
@@ -95,7 +371,24 @@ def shell(command: Union[str, List[str]], shell: bool = True,  # ..
         env["LD_LIBRARY_PATH"] = build_lib3 + zzip_libs
     try:
         output, errors = "", ""
-        if calls:
+        if RUSAGE is not None:
+            logg.debug("%s from %s: %s", calls and "result" or "output", cwd and cwd + "/" or "shell", sh_command)
+            started = time.monotonic()
+            if calls:
+                run, shell = rusage_popen(command, shell, sh_command, cwd=cwd, env=env)
+                usage = rusage_wait(run)
+            else:
+                # not through pipes - communicate() would reap the child before os.wait4
+                with tempfile.TemporaryFile() as outfile, tempfile.TemporaryFile() as errfile:
+                    run, shell = rusage_popen(command, shell, sh_command, cwd=cwd,
+                                              stdout=outfile, stderr=errfile, stdin=None, env=env)
+                    usage = rusage_wait(run)
+                    outfile.seek(0)
+                    errfile.seek(0)
+                    output = decodes(outfile.read())
+                    errors = decodes(errfile.read())
+            rusage_record(usage, sh_command, run.returncode, time.monotonic() - started, shell)
+        elif calls:
             logg.debug("result from %s: %s", cwd and cwd + "/" or "shell", sh_command)
             run = subprocess.Popen(command, shell=shell, cwd=cwd, env=env)
             if run.returncode:
@@ -144,6 +437,63 @@ def get_caller_caller_name() -> str:
     frame = inspect.currentframe().f_back.f_back.f_back  # type: ignore[union-attr]
     return frame.f_code.co_name  # type: ignore[union-attr]
 
+_manifest_lock = threading.Lock()
+def manifest_file() -> str:
+    return downloadmanifest or os.path.join(downloaddir, "downloads.json")
+
+def manifest_entries() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """ the url, filename, sha256 and size of the downloads that were verified before """
+    entries: Dict[Tuple[str, str], Dict[str, Any]] = collections.OrderedDict()
+    filename = manifest_file()
+    if os.path.exists(filename):
+        with open(filename) as f:
+            for entry in json.load(f):
+                entries[(entry["url"], entry["filename"])] = entry
+    return entries
+
+def manifest_record(base_url: str, filename: str, subfile: str) -> None:
+    """ the first complete download of a file - later copies are checked against it """
+    with _manifest_lock:
+        entries = manifest_entries()
+        if (base_url, filename) in entries:
+            return
+        entries[(base_url, filename)] = {"url": base_url, "filename": filename,
+                                         "sha256": sha256sum(subfile), "size": os.path.getsize(subfile)}
+        items = sorted(entries.values(), key=lambda entry: (entry["url"], entry["filename"]))
+        manifest = manifest_file()
+        tmpfile = manifest + ".tmp%i" % os.getpid()
+        with open(tmpfile, "w") as f:
+            f.write("[\n" + ",\n".join([json.dumps(entry, sort_keys=True) for entry in items]) + "\n]\n")
+        os.replace(tmpfile, manifest)
+        logg.debug("recorded %s in %s", subfile, manifest)
+
+def download_problem(subfile: str, base_url: str, filename: str) -> Optional[str]:
+    """ a file that does not match the manifest - None when it does or when it is not known yet """
+    entry = manifest_entries().get((base_url, filename))
+    if not entry:
+        return None
+    size = os.path.getsize(subfile)
+    if size != entry["size"]:
+        return "has %i bytes (expected %i)" % (size, entry["size"])
+    if sha256sum(subfile) != entry["sha256"]:
+        return "has a different sha256 (expected %s)" % entry["sha256"]
+    return None
+
+def download_mirror(base_url: str, filename: str, subfile: str) -> bool:
+    """ copy from the local mirror - in the tmp.download layout or just by filename """
+    if not downloadmirror:
+        return False
+    for srcfile in [os.path.join(downloadmirror, quote_plus(base_url), filename),
+                    os.path.join(downloadmirror, filename)]:
+        if os.path.exists(srcfile) and os.path.getsize(srcfile) >= 5:
+            problem = download_problem(srcfile, base_url, filename)
+            if problem:
+                raise IOError("corrupt mirror %s %s" % (srcfile, problem))
+            shutil.copy(srcfile, subfile)
+            logg.debug("mirror %s", srcfile)
+            return True
+    return False
+
 def download_raw(base_url: str, filename: str, into: Optional[str], style: str = "?raw=true") -> Union[None, bool, str]:
     return download(base_url, filename, into, style)
 def download(base_url: str, filename: str, into: Optional[str] = None, style: str = "") -> Union[None, bool, str]:
@@ -151,33 +501,48 @@ def download(base_url: str, filename: str, into: Optional[str] = None, style: st
         return False
     data = downloaddir
     if not os.path.isdir(data):
-        os.makedirs(data)
+        os.makedirs(data, exist_ok=True)
     subname = quote_plus(base_url)
     subdir = os.path.join(data, subname)
     if not os.path.isdir(subdir):
-        os.makedirs(subdir)
+        os.makedirs(subdir, exist_ok=True)
     subfile = os.path.join(subdir, filename)
+    if os.path.exists(subfile):
+        problem = download_problem(subfile, base_url, filename)
+        if problem:
+            logg.warning("%s %s - getting it again", subfile, problem)
+            os.remove(subfile)
     if not os.path.exists(subfile) and "---" in base_url:
         my_downloads = os.path.expanduser("~/Downloads")
         srcfile = os.path.join(my_downloads, filename)
         if os.path.exists(srcfile):
             shutil.copy(srcfile, subfile)
+    if not os.path.exists(subfile):
+        download_mirror(base_url, filename, subfile)
     if not os.path.exists(subfile):
         logg.info("need %s", subfile)
+        tmpfile = subfile + ".tmp%i" % os.getpid()
         try:
             url = base_url + "/" + filename + style
             url = url.replace("/blob/", "/raw/")
             logg.info("curl %s", url)
-            urlretrieve(url, subfile)
+            urlretrieve(url, tmpfile)
+            os.replace(tmpfile, subfile)
         except:
             # Ensure zero-length file exists in case we couldn't
             # download the file so that we won't try to
             # re-download it.
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
             open(subfile, 'a').close()
     if not os.path.exists(subfile):
         return None
+    problem = download_problem(subfile, base_url, filename)
+    if problem:
+        raise IOError("corrupt download %s %s" % (subfile, problem))
     if os.path.getsize(subfile) < 5:
         return None
+    manifest_record(base_url, filename, subfile)
     #
     if into:
         if not os.path.isdir(into):
@@ -187,6 +552,31 @@ def download(base_url: str, filename: str, into: Optional[str] = None, style: st
         logg.debug("copied %s -> %s", subfile, intofile)
     return filename
 
+def prefetch(downloads: List[Tuple[str, str]], jobs: int = 8) -> Dict[Tuple[str, str], str]:
+    """ download concurrently - returns the cached files that are there (raises on corrupt ones) """
+    import concurrent.futures
+    corrupt: List[str] = []
+    def fetch(download_item: Tuple[str, str]) -> Optional[str]:
+        base_url, filename = download_item
+        try:
+            if download_raw(base_url, filename, None):
+                return os.path.join(downloaddir, quote_plus(base_url), filename)
+        except IOError as e:
+            logg.error("%s", e)
+            corrupt.append(filename)
+        return None
+    done: Dict[Tuple[str, str], str] = collections.OrderedDict()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for num, subfile in enumerate(pool.map(fetch, downloads)):
+            download_item = downloads[num]
+            if subfile:
+                done[download_item] = subfile
+            else:
+                logg.warning("missing %s/%s", download_item[0], download_item[1])
+    if corrupt:
+        raise IOError("%i corrupt downloads: %s" % (len(corrupt), " ".join(sorted(corrupt))))
+    return done
+
 def output(cmd: Union[str, List[str]], shell: bool = True) -> str:
     run = subprocess.Popen(cmd, shell=shell, stdout=subprocess.PIPE)
     out, err = run.communicate()
@@ -214,6 +604,9 @@ def errors(lines: Union[str, List[str]]) -> List[str]:
     return list(all_errors(lines))
 
 class ZZipTest(unittest.TestCase):
+    def setUp(self) -> None:
+        if RESULTCACHE and RESULTS and cached_pass(self._testMethodName):
+            self.skipTest("cached pass")
     @property
     def t(self) -> str:
         if not os.path.isdir(testdatadir):
@@ -243,7 +636,26 @@ class ZZipTest(unittest.TestCase):
         if name == "mkzip": return mkzip
         exe = os.path.join(bindir, name)
         if exeext: exe += exeext
+        if RESULTCACHE:
+            depends(exe)
+            for filename in library_files(exe):
+                depends(filename)
         return exe
+    def uses_bins(self, *names: str) -> None:
+        """ declare the binaries used by a helper script (for the --cache dependencies) """
+        for name in names:
+            self.bins(name)
+    def bench(self, command: str, *options: str) -> Dict[str, Any]:
+        """ run a zzipbench.py command once (as a smoke test) in the testdir - its json results """
+        tmpdir = "tmp." + self.caller_testname()
+        bench = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipbench.py")
+        resultfile = os.path.join(tmpdir, "bench.json")
+        python, bins, args = sys.executable, bindir, " ".join(options)
+        shell("{python} {bench} -b {bins} -E '{exeext}' -B {tmpdir} -w 0 -r 1 {args}"
+              " -o {resultfile} {command}".format(exeext=exeext, **locals()))
+        with open(resultfile) as f:
+            results: Dict[str, Any] = json.load(f)
+        return results
     def gdb_bins(self, name: str) -> str:
         if name == "unzip": return unzip
         if name == "mkzip": return mkzip
@@ -251,19 +663,63 @@ class ZZipTest(unittest.TestCase):
         if exeext: exe += exeext
         return exe
     def gentext(self, size: int) -> str:
-        random.seed(1234567891234567890)
-        result = StringIO()
-        old1 = ''
-        old2 = ''
-        for i in range(size):
-            while True:
-                x = random.choice("       abcdefghijklmnopqrstuvwxyz\n")
-                if x == old1 or x == old2: continue
-                old1 = old2
-                old2 = x
-                break
-            result.write(x)
-        return cast(str, result.getvalue())
+        return gentext(size)
+    def mkzip64(self, archive: str, entries: List[Tuple[str, bytes, bool]]) -> None:
+        """ the sizes of (name, data, deflated) are 0xFFFFFFFF with a 0x0001 extra block in
+        the local headers and the central directory - as they are written over 4 GiB """
+        import struct
+        import zlib
+        local, central = b"", b""
+        for name, data, deflated in entries:
+            packed = data
+            if deflated:
+                packer = zlib.compressobj(9, zlib.DEFLATED, -15)
+                packed = packer.compress(data) + packer.flush()
+            compr, crc, encoded = deflated and 8 or 0, zlib.crc32(data), name.encode("utf-8")
+            extra = struct.pack("<HHQQ", 1, 16, len(data), len(packed))
+            central += struct.pack("<4sHHHHHHIIIHHHHHII", b"PK\1\2", 45, 45, 0, compr, 0, 0x21, crc,
+                                   0xFFFFFFFF, 0xFFFFFFFF, len(encoded), len(extra), 0, 0, 0, 0, len(local))
+            central += encoded + extra
+            local += struct.pack("<4sHHHHHIIIHH", b"PK\3\4", 45, 0, compr, 0, 0x21, crc,
+                                 0xFFFFFFFF, 0xFFFFFFFF, len(encoded), len(extra))
+            local += encoded + extra + packed
+        ends = struct.pack("<4sHHHHIIH", b"PK\5\6", 0, 0, len(entries), len(entries), len(central), len(local), 0)
+        with open(archive, "wb") as f:
+            f.write(local + central + ends)
+    def fixture_key(self, *filenames: str) -> str:
+        """ a hash over the test's source code (the generator parameters), the README,
+        the zip tool version and the content of the filenames the fixture is made from """
+        testmethod = getattr(self, self._testMethodName)
+        md = hashlib.sha256()
+        md.update(inspect.getsource(testmethod).encode("utf-8"))
+        md.update(inspect.getsource(gentext_chars).encode("utf-8"))
+        md.update(self.readme().encode("utf-8"))
+        md.update(tool_version(self.bins("mkzip")).encode("utf-8"))
+        for filename in filenames:
+            with open(filename, "rb") as f:
+                md.update(f.read())
+        return md.hexdigest()
+    def cached_fixture(self, filename: str, key: str) -> bool:
+        """ copy the fixture from the fixturesdir (unless --refresh-fixtures) """
+        cached = os.path.join(fixturesdir, key, filename)
+        if refresh_fixtures or not os.path.exists(cached):
+            return False
+        tmpfile = filename + ".tmp%i" % os.getpid()
+        shutil.copyfile(cached, tmpfile)
+        os.replace(tmpfile, filename)
+        logg.info("cached %s from %s", filename, cached)
+        return True
+    def cache_fixture(self, filename: str, key: str) -> None:
+        """ store the fixture in the fixturesdir - parallel runs may do the same """
+        if not fixturesdir:
+            return
+        cachedir = os.path.join(fixturesdir, key)
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir, exist_ok=True)
+        cached = os.path.join(cachedir, filename)
+        tmpfile = cached + ".tmp%i" % os.getpid()
+        shutil.copyfile(filename, tmpfile)
+        os.replace(tmpfile, cached)
     def caller_testname(self) -> str:
         name = get_caller_caller_name()
         x1 = name.find("_")
@@ -314,11 +770,15 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test0.zip"
         tmpdir = "test0.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         filename = os.path.join(tmpdir, "README")
         filetext = self.readme()
         self.mkfile(filename, filetext)
         shell("{exe} ../{zipfile} README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 10)
+        self.cache_fixture(zipfile, key)
     def test_10001_make_test1_zip(self) -> None:
         """ create a test1.zip for later tests using standard 'zip'
         It will fall back to a variant in the source code if 'zip'
@@ -327,6 +787,9 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test1.zip"
         tmpdir = "test1.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         for i in [1, 2, 3, 4, 5, 6, 7, 8, 9]:
             filename = os.path.join(tmpdir, "file.%i" % i)
             filetext = "file-%i\n" % i
@@ -336,6 +799,7 @@ class ZZipTest(unittest.TestCase):
         self.mkfile(filename, filetext)
         shell("{exe} ../{zipfile} ??*.* README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 10)
+        self.cache_fixture(zipfile, key)
     def test_10002_make_test2_zip(self) -> None:
         """ create a test2.zip for later tests using standard 'zip'
         It will NOT fall back to a variant in the source code.
@@ -343,6 +807,9 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test2.zip"
         tmpdir = "test2.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         for i in range(100):
             filename = os.path.join(tmpdir, "file.%02i" % i)
             filetext = "file-%02i\n" % i
@@ -352,6 +819,7 @@ class ZZipTest(unittest.TestCase):
         self.mkfile(filename, filetext)
         shell("{exe} ../{zipfile} ??*.* README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 10)
+        self.cache_fixture(zipfile, key)
     def test_10003_make_test3_zip(self) -> None:
         """ create a test3.zip for later tests using standard 'zip'
         It will NOT fall back to a variant in the source code.
@@ -359,6 +827,9 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test3.zip"
         tmpdir = "test3.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         for i in range(1000):
             filename = os.path.join(tmpdir, "file.%03i" % i)
             filetext = "file-%03i\n" % i
@@ -368,6 +839,7 @@ class ZZipTest(unittest.TestCase):
         self.mkfile(filename, filetext)
         shell("{exe} ../{zipfile} ??*.* README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 10)
+        self.cache_fixture(zipfile, key)
     def test_10004_make_test4_zip(self) -> None:
         """ create a test4.zip for later tests using standard 'zip'
         It will NOT fall back to a variant in the source code.
@@ -376,6 +848,9 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test4.zip"
         tmpdir = "test4.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         for i in range(10000):
             filename = os.path.join(tmpdir, "file%04i.txt" % i)
             filetext = "file-%04i\n" % i
@@ -385,6 +860,7 @@ class ZZipTest(unittest.TestCase):
         self.mkfile(filename, filetext)
         shell("{exe} -n README ../{zipfile} ??*.* README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 1000000)
+        self.cache_fixture(zipfile, key)
     def test_10005_make_test5_zip(self) -> None:
         """ create a test5.zip for later tests using standard 'zip'
         It will NOT fall back to a variant in the source code.
@@ -393,6 +869,9 @@ class ZZipTest(unittest.TestCase):
         zipfile = "test5.zip"
         tmpdir = "test5.tmp"
         exe = self.bins("mkzip")
+        key = self.fixture_key()
+        if self.cached_fixture(zipfile, key):
+            return
         for depth in range(20):
             dirpath = ""
             for i in range(depth):
@@ -409,46 +888,705 @@ class ZZipTest(unittest.TestCase):
         self.mkfile(filename, filetext)
         shell("{exe} ../{zipfile} -r file* subdir* README".format(**locals()), cwd=tmpdir)
         self.assertGreater(os.path.getsize(zipfile), 1000000)
+        self.cache_fixture(zipfile, key)
     def test_10010_make_test0_dat(self) -> None:
         """ create test.dat from test.zip with xorcopy """
         zipfile = "test0.zip"
         datfile = "test0x.dat"
         exe = self.bins("zzxorcopy")
+        key = self.fixture_key(zipfile, exe)
+        if self.cached_fixture(datfile, key):
+            return
         shell("{exe} {zipfile} {datfile}".format(**locals()))
         self.assertGreater(os.path.getsize(datfile), 10)
         self.assertEqual(os.path.getsize(datfile), os.path.getsize(zipfile))
+        self.cache_fixture(datfile, key)
     def test_10011_make_test1_dat(self) -> None:
         """ create test.dat from test.zip with xorcopy """
         zipfile = "test1.zip"
         datfile = "test1x.dat"
         exe = self.bins("zzxorcopy")
+        key = self.fixture_key(zipfile, exe)
+        if self.cached_fixture(datfile, key):
+            return
         shell("{exe} {zipfile} {datfile}".format(**locals()))
         self.assertGreater(os.path.getsize(datfile), 10)
         self.assertEqual(os.path.getsize(datfile), os.path.getsize(zipfile))
+        self.cache_fixture(datfile, key)
     def test_10012_make_test2_dat(self) -> None:
         """ create test.dat from test.zip with xorcopy """
         zipfile = "test2.zip"
         datfile = "test2x.dat"
         exe = self.bins("zzxorcopy")
+        key = self.fixture_key(zipfile, exe)
+        if self.cached_fixture(datfile, key):
+            return
         shell("{exe} {zipfile} {datfile}".format(**locals()))
         self.assertGreater(os.path.getsize(datfile), 10)
         self.assertEqual(os.path.getsize(datfile), os.path.getsize(zipfile))
+        self.cache_fixture(datfile, key)
     def test_10013_make_test3_dat(self) -> None:
         """ create test.dat from test.zip with xorcopy """
         zipfile = "test3.zip"
         datfile = "test3x.dat"
         exe = self.bins("zzxorcopy")
+        key = self.fixture_key(zipfile, exe)
+        if self.cached_fixture(datfile, key):
+            return
         shell("{exe} {zipfile} {datfile}".format(**locals()))
         self.assertGreater(os.path.getsize(datfile), 10)
         self.assertEqual(os.path.getsize(datfile), os.path.getsize(zipfile))
+        self.cache_fixture(datfile, key)
     def test_10014_make_test4_dat(self) -> None:
         """ create test.dat from test.zip with xorcopy """
         zipfile = "test4.zip"
         datfile = "test4x.dat"
         exe = self.bins("zzxorcopy")
+        key = self.fixture_key(zipfile, exe)
+        if self.cached_fixture(datfile, key):
+            return
         shell("{exe} {zipfile} {datfile}".format(**locals()))
         self.assertGreater(os.path.getsize(datfile), 10)
         self.assertEqual(os.path.getsize(datfile), os.path.getsize(zipfile))
+        self.cache_fixture(datfile, key)
+    def test_19000_gentext_stream(self) -> None:
+        """ the bulk gentext has the same stream as the original generator """
+        for size in [0, 1, 2, 3, 100, 1024, 4097, 2 ** 17]:
+            self.assertEqual(gentext(size), gentext_chars(size))
+        self.assertEqual(gentext(10), gentext_chars(10))
+    def test_19100_zzipbench_throughput(self) -> None:
+        """ run the throughput benchmark on a small archive """
+        self.uses_bins("unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzcat")
+        self.testdir()
+        results = self.bench("throughput", "--entries=3", "--sizes=1K")
+        tools = [result["tool"] for result in results["throughput"]]
+        self.assertIn("unzzip-mix", tools)
+        self.assertIn("unzzip-zap", tools)
+        for result in results["throughput"]:
+            self.assertEqual(result["returncode"], 0)
+            self.assertEqual(result["entries"], 3)
+            self.assertGreater(result["mb_per_s"], 0)
+        self.rm_testdir()
+    def test_19200_zzipbench_listing(self) -> None:
+        """ run the listing benchmark on small archives """
+        self.uses_bins("unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzdir")
+        tmpdir = self.testdir()
+        csvfile = os.path.join(tmpdir, "bench.csv")
+        results = self.bench("listing", "--scale=10,30", "--csv", csvfile)
+        for result in results["listing"]:
+            self.assertEqual(result["returncode"], 0)
+            self.assertEqual(result["listed"], result["entries"])
+        self.assertIn("zzdir", results["listing_scaling"])
+        with open(csvfile) as f:
+            self.assertEqual(len(f.readlines()), 1 + len(results["listing"]))
+        self.rm_testdir()
+    def test_19300_zzipbench_lookup(self) -> None:
+        """ run the lookup benchmark on a small archive """
+        self.uses_bins("unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzcat")
+        self.testdir()
+        results = self.bench("lookup", "--lookup-entries=20", "--lookups=5")
+        self.assertEqual(len(results["lookup"]), 5)
+        for result in results["lookup"]:
+            self.assertEqual(result["failed"], 0)
+            self.assertEqual(result["lookups"], 5)
+            self.assertLessEqual(result["p50"], result["p99"])
+        self.rm_testdir()
+    def test_19400_zzipreplay_corpus(self) -> None:
+        """ replay a small corpus of broken copies of test1.zip on all backends """
+        self.uses_bins("unzzip-big", "unzzip-mem", "unzzip-mix", "unzzip", "zzdir")
+        tmpdir = self.testdir()
+        corpus = os.path.join(tmpdir, "corpus")
+        os.makedirs(corpus)
+        with open("test1.zip", "rb") as f:
+            data = f.read()
+        with open(os.path.join(corpus, "test1.zip"), "wb") as f:
+            f.write(data)
+        for cut in [len(data) // 4, len(data) // 2, len(data) - 10]:
+            with open(os.path.join(corpus, "test1.cut%i.zip" % cut), "wb") as f:
+                f.write(data[:cut])
+        replay = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipreplay.py")
+        resultfile = os.path.join(tmpdir, "replay.json")
+        python, bins = sys.executable, bindir
+        run = shell("{python} {replay} -b {bins} -E '{exeext}' -U '{unzip}' -j 2 -t 20"
+                    " -o {resultfile} {corpus}".format(exeext=exeext, unzip=unzip, **locals()))
+        logg.info("\n%s", run.output)
+        with open(resultfile) as f:
+            results = json.load(f)
+        self.assertEqual(len(results["files"]), 4)
+        intact = results["files"][os.path.join(corpus, "test1.zip")]
+        for backend in ["unzzipdir-big", "unzzipdir-mem", "unzzipdir-mix", "unzzipdir-zap", "zzdir"]:
+            self.assertEqual(intact[backend]["outcome"], "ok")
+        for backend, counts in results["summary"].items():
+            self.assertEqual(counts["crash"], 0)
+            self.assertEqual(counts["timeout"], 0)
+        self.rm_testdir()
+    def test_19500_zzipctypes_read(self) -> None:
+        """ read test1.zip in-process with the ctypes binding on all three apis """
+        import zzipctypes
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        zipfile = "test1.zip"
+        depends(zipfile)
+        run = shell("{unzip} -Z1 {zipfile}".format(unzip=unzip, **locals()))
+        names = sorted(run.output.split())
+        self.assertEqual(len(names), 10)
+        expected = {}
+        for name in names:
+            run = shell("{unzip} -p {zipfile} {name}".format(unzip=unzip, **locals()))
+            expected[name] = run.output
+        apis: List[zzipctypes.ZZipOpen] = [zzipctypes.ZZipDir, zzipctypes.ZZipDisk, zzipctypes.ZZipMemDisk]
+        for api in apis:
+            with api(zipfile, bindir) as zipped:
+                self.assertEqual(sorted(zipped.names()), names)
+                for name in names:
+                    self.assertEqual(decodes(zipped.read(name)), expected[name])
+    def test_19501_zzipctypes_mapped(self) -> None:
+        """ zero-copy views of stored entries and streamed inflate of deflated ones """
+        import zzipctypes
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        filetext = self.gentext(300000)
+        self.mkfile(tmpdir + "/file.txt", filetext)
+        self.mkfile(tmpdir + "/empty.txt", "")
+        shell("cd {tmpdir} && {mkzip} -q -0 stored.zip file.txt empty.txt".format(mkzip=mkzip, **locals()))
+        shell("cd {tmpdir} && {mkzip} -q -9 deflated.zip file.txt empty.txt".format(mkzip=mkzip, **locals()))
+        with zzipctypes.ZZipMapped(tmpdir + "/stored.zip", bindir) as zipped:
+            view = zipped.view("file.txt")
+            self.assertIs(view.obj, zipped.mapped)
+            self.assertEqual(decodes(bytes(view)), filetext)
+            self.assertEqual(len(zipped.view("empty.txt")), 0)
+            self.assertEqual(decodes(zipped.read("file.txt")), filetext)
+        with zzipctypes.ZZipMapped(tmpdir + "/deflated.zip", bindir) as zipped:
+            self.assertEqual(zipped.info("file.txt").compr, zzipctypes.ZZIP_IS_DEFLATED)
+            with self.assertRaises(zzipctypes.ZZipError):
+                zipped.view("file.txt")
+            with zipped.open("file.txt", chunk=4096) as f:
+                head = f.read(100)
+                rest = f.read()
+            self.assertEqual(decodes(head + rest), filetext)
+            self.assertEqual(zipped.read("empty.txt"), b"")
+        self.rm_testdir()
+    def test_19502_zzipctypes_index(self) -> None:
+        """ the same findfile and findmatch results with zzip_disk_index and zzip_mem_disk_index """
+        import zzipctypes
+        import zipfile
+        import warnings
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "names.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for num in range(3000):
+                zipped.writestr("dir%i/file%04i.txt" % (num % 7, num), "%i\n" % num)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")  # the duplicate name
+                zipped.writestr("dir1/file0001.txt", "again\n")
+        names = ["dir1/file0001.txt", "dir3/file2999.txt", "dir0/file0000.txt", "dir3/nothere.txt"]
+        apis: List[Union[Type[zzipctypes.ZZipDisk], Type[zzipctypes.ZZipMemDisk]]] = [
+            zzipctypes.ZZipDisk, zzipctypes.ZZipMemDisk]
+        for api in apis:
+            with api(archive, bindir) as opened:
+                def found(entry: Any) -> Optional[str]:
+                    return opened.entry_name(entry) if entry else None
+                linear = [found(opened.findfile(name)) for name in names]
+                contents = [opened.read(name) for name in names[:3]]
+                matched = [found(entry) for entry in opened.findmatch("dir2/file1*")]
+                self.assertEqual(opened.index(), 3001)
+                self.assertEqual([found(opened.findfile(name)) for name in names], linear)
+                self.assertEqual([opened.read(name) for name in names[:3]], contents)
+                self.assertEqual(contents[0], b"1\n")
+                self.assertIsNone(linear[3])
+                indexed = [found(entry) for entry in opened.findmatch("dir2/file1*")]
+                self.assertEqual(len(indexed), 143)
+                self.assertEqual(indexed, sorted(matched))
+                self.assertEqual(len(list(opened.findmatch("dir1/file0001.txt"))), 2)
+        with zzipctypes.ZZipMemDisk(archive, bindir) as memdisk:
+            assert memdisk.dir is not None
+            self.assertEqual(memdisk.index(), 3001)
+            self.assertEqual(memdisk.lib.zzip_disk_index(memdisk.dir.contents.disk), 3001)  # replaces it
+            self.assertEqual(memdisk.entry_name(memdisk.findfile(names[1])), names[1])
+            self.assertEqual(len(list(memdisk.findmatch("dir1/file0001.txt"))), 2)
+            self.assertEqual(memdisk.index(), 3001)
+            self.assertEqual(memdisk.entry_name(memdisk.findfile(names[2])), names[2])
+        results = self.bench("findfile", "--find-entries=100", "--lookups=5")
+        self.assertEqual(len(results["findfile"]), 2)
+        for result in results["findfile"]:
+            self.assertEqual(result["found"], 5)
+            self.assertEqual(result["visible"], 100)
+        self.rm_testdir()
+    def test_19503_zzipsidecar(self) -> None:
+        """ a sidecar index answers like the central directory - and is ignored when stale """
+        import zzipctypes
+        import zzipsidecar
+        import zipfile
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "names.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for num in range(1000):
+                compress = zipfile.ZIP_DEFLATED if num % 2 else zipfile.ZIP_STORED
+                zipped.writestr("dir%i/file%04i.txt" % (num % 7, num), "%i\n" % num * (num % 50), compress)
+        tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipsidecar.py")
+        python, bins = sys.executable, bindir
+        sidecar = shell("{python} {tool} -b {bins} generate {archive}".format(**locals()), returncodes=[0])
+        self.assertEqual(sidecar.output.strip(), zzipsidecar.sidecar_path(archive))
+        shell("{python} {tool} -b {bins} verify {archive}".format(**locals()), returncodes=[0])
+        with zzipctypes.ZZipMapped(archive, bindir) as parsed:
+            infolist = parsed.infolist()
+            contents = [parsed.read(info.name) for info in infolist]
+        with zzipsidecar.open_mapped(archive, bindir) as indexed:
+            self.assertIsNotNone(indexed.sidecar)
+            self.assertEqual(indexed.infolist(), infolist)
+            self.assertEqual([indexed.read(info.name) for info in infolist], contents)
+            self.assertEqual(indexed.info("dir5/file0999.txt"), infolist[999])
+            with self.assertRaises(zzipctypes.ZZipError):
+                indexed.info("dir5/nothere.txt")
+        status = os.stat(archive)
+        os.utime(archive, ns=(status.st_atime_ns, status.st_mtime_ns + 1000000000))
+        shell("{python} {tool} -b {bins} verify {archive}".format(**locals()), returncodes=[1])
+        with zzipsidecar.open_mapped(archive, bindir) as fallback:
+            self.assertIsNone(fallback.sidecar)
+            self.assertEqual(fallback.read("dir5/file0999.txt"), contents[999])
+        self.rm_testdir()
+    def test_19504_zzipimport(self) -> None:
+        """ import python modules from a zip archive with the zzipimport meta path finder """
+        import zzipctypes
+        import zzipimport
+        import zipfile
+        import importlib.util
+        import marshal
+        import pkgutil
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "modules.zip")
+        cachedir = os.path.join(tmpdir, "cache")
+        compiled = compile("VALUE = 'from pyc'\n", "zzpkg19504/compiled.py", "exec")
+        pyc = importlib.util.MAGIC_NUMBER + (1).to_bytes(4, "little") + bytes(8) + marshal.dumps(compiled)
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zipped:
+            zipped.writestr("lib/zzpkg19504/__init__.py", "from . import plain\nNAME = __name__\n")
+            zipped.writestr("lib/zzpkg19504/plain.py", "VALUE = 'from source'\n")
+            zipped.writestr("lib/zzpkg19504/compiled.pyc", pyc)
+            zipped.writestr("lib/zzpkg19504/sub/__init__.py", "")
+            zipped.writestr("lib/zzpkg19504/sub/deep.py", "from .. import plain\nVALUE = plain.VALUE + '!'\n")
+            zipped.writestr("lib/zzpkg19504/data.txt", "some data\n")
+            zipped.writestr("lib/zzmod19504.py", "VALUE = 42\n")
+        finder = zzipimport.install(archive, "lib", bindir, cachedir)
+        try:
+            import zzpkg19504  # type: ignore[import-not-found]
+            import zzpkg19504.compiled  # type: ignore[import-not-found]
+            import zzpkg19504.sub.deep  # type: ignore[import-not-found]
+            import zzmod19504  # type: ignore[import-not-found]
+            self.assertEqual(zzpkg19504.plain.VALUE, "from source")
+            self.assertEqual(zzpkg19504.compiled.VALUE, "from pyc")
+            self.assertEqual(zzpkg19504.sub.deep.VALUE, "from source!")
+            self.assertEqual(zzmod19504.VALUE, 42)
+            self.assertEqual(zzpkg19504.__file__, os.path.join(os.path.abspath(archive), "lib/zzpkg19504/__init__.py"))
+            self.assertEqual(pkgutil.get_data("zzpkg19504", "data.txt"), b"some data\n")
+            self.assertEqual(len(os.listdir(cachedir)), 5)
+            self.assertNotIn("zzpkg19504.nothere", finder.modules)
+            with self.assertRaises(ImportError):
+                import zzpkg19504.nothere  # type: ignore[import-not-found]
+        finally:
+            zzipimport.uninstall(finder)
+            for name in list(sys.modules):
+                if name.startswith("zzpkg19504") or name == "zzmod19504":
+                    del sys.modules[name]
+        self.assertNotIn(finder, sys.meta_path)
+        results = self.bench("importtime", "--import-modules=20")
+        self.assertEqual(len(results["importtime"]), 4)
+        for result in results["importtime"]:
+            self.assertGreater(result["importtime_us"], 0)
+        self.rm_testdir()
+    def test_19505_zzipextract(self) -> None:
+        """ extract with worker threads - each with its own ZZIP_DISK """
+        import zzipctypes
+        import zzipextract
+        import zipfile
+        self.uses_bins("unzzip")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "files.zip")
+        contents: Dict[str, bytes] = {}
+        with zipfile.ZipFile(archive, "w") as zipped:
+            zipped.writestr("empty/", "")
+            for num in range(40):
+                name = "dir%i/file%02i.txt" % (num % 3, num)
+                contents[name] = self.gentext(num * 997 + 1).encode("ascii")
+                compress = zipfile.ZIP_STORED if num % 5 == 0 else zipfile.ZIP_DEFLATED
+                zipped.writestr(name, contents[name], compress)
+            contents["zero.txt"] = b""
+            zipped.writestr("zero.txt", b"")
+        outdir = os.path.join(tmpdir, "out")
+        summary = zzipextract.extract(archive, outdir, 3, None, bindir, crc=True)
+        self.assertEqual(summary["errors"], [])
+        self.assertEqual(summary["entries"], 42)
+        self.assertEqual(len(summary["workers"]), 3)
+        self.assertEqual(summary["bytes"], sum([len(data) for data in contents.values()]))
+        self.assertTrue(os.path.isdir(os.path.join(outdir, "empty")))
+        for name, data in contents.items():
+            with open(os.path.join(outdir, name), "rb") as f:
+                self.assertEqual(f.read(), data)
+        shards = zzipextract.plan([(0, zzipctypes.ZZipInfo("x", 0, 8, 0, csize, 0, 0)) for csize in [9, 8, 5, 4, 1]], 2)
+        self.assertEqual([[info.csize for _, info in shard] for shard in shards], [[9, 4, 1], [8, 5]])
+        evil = os.path.join(tmpdir, "evil.zip")
+        with zipfile.ZipFile(evil, "w") as zipped:
+            zipped.writestr("../escaped.txt", "no\n")
+            zipped.writestr("fine.txt", "yes\n")
+        tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipextract.py")
+        python, bins, evildir = sys.executable, bindir, os.path.join(tmpdir, "evil")
+        shell("{python} {tool} -b {bins} -j 2 -d {evildir} {evil}".format(**locals()), returncodes=[1])
+        self.assertTrue(os.path.exists(os.path.join(evildir, "fine.txt")))
+        self.assertFalse(os.path.exists(os.path.join(tmpdir, "escaped.txt")))
+        results = self.bench("extract", "--extract-entries=4", "--extract-sizes=1K", "--extract-jobs=1,2")
+        self.assertEqual([result["tool"] for result in results["extract"]], ["unzzip", "zzipextract-j1", "zzipextract-j2"])
+        for result in results["extract"]:
+            self.assertEqual(result["returncode"], 0)
+            self.assertEqual(result["bytes"], 4 * 1024)
+        self.rm_testdir()
+    def test_19506_zzipctypes_cache(self) -> None:
+        """ the EntryCache serves hot entries from memory - evicting by size, invalidating on change """
+        import zzipctypes
+        import zipfile
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "config.zip")
+        def make(version: str) -> None:
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zipped:
+                for name in "abcd":
+                    zipped.writestr(name + ".cfg", (name + version) * 500)
+                zipped.writestr("big.dat", version * 5000)
+        make("1")
+        for api in ["dir", "mapped"]:
+            cache = zzipctypes.EntryCache(maxbytes=2500, maxentry=4000, api=api, bins=bindir)
+            self.assertEqual(cache.read(archive, "a.cfg"), b"a1" * 500)
+            self.assertEqual(cache.read(archive, "a.cfg"), b"a1" * 500)
+            self.assertEqual(cache.read(archive, "b.cfg"), b"b1" * 500)
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "evictions": 0, "invalidations": 0,
+                                             "entries": 2, "bytes": 2000})
+            cache.read(archive, "a.cfg")  # now b is the least recently used
+            cache.read(archive, "c.cfg")
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertEqual([key[1] for key in cache.entries], ["a.cfg", "c.cfg"])
+            self.assertEqual(len(cache.read(archive, "big.dat")), 5000)
+            self.assertEqual(cache.stats()["entries"], 2)  # over maxentry
+            with self.assertRaises(OSError):
+                cache.read(archive, "nothere.cfg")
+        status = os.stat(archive)
+        make("2")
+        os.utime(archive, ns=(status.st_atime_ns, status.st_mtime_ns + 1000000000))
+        self.assertEqual(cache.read(archive, "a.cfg"), b"a2" * 500)
+        stats = cache.stats()
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.rm_testdir()
+    def test_19507_zzipaio_streams(self) -> None:
+        """ concurrent asyncio streams over one mapped ZZIP_DISK """
+        import zzipctypes
+        import zzipaio
+        import zipfile
+        import asyncio
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "streams.zip")
+        contents: Dict[str, bytes] = {}
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for num in range(12):
+                name = "file%02i.txt" % num
+                contents[name] = self.gentext(num * 20011 + 7).encode("ascii")
+                zipped.writestr(name, contents[name], num % 3 and zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED)
+        async def run() -> None:
+            async with zzipaio.AsyncZZip(archive, bindir, workers=3, readahead=2) as opened:
+                async def chunks(name: str) -> List[bytes]:
+                    return [bytes(chunk) async for chunk in opened.stream(name, 4096)]
+                streamed = await asyncio.gather(*[chunks(name) for name in contents])
+                for name, found in zip(contents, streamed):
+                    self.assertEqual(b"".join(found), contents[name])
+                    self.assertTrue(all([len(chunk) <= 4096 for chunk in found]))
+                self.assertEqual(await opened.read("file11.txt"), contents["file11.txt"])
+                stream = opened.stream("file10.txt", 1000)
+                try:
+                    async for chunk in stream:
+                        self.assertEqual(chunk, contents["file10.txt"][:1000])
+                        self.assertEqual(opened.streams, 1)
+                        break
+                finally:
+                    await stream.aclose()
+                self.assertEqual(opened.streams, 0)
+                with self.assertRaises(zzipctypes.ZZipError):
+                    await opened.read("nothere.txt")
+                self.assertEqual(opened.streams, 0)
+        asyncio.run(run())
+        results = self.bench("aio", "--aio-entries=4", "--aio-size=4K", "--aio-streams=1,4")
+        self.assertEqual(len(results["aio"]), 4)
+        for result in results["aio"]:
+            self.assertEqual(result["bytes"], 4 * 4 * 1024)
+        self.rm_testdir()
+    def test_19508_zzipserve(self) -> None:
+        """ serve archive entries over http - sendfile, inflate, ranges and etags """
+        import zzipctypes
+        import zzipserve
+        import zipfile
+        import threading
+        import http.client
+        import zlib
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        self.assertEqual(zzipserve.byte_range("bytes=10-19", 100), (10, 20))
+        self.assertEqual(zzipserve.byte_range("bytes=90-", 100), (90, 100))
+        self.assertEqual(zzipserve.byte_range("bytes=-5", 100), (95, 100))
+        self.assertEqual(zzipserve.byte_range("bytes=50-500", 100), (50, 100))
+        self.assertEqual(zzipserve.byte_range("bytes=100-", 100), (100, 100))
+        self.assertIsNone(zzipserve.byte_range("bytes=1-2,5-6", 100))
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "site.zip")
+        text = self.gentext(50000).encode("ascii")
+        rand = random.Random(19508)
+        noise = bytes([rand.getrandbits(8) for _ in range(20000)])
+        with zipfile.ZipFile(archive, "w") as zipped:
+            zipped.writestr("www/index.html", b"<html>hello</html>\n", zipfile.ZIP_DEFLATED)
+            zipped.writestr("www/stored.txt", text, zipfile.ZIP_STORED)
+            zipped.writestr("www/deflated.txt", text, zipfile.ZIP_DEFLATED)
+            zipped.writestr("www/noise.bin", noise, zipfile.ZIP_DEFLATED)
+        server = zzipserve.ZZipServer(("127.0.0.1", 0), archive, "www", bindir)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        def get(path: str, method: str = "GET", **headers: str) -> Tuple[int, Dict[str, str], bytes]:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+            try:
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+                return response.status, dict(response.getheaders()), response.read()
+            finally:
+                conn.close()
+        try:
+            self.assertEqual(get("/")[2], b"<html>hello</html>\n")
+            for name in ["stored.txt", "deflated.txt"]:
+                status, headers, body = get("/" + name)
+                self.assertEqual((status, body), (200, text))
+                self.assertEqual(headers["ETag"], '"%08x-%x"' % (zlib.crc32(text), len(text)))
+                self.assertEqual(headers["Content-Type"], "text/plain")
+                status, _, body = get("/" + name, Range="bytes=1000-1999")
+                self.assertEqual((status, body), (206, text[1000:2000]))
+                status, headers, body = get("/" + name, Range="bytes=-10")
+                self.assertEqual((status, body, headers["Content-Range"]), (206, text[-10:], "bytes 49990-49999/50000"))
+                self.assertEqual(get("/" + name, Range="bytes=50000-")[0], 416)
+                self.assertEqual(get("/" + name, Range="bytes=0-9", **{"If-Range": '"0-0"'})[2], text)
+                self.assertEqual(get("/" + name, **{"If-None-Match": headers["ETag"]})[0], 304)
+                status, headers, body = get("/" + name, "HEAD")
+                self.assertEqual((status, headers["Content-Length"], body), (200, "50000", b""))
+            self.assertEqual(get("/noise.bin")[2], noise)
+            self.assertEqual(server.cache.stats()["misses"], 2)  # the poorly compressed and the deflated range
+            self.assertEqual(get("/nothere.txt")[0], 404)
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        results = self.bench("serve", "--serve-entries=4", "--serve-size=1K", "--serve-requests=8",
+                             "--serve-clients=2", "--compressions=stored")
+        self.assertEqual([result["server"] for result in results["serve"]], ["http.server", "zzipserve"])
+        for result in results["serve"]:
+            self.assertEqual((result["requests"], result["failed"], result["bytes"]), (8, 0, 8 * 1024))
+        self.rm_testdir()
+    def test_19509_zzipverify(self) -> None:
+        """ check the crc32 and size of all entries - and report the damaged ones """
+        import zzipctypes
+        import zzipverify
+        import zipfile
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "verify.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for num in range(30):
+                compress = zipfile.ZIP_STORED if num % 3 == 0 else zipfile.ZIP_DEFLATED
+                zipped.writestr("file%02i.txt" % num, self.gentext(num * 3001 + 1), compress)
+        summary = zzipverify.verify(archive, 1, bindir, chunk=1000)  # (the process pool runs in the tool below)
+        self.assertEqual((summary["entries"], summary["bad"]), (30, []))
+        with zzipctypes.ZZipMapped(archive, bindir) as zipped:
+            stored = zipped.info("file03.txt")
+            deflated = zipped.info("file04.txt")
+        with open(archive, "r+b") as f:
+            for info in [stored, deflated]:
+                f.seek(info.offset + info.csize // 2)
+                old = f.read(1)
+                f.seek(-1, 1)
+                f.write(bytes([old[0] ^ 0x55]))
+        summary = zzipverify.verify(archive, 1, bindir, chunk=1000)
+        self.assertEqual([item["name"] for item in summary["bad"]], ["file03.txt", "file04.txt"])
+        self.assertIn("crc32", summary["bad"][0]["problem"])
+        tool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zzipverify.py")
+        python, bins = sys.executable, bindir
+        run = shell("{python} {tool} -b {bins} -j 2 {archive}".format(**locals()), returncodes=[1])
+        self.assertIn("file03.txt: crc32", run.output)
+        self.assertIn("30 entries, 2 bad", run.output)
+        zip64 = os.path.join(tmpdir, "zip64.zip")
+        text = self.gentext(70000).encode("ascii")
+        self.mkzip64(zip64, [("stored.txt", text, False), ("deflated.txt", text, True)])
+        with zzipctypes.ZZipMapped(zip64, bindir) as zipped:
+            self.assertEqual([(info.compr, info.usize) for info in zipped.infolist()], [(0, 70000), (8, 70000)])
+            self.assertEqual(zipped.info("stored.txt").csize, 70000)
+        summary = zzipverify.verify(zip64, 1, bindir, chunk=1000)
+        self.assertEqual((summary["entries"], summary["bytes"], summary["bad"]), (2, 140000, []))
+        self.rm_testdir()
+    def test_19510_local_header_offset_ending_in_ffff(self) -> None:
+        """ only an offset of 0xFFFFFFFF is the ZIP64 marker - not any ending in 0xFFFF """
+        import zipfile
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "ffff.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            zipped.writestr("a.bin", b"x" * (0xFFFF - 30 - len("a.bin")))
+            zipped.writestr("b.txt", b"after 0xFFFF\n")
+        with zipfile.ZipFile(archive) as zipped:
+            self.assertEqual(zipped.getinfo("b.txt").header_offset, 0xFFFF)
+        exe = self.bins("unzzip-mem")
+        run = shell("{exe} -p {archive} b.txt".format(**locals()))
+        self.assertEqual(run.output, "after 0xFFFF\n")
+        self.rm_testdir()
+    def test_19511_zzip_disk_findmatch_linear(self) -> None:
+        """ zzip_disk_findmatch without an index returns the matching entries """
+        import zzipctypes
+        import zipfile
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "match.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for name in ["a.txt", "b.bin", "c.txt", "d/e.txt"]:
+                zipped.writestr(name, name)
+        with zzipctypes.ZZipDisk(archive, bindir) as opened:
+            found = [opened.entry_name(entry) for entry in opened.findmatch("*.txt")]
+            self.assertEqual(found, ["a.txt", "c.txt", "d/e.txt"])
+            found = [opened.entry_name(entry) for entry in opened.findmatch("b.*")]
+            self.assertEqual(found, ["b.bin"])
+        self.rm_testdir()
+    def test_19512_zzip_mem_entry_mktime_dst(self) -> None:
+        """ zz_mktime lets mktime find the daylight saving time (tm_isdst = -1) """
+        import zzipctypes
+        import zipfile
+        import time
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir) or not hasattr(time, "tzset"):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "dates.zip")
+        dates = {"summer.txt": (2020, 7, 1, 12, 30, 10), "winter.txt": (2020, 1, 15, 12, 30, 10)}
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for name, date_time in dates.items():
+                zipped.writestr(zipfile.ZipInfo(name, date_time), name)
+        oldtz = os.environ.get("TZ")
+        os.environ["TZ"] = "CET-1CEST,M3.5.0,M10.5.0/3"
+        time.tzset()
+        try:
+            with zzipctypes.ZZipMemDisk(archive, bindir) as opened:
+                mktimes = dict([(os.fsdecode(entry.zz_name), entry.zz_mktime) for entry in opened.entries()])
+            # the fields as zzip_disk_entry_get_mktime sets them (dos month and 2-second units)
+            expected = dict([(name, int(time.mktime((year, mon + 1, mday, hour, mins, secs // 2, 0, 0, -1))))
+                             for name, (year, mon, mday, hour, mins, secs) in dates.items()])
+        finally:
+            if oldtz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = oldtz
+            time.tzset()
+        self.assertEqual(mktimes, expected)
+        self.rm_testdir()
+    def test_19513_download_manifest(self) -> None:
+        """ the first download is recorded - a truncated or changed copy fails later """
+        global downloaddir, downloadmirror, downloadmanifest, nodownloads
+        tmpdir = self.testdir()
+        url = "https://example.invalid/zips"
+        mirror = os.path.join(tmpdir, "mirror")
+        os.makedirs(mirror)
+        self.mkfile(os.path.join(mirror, "cve.zip"), "PK" + self.gentext(1000))
+        saved = (downloaddir, downloadmirror, downloadmanifest, nodownloads)
+        downloaddir, downloadmirror, downloadmanifest, nodownloads = os.path.join(tmpdir, "cache"), mirror, "", False
+        try:
+            self.assertEqual(download(url, "cve.zip", os.path.join(tmpdir, "into")), "cve.zip")
+            entry = manifest_entries()[(url, "cve.zip")]
+            self.assertEqual(entry["size"], 1002)
+            self.assertEqual(entry["sha256"], sha256sum(os.path.join(mirror, "cve.zip")))
+            subfile = os.path.join(downloaddir, quote_plus(url), "cve.zip")
+            with open(subfile, "r+b") as f:
+                f.truncate(500)
+            self.assertEqual(download(url, "cve.zip"), "cve.zip")  # from the mirror again
+            self.assertEqual(os.path.getsize(subfile), 1002)
+            os.remove(subfile)
+            self.mkfile(os.path.join(mirror, "cve.zip"), "PK" + self.gentext(999) + "!")
+            with self.assertRaises(IOError):
+                download(url, "cve.zip")
+            self.assertEqual(manifest_entries()[(url, "cve.zip")], entry)
+        finally:
+            downloaddir, downloadmirror, downloadmanifest, nodownloads = saved
+        self.rm_testdir()
+    def test_19514_zzip_disk_entry_fopen_zip64_sizes(self) -> None:
+        """ the sizes of a ZIP64 local header are taken from its 0x0001 extra block """
+        import zzipctypes
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "zip64.zip")
+        text = self.gentext(50000).encode("ascii")
+        self.mkzip64(archive, [("stored.txt", text, False), ("deflated.txt", text, True)])
+        with zzipctypes.ZZipDisk(archive, bindir) as zipped:
+            self.assertEqual(zipped.read("stored.txt"), text)
+            self.assertEqual(zipped.read("deflated.txt"), text)
+        self.rm_testdir()
+    def test_19515_zzip_mem_disk_open_sidecar(self) -> None:
+        """ zzip_mem_disk_open_sidecar loads the entries from a sidecar - and parses a changed archive """
+        import zzipctypes
+        import zzipsidecar
+        import zipfile
+        self.uses_bins("zzcat")
+        if not zzipctypes.available(bindir):
+            self.skipTest("no zzip libraries for ctypes")
+        tmpdir = self.testdir()
+        archive = os.path.join(tmpdir, "names.zip")
+        with zipfile.ZipFile(archive, "w") as zipped:
+            for num in range(300):
+                compress = zipfile.ZIP_DEFLATED if num % 2 else zipfile.ZIP_STORED
+                zipped.writestr("dir%i/file%04i.txt" % (num % 7, num), "%i\n" % num * (num % 50), compress)
+        sidecar = zzipsidecar.write(archive, None, bindir)
+        with zzipctypes.ZZipMemDisk(archive, bindir) as parsed:
+            names = parsed.names()
+            contents = [parsed.read(name) for name in names]
+        with zzipsidecar.open_memdisk(archive, bindir) as indexed:
+            self.assertEqual(indexed.names(), names)
+            self.assertEqual([indexed.read(name) for name in names], contents)
+            self.assertEqual(indexed.index(), 300)
+            self.assertEqual(indexed.read("dir5/file0299.txt"), contents[299])
+        # the names are taken from the sidecar records - not from the central directory
+        with open(sidecar, "rb") as f:
+            patched = f.read().replace(b"dir6/file0006.txt\0", b"DIR6/file0006.txt\0")
+        other = os.path.join(tmpdir, "other.zzipidx")
+        with open(other, "wb") as f:
+            f.write(patched)
+        with zzipsidecar.open_memdisk(archive, bindir, other) as renamed:
+            self.assertEqual(renamed.names()[6], "DIR6/file0006.txt")
+            self.assertEqual(renamed.read("DIR6/file0006.txt"), contents[6])
+        # a stale sidecar is ignored
+        with zipfile.ZipFile(archive, "w") as zipped:
+            zipped.writestr("new.txt", "new\n" * 100, zipfile.ZIP_DEFLATED)
+        with zzipsidecar.open_memdisk(archive, bindir) as fallback:
+            self.assertEqual(fallback.names(), ["new.txt"])
+            self.assertEqual(fallback.read("new.txt"), b"new\n" * 100)
+        self.rm_testdir()
     def test_20000_zziptest_test0_zip(self) -> None:
         """ run zziptest on test.zip """
         zipfile = "test0.zip"
@@ -4107,6 +5245,179 @@ class ZZipTest(unittest.TestCase):
         self.assertGreater(os.path.getsize(zipfile), 10)
 
 
+# parallel mode ................................................
+TestOutcome = collections.namedtuple(
+    "TestOutcome", ["testclass", "testname", "status", "message", "duration", "workdir", "resources", "depends"])
+FIXTURES = ["*.zip", "*.dat"]
+WORKDIR = ""
+
+def fixture_test(testname: str) -> bool:
+    """ the test_100xx tests create the test*.zip and test*x.dat files used by the other tests """
+    return testname.startswith("test_100")
+
+class OutcomeResult(unittest.TestResult):
+    """ collects the results as picklable TestOutcome items """
+    outcomes: List[TestOutcome]
+    def __init__(self, workdir: str = "") -> None:
+        unittest.TestResult.__init__(self)
+        self.workdir = workdir
+        self.outcomes = []
+        self.started = time.time()
+    def startTest(self, test: unittest.TestCase) -> None:
+        unittest.TestResult.startTest(self, test)
+        self.started = time.time()
+    def outcome(self, test: unittest.TestCase, status: str, message: str = "") -> None:
+        name = test.id().split(".")
+        resources = RUSAGE is not None and RUSAGE.pop(name[-1], []) or []
+        depends = sorted(DEPENDS.pop(name[-1], []))
+        item = TestOutcome(name[-2], name[-1], status, message, time.time() - self.started, self.workdir, resources, depends)
+        self.outcomes.append(item)
+    def addSuccess(self, test: unittest.TestCase) -> None:
+        unittest.TestResult.addSuccess(self, test)
+        self.outcome(test, "ok")
+    def addFailure(self, test: unittest.TestCase, err: Any) -> None:
+        unittest.TestResult.addFailure(self, test, err)
+        self.outcome(test, "FAIL", self.failures[-1][1])
+    def addError(self, test: unittest.TestCase, err: Any) -> None:
+        unittest.TestResult.addError(self, test, err)
+        self.outcome(test, "ERROR", self.errors[-1][1])
+    def addSkip(self, test: unittest.TestCase, reason: str) -> None:
+        unittest.TestResult.addSkip(self, test, reason)
+        self.outcome(test, "skipped", reason)
+    def addExpectedFailure(self, test: unittest.TestCase, err: Any) -> None:
+        unittest.TestResult.addExpectedFailure(self, test, err)
+        self.outcome(test, "expected failure")
+    def addUnexpectedSuccess(self, test: unittest.TestCase) -> None:
+        unittest.TestResult.addUnexpectedSuccess(self, test)
+        self.outcome(test, "FAIL", "unexpected success")
+
+def parallel_settings() -> Dict[str, Any]:
+    """ the global settings as seen from a worker directory one level down """
+    def down(path: str) -> str:
+        if not path or os.path.isabs(path):
+            return path
+        return os.path.join("..", path)
+    def down_exe(path: str) -> str:
+        if os.sep not in path:
+            return path  # found via $PATH
+        return down(path)
+    return {"topsrcdir": down(topsrcdir), "bindir": down(bindir), "downloaddir": down(downloaddir),
+            "downloadmirror": down(downloadmirror), "downloadmanifest": down(downloadmanifest),
+            "fixturesdir": down(fixturesdir), "refresh_fixtures": refresh_fixtures,
+            "RUSAGE": {} if RUSAGE is not None else None,
+            "RESULTCACHE": RESULTCACHE, "RESULTS": RESULTS,
+            "mkzip": down_exe(mkzip), "unzip": down_exe(unzip), "unzip_skip": unzip_skip,
+            "exeext": exeext, "nodownloads": nodownloads, "readme": readme, "KEEP": KEEP}
+
+def parallel_worker_init(settings: Dict[str, Any]) -> None:
+    """ each worker process runs in its own tmp.j* directory with links to the fixtures """
+    global WORKDIR
+    globals().update(settings)
+    workdir = "tmp.j%i" % os.getpid()
+    if os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+    for name in os.listdir("."):
+        if name.startswith("tmp.") or name == testdatadir:
+            continue
+        if os.path.isdir(name) or os.access(name, os.X_OK) or [pattern for pattern in FIXTURES if matches(name, pattern)]:
+            os.symlink(os.path.join("..", name), os.path.join(workdir, name))
+    os.chdir(workdir)
+    WORKDIR = workdir
+
+def parallel_worker_run(testid: Tuple[str, str]) -> List[TestOutcome]:
+    classname, method = testid
+    testclass = globals()[classname]
+    result = OutcomeResult(WORKDIR)
+    try:
+        testclass(method).run(result)
+    except Exception as e:
+        logg.error("%s: %s", method, e)
+        return [TestOutcome(classname, method, "ERROR", traceback.format_exc(), 0., WORKDIR, [], [])]
+    return result.outcomes
+
+def run_parallel(testids: List[Tuple[str, str]], jobs: int, failfast: bool = False) -> List[TestOutcome]:
+    """ run the fixture tests first (in this directory) and the others in worker processes """
+    outcomes: List[TestOutcome] = []
+    fixtures = OutcomeResult()
+    for classname, method in testids:
+        if fixture_test(method):
+            globals()[classname](method).run(fixtures)
+    outcomes += fixtures.outcomes
+    if failfast and not fixtures.wasSuccessful():
+        return outcomes
+    if downloaddir and not os.path.isdir(downloaddir):
+        os.makedirs(downloaddir)
+    others = [testid for testid in testids if not fixture_test(testid[1])]
+    pool = multiprocessing.Pool(jobs, parallel_worker_init, (parallel_settings(),))
+    try:
+        for items in pool.imap_unordered(parallel_worker_run, others):
+            outcomes += items
+            if failfast and [item for item in items if item.status in ["FAIL", "ERROR"]]:
+                pool.terminate()
+                break
+        else:
+            pool.close()
+    finally:
+        pool.join()
+    order = dict([(testid, num) for num, testid in enumerate(testids)])
+    outcomes.sort(key=lambda item: order.get((item.testclass, item.testname), len(order)))
+    if not KEEP:
+        for workdir in set([item.workdir for item in outcomes if item.workdir]):
+            if os.path.isdir(workdir):
+                shutil.rmtree(workdir)
+    return outcomes
+
+def parallel_report(outcomes: List[TestOutcome], duration: float, verbosity: int = 0) -> bool:
+    """ print the summary like a TextTestRunner and return wasSuccessful() """
+    stream = sys.stderr
+    if verbosity > 1:
+        for item in outcomes:
+            message = item.status
+            if item.status == "skipped":
+                message = "skipped %r" % item.message
+            stream.write("%s (%s.%s) ... %s\n" % (item.testname, __name__, item.testclass, message))
+    else:
+        marks = {"ok": ".", "FAIL": "F", "ERROR": "E", "skipped": "s", "expected failure": "x"}
+        stream.write("".join([marks.get(item.status, "?") for item in outcomes]) + "\n")
+    problems = [item for item in outcomes if item.status in ["FAIL", "ERROR"]]
+    for item in problems:
+        stream.write("=" * 70 + "\n")
+        stream.write("%s: %s (%s.%s)\n" % (item.status, item.testname, __name__, item.testclass))
+        stream.write("-" * 70 + "\n")
+        stream.write(item.message + "\n")
+    stream.write("-" * 70 + "\n")
+    stream.write("Ran %i tests in %.3fs\n\n" % (len(outcomes), duration))
+    counts = collections.Counter([item.status for item in outcomes])
+    infos = []
+    if counts["FAIL"]: infos.append("failures=%i" % counts["FAIL"])
+    if counts["ERROR"]: infos.append("errors=%i" % counts["ERROR"])
+    if counts["skipped"]: infos.append("skipped=%i" % counts["skipped"])
+    if counts["expected failure"]: infos.append("expected failures=%i" % counts["expected failure"])
+    status = problems and "FAILED" or "OK"
+    stream.write(status + (infos and " (%s)" % ", ".join(infos) or "") + "\n")
+    return not problems
+
+def junit_report(outcomes: List[TestOutcome], duration: float, filename: str) -> None:
+    """ write the outcomes as a junit xml file (like xmlrunner does) """
+    import xml.etree.ElementTree as ET
+    counts = collections.Counter([item.status for item in outcomes])
+    suite = ET.Element("testsuite", name=__name__, tests=str(len(outcomes)), time="%.3f" % duration,
+                       failures=str(counts["FAIL"]), errors=str(counts["ERROR"]), skipped=str(counts["skipped"]))
+    for item in outcomes:
+        case = ET.SubElement(suite, "testcase", classname="%s.%s" % (__name__, item.testclass),
+                             name=item.testname, time="%.3f" % item.duration)
+        if item.status == "FAIL":
+            ET.SubElement(case, "failure", message=item.message.strip().split("\n")[-1]).text = item.message
+        elif item.status == "ERROR":
+            ET.SubElement(case, "error", message=item.message.strip().split("\n")[-1]).text = item.message
+        elif item.status == "skipped":
+            ET.SubElement(case, "skipped", message=item.message)
+    suites = ET.Element("testsuites")
+    suites.append(suite)
+    ET.ElementTree(suites).write(filename, encoding="utf-8", xml_declaration=True)
+
+
 if __name__ == "__main__":
     import optparse
     _o = optparse.OptionParser("%prog [options] test_xxx")
@@ -4114,6 +5425,10 @@ if __name__ == "__main__":
                   help="setup helper: get downloads only [%default]")
     _o.add_option("-d", "--downloaddir", metavar="DIR", default=downloaddir,
                   help="put and get downloads from here [%default]")
+    _o.add_option("-M", "--mirror", metavar="DIR", default=downloadmirror,
+                  help="get downloads from this local directory first [%default]")
+    _o.add_option("--manifest", metavar="FILE", default=downloadmanifest,
+                  help="the sha256 and size of verified downloads [downloads.json in the downloaddir]")
     _o.add_option("-n", "--nodownloads", action="store_true", default=nodownloads,
                   help="no downloads / skipping CVE zip file tests [%default]")
     _o.add_option("--downloads", metavar="YES", default="")
@@ -4129,18 +5444,32 @@ if __name__ == "__main__":
                   help="name or path to unzip.exe to unpack *.zip [%default]")
     _o.add_option("-E", "--exeext", metavar="EXT", default=exeext,
                   help="the executable extension (automake $(EXEEXT)) [%default]")
+    _o.add_option("--fixturesdir", metavar="DIR", default=fixturesdir,
+                  help="reuse the generated test*.zip and test*x.dat files from here [%default]")
+    _o.add_option("--refresh-fixtures", action="store_true", default=refresh_fixtures,
+                  help="regenerate the test*.zip and test*x.dat files (and update the cache) [%default]")
     _o.add_option("-K", "--keep", action="store_true", default=KEEP,
                   help="Keep test data around. [%default]")
     _o.add_option("--failfast", action="store_true", default=False,
                   help="Stop the test run on the first error or failure. [%default]")
     _o.add_option("--xmlresults", metavar="FILE", default=None,
                   help="capture results as a junit xml file [%default]")
+    _o.add_option("--rusage", metavar="FILE", default=None,
+                  help="resource usage per test as json [the xmlresults .rusage.json]")
+    _o.add_option("--cache", metavar="FILE", default=RESULTCACHE,
+                  help="skip tests that passed with the same binaries and inputs (e.g. tmp.results.json)")
+    _o.add_option("--no-cache", action="store_true", default=False,
+                  help="run all tests (and refresh the --cache file) [%default]")
+    _o.add_option("-j", "--jobs", metavar="N", type="int", default=0,
+                  help="run tests in N worker processes (after the test_100xx fixtures) [%default]")
     _o.add_option("-v", "--verbose", action="count", default=0,
                   help="increase logging output [%default]")
     opt, args = _o.parse_args()
     logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
     downloadonly = opt.downloadonly
     downloaddir = opt.downloaddir
+    downloadmirror = opt.mirror
+    downloadmanifest = opt.manifest
     nodownloads = yesno(opt.nodownloads)
     if opt.downloads:
         nodownloads = not yesno(opt.downloads)
@@ -4148,6 +5477,8 @@ if __name__ == "__main__":
     bindir = opt.bindir
     testdatdir = opt.testdatadir
     KEEP = opt.keep
+    fixturesdir = opt.fixturesdir
+    refresh_fixtures = opt.refresh_fixtures
     if opt.mkzip.endswith("-NOTFOUND"):
         logg.error("  no infozip 'zip' found, expect failing tests (given -Z %s)", opt.mkzip)
     else:
@@ -4160,7 +5491,7 @@ if __name__ == "__main__":
     exeext = opt.exeext
     #
     if downloadonly:
-        downloads = 0
+        downloads: List[Tuple[str, str]] = []
         for classname in sorted(list(globals())):
             if not classname.endswith("Test"):
                 continue
@@ -4170,16 +5501,19 @@ if __name__ == "__main__":
                     name = item.replace("url_", "zip_")
                     if name in testclass.__dict__:
                         url = testclass.__dict__[item]
-                        zip = testclass.__dict__[name]
-                        download(url, zip)
-                        downloads += 1
-        if downloads:
+                        zipname = testclass.__dict__[name]
+                        if (url, zipname) not in downloads:
+                            downloads.append((url, zipname))
+        done = prefetch(downloads, opt.jobs or 8)
+        logg.info("have %i of %i downloads", len(done), len(downloads))
+        if done:
             sys.exit(0)
         logg.error("could not download any file")
         sys.exit(1)
     #
     if not args: args += ["test_"]
     suite = unittest.TestSuite()
+    testids = []
     for arg in args:
         for classname in sorted(list(globals())):
             if not classname.endswith("Test"):
@@ -4191,6 +5525,31 @@ if __name__ == "__main__":
                     arg = "test" + arg[1:]
                 if matches(method, arg):
                     suite.addTest(testclass(method))
+                    testids.append((classname, method))
+    RESULTCACHE = opt.cache
+    if RESULTCACHE and not opt.no_cache:
+        RESULTS = results_load(RESULTCACHE)
+    rusagefile = opt.rusage or (opt.xmlresults and rusage_filename(opt.xmlresults))
+    if rusagefile:
+        RUSAGE = {}
+    if opt.jobs > 1:
+        started = time.time()
+        outcomes = run_parallel(testids, opt.jobs, opt.failfast)
+        duration = time.time() - started
+        if opt.xmlresults:
+            if os.path.exists(opt.xmlresults):
+                os.remove(opt.xmlresults)
+            logg.info("xml results into %s", opt.xmlresults)
+            junit_report(outcomes, duration, opt.xmlresults)
+        if rusagefile:
+            rusage_report(dict([(item.testname, item.resources) for item in outcomes if item.resources]), rusagefile)
+        if RESULTCACHE:
+            results_save(RESULTCACHE, [item.testname for item in outcomes if item.status == "ok"],
+                         [item.testname for item in outcomes if item.status in ["FAIL", "ERROR"]],
+                         dict([(item.testname, set(item.depends)) for item in outcomes if item.depends]))
+        if not parallel_report(outcomes, duration, opt.verbose):
+            sys.exit(1)
+        sys.exit(0)
     # select runner
     xmlresults = None
     if opt.xmlresults:
@@ -4205,5 +5564,12 @@ if __name__ == "__main__":
     else:
         Runner = unittest.TextTestRunner
         result = Runner(verbosity=opt.verbose, failfast=opt.failfast).run(suite)
+    if rusagefile and RUSAGE is not None:
+        rusage_report(RUSAGE, rusagefile)
+    if RESULTCACHE:
+        problems = [test.id().split(".")[-1] for test, _ in result.failures + result.errors]
+        skipped = [test.id().split(".")[-1] for test, _ in result.skipped]
+        passed = [testid[1] for testid in testids if testid[1] not in problems and testid[1] not in skipped]
+        results_save(RESULTCACHE, passed, problems, DEPENDS)
     if not result.wasSuccessful():
         sys.exit(1)
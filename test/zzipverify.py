@@ -0,0 +1,146 @@
+#! /usr/bin/env python3
+""" Verifies the crc32 and the uncompressed size of every entry of a zip archive.
+    The entries are sharded by their compressed size over a process pool - each
+    worker maps the archive (see ZZipMapped) and inflates with zzip_disk_fread
+    in chunks into one reused buffer, so no entry is held in memory as a whole. """
+
+__author__ = "Guido U. Draheim"
+
+from typing import Optional, List, Dict, Tuple, Any
+import ctypes
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+from zzipctypes import ZZipMapped, ZZipInfo, ZZipError, strdup_result
+from zzipextract import plan, Work
+
+logg = logging.getLogger("zzipverify")
+
+CHUNK = 1024 * 1024
+SHARDS = 4  # per job - smaller shards even out the load
+
+Problem = Tuple[str, str]  # name and what is wrong with it
+
+_mapped: Optional[ZZipMapped] = None
+
+def verify_entry(zipped: ZZipMapped, entry: int, info: ZZipInfo, buf: Any) -> Optional[str]:
+    """ the problem of the entry - or None if it is okay """
+    if info.flags & 1:
+        return "encrypted"
+    fp = zipped.lib.zzip_disk_entry_fopen(zipped.disk, entry)
+    if not fp:
+        return "can not open (compression %i)" % info.compr
+    size = len(buf)
+    view = memoryview(buf)
+    done, crc = 0, 0
+    try:
+        while True:
+            got = zipped.lib.zzip_disk_fread(buf, 1, size, fp)
+            if not got:
+                break
+            crc = zlib.crc32(view[:got], crc)
+            done += got
+            if done > info.usize:
+                break
+    finally:
+        view.release()
+        zipped.lib.zzip_disk_fclose(fp)
+    if done != info.usize:
+        return "size %i (expected %i)" % (done, info.usize)
+    if crc != info.crc32:
+        return "crc32 %08x (expected %08x)" % (crc, info.crc32)
+    return None
+
+def verify_shard(zipped: ZZipMapped, shard: List[Tuple[int, ZZipInfo]], chunk: int = CHUNK) -> Dict[str, Any]:
+    """ the shard has the offsets of the entries in the central directory """
+    buf = ctypes.create_string_buffer(chunk)
+    done, bad = 0, []
+    for cdoff, info in shard:
+        try:
+            problem = verify_entry(zipped, zipped.base + cdoff, info, buf)
+        except OSError as e:
+            problem = str(e)
+        if problem:
+            bad.append((info.name, problem))
+        done += info.usize
+    return {"entries": len(shard), "bytes": done, "bad": bad}
+
+def worker_init(filename: str, bins: Optional[str]) -> None:
+    global _mapped
+    _mapped = ZZipMapped(filename, bins)
+
+def worker_shard(task: Tuple[List[Tuple[int, ZZipInfo]], int]) -> Dict[str, Any]:
+    assert _mapped is not None
+    return verify_shard(_mapped, task[0], task[1])
+
+def verify(filename: str, jobs: int = 0, bins: Optional[str] = None, chunk: int = CHUNK) -> Dict[str, Any]:
+    """ the bad entries and the throughput """
+    started = time.perf_counter()
+    bad: List[Problem] = []
+    works: List[Work] = []
+    with ZZipMapped(filename, bins) as zipped:
+        for entry in zipped.entries():
+            try:
+                works.append((entry - zipped.base, zipped.entry_info(entry)))
+            except ZZipError as e:
+                name = strdup_result(zipped.lib.zzip_disk_entry_strdup_name(zipped.disk, entry))
+                bad.append((name, str(e.strerror or "bad entry")))
+    jobs = jobs or os.cpu_count() or 1
+    shards = plan(works, jobs * SHARDS if jobs > 1 else 1)
+    results: List[Dict[str, Any]] = []
+    if jobs == 1:
+        with ZZipMapped(filename, bins) as zipped:
+            results = [verify_shard(zipped, shard, chunk) for shard in shards]
+    else:
+        pool = multiprocessing.Pool(jobs, worker_init, (filename, bins))
+        try:
+            results = list(pool.imap_unordered(worker_shard, [(shard, chunk) for shard in shards]))
+        finally:
+            pool.close()
+            pool.join()
+    for result in results:
+        bad += result["bad"]
+    wall = time.perf_counter() - started
+    done = sum([result["bytes"] for result in results])
+    compressed = sum([info.csize for _, info in works])
+    summary = {"archive": filename, "entries": len(works), "bytes": done, "compressed": compressed,
+               "bad": [{"name": name, "problem": problem} for name, problem in sorted(bad)],
+               "jobs": jobs, "wall": wall, "mb_per_s": done / (wall or 1e-9) / 1000000,
+               "compressed_mb_per_s": compressed / (wall or 1e-9) / 1000000}
+    logg.info("%s: %i entries, %i bytes in %.3fs (%.1f MB/s) by %i jobs - %i bad", filename, len(works),
+              done, wall, summary["mb_per_s"], jobs, len(bad))
+    return summary
+
+if __name__ == "__main__":
+    import optparse
+    _o = optparse.OptionParser("%prog [options] zipfile...")
+    _o.add_option("-b", "--bindir", metavar="DIR", default=None,
+                  help="the bins/ of the build tree (its ../zzip has the libraries)")
+    _o.add_option("-j", "--jobs", metavar="N", type="int", default=0,
+                  help="worker processes (0 = one per cpu) [%default]")
+    _o.add_option("--chunk", metavar="SIZE", type="int", default=CHUNK,
+                  help="bytes per zzip_disk_fread [%default]")
+    _o.add_option("-o", "--output", metavar="FILE", default="",
+                  help="write the json summary here [%default]")
+    _o.add_option("-v", "--verbose", action="count", default=0,
+                  help="increase logging output [%default]")
+    opt, args = _o.parse_args()
+    logging.basicConfig(level=logging.WARNING - 10 * opt.verbose)
+    if not args:
+        _o.error("no zipfile given")
+    summaries = []
+    for filename in args:
+        summary = verify(filename, opt.jobs, opt.bindir, opt.chunk)
+        for item in summary["bad"]:
+            print("%s: %s: %s" % (filename, item["name"], item["problem"]))
+        print("%s: %i entries, %i bad, %.1f MB/s" % (filename, summary["entries"], len(summary["bad"]), summary["mb_per_s"]))
+        summaries.append(summary)
+    if opt.output:
+        with open(opt.output, "w") as f:
+            json.dump(summaries, f, indent=1)
+    sys.exit(1 if [summary for summary in summaries if summary["bad"]] else 0)
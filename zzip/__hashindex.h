@@ -0,0 +1,202 @@
+#ifndef __ZZIP_INTERNAL_HASHINDEX_H
+#define __ZZIP_INTERNAL_HASHINDEX_H
+/** included by mmapped.c, memdisk.c
+ *
+ * The name index of a central directory - a hash table for the exact
+ * lookup of zzip_disk_findfile and an array sorted by name for the
+ * literal prefix of a zzip_disk_findmatch filespec. The entries are
+ * kept as void* so that it can carry ZZIP_DISK_ENTRY* and ZZIP_MEM_ENTRY*
+ *
+ * Copyright (c) Guido Draheim, use under copyleft (LGPL,MPL)
+ */
+
+#include <zzip/conf.h>
+#include <zzip/mmapped.h>
+#include <stdlib.h>
+#include <string.h>
+
+struct zzip_hashindex_item {
+    char*  name;  /* zero-terminated */
+    size_t hash;  /* of the name */
+    size_t rank;  /* position in the sorted array */
+    void*  entry; /* the ZZIP_DISK_ENTRY* or ZZIP_MEM_ENTRY* */
+};
+
+struct zzip_hashindex {
+    size_t                       count;  /* items in archive order */
+    size_t                       mask;   /* slots - 1 (a power of two) */
+    size_t*                      slots;  /* item position + 1, zero is empty */
+    struct zzip_hashindex_item*  items;  /* in archive order */
+    struct zzip_hashindex_item** sorted; /* by name - created on first use */
+    char*                        names;  /* the name copies (if needed) */
+    const void*                  owner;  /* the ZZIP_DISK* or ZZIP_MEM_DISK* it was made for */
+};
+
+/* both kinds of index live in the reserved member of the ZZIP_DISK */
+static struct zzip_hashindex*
+_zzip_hashindex_of(void* reserved, const void* owner)
+{
+    struct zzip_hashindex* index = reserved;
+    return index && index->owner == owner ? index : 0;
+}
+
+/* FNV-1a */
+static size_t
+_zzip_hashindex_hash(const char* name)
+{
+    size_t hash = (size_t) 2166136261u;
+    for (; *name; name++) {
+        hash ^= (unsigned char) *name;
+        hash *= 16777619u;
+    }
+    return hash;
+}
+
+static void
+_zzip_hashindex_free(struct zzip_hashindex* index)
+{
+    if (! index)
+        return;
+    free(index->slots);
+    free(index->items);
+    free(index->sorted);
+    free(index->names);
+    free(index);
+}
+
+/* namebytes is the space for name copies that _add may reference */
+static struct zzip_hashindex*
+_zzip_hashindex_new(size_t count, size_t namebytes)
+{
+    struct zzip_hashindex* index = calloc(1, sizeof(*index));
+    if (! index)
+        return 0; /* ENOMEM */
+    index->mask = 15;
+    while (index->mask < count * 2)
+        index->mask = index->mask * 2 + 1;
+    index->slots = calloc(index->mask + 1, sizeof(size_t));
+    index->items = malloc((count ? count : 1) * sizeof(struct zzip_hashindex_item));
+    if (namebytes)
+        index->names = malloc(namebytes);
+    if (! index->slots || ! index->items || (namebytes && ! index->names)) {
+        _zzip_hashindex_free(index);
+        return 0; /* ENOMEM */
+    }
+    return index;
+}
+
+/* the first of duplicate names wins - as the linear search would find it */
+static void
+_zzip_hashindex_add(struct zzip_hashindex* index, char* name, void* entry)
+{
+    struct zzip_hashindex_item* item = &index->items[index->count++];
+    size_t                      pos;
+    item->name  = name;
+    item->hash  = _zzip_hashindex_hash(name);
+    item->rank  = 0;
+    item->entry = entry;
+    for (pos = item->hash & index->mask; index->slots[pos]; pos = (pos + 1) & index->mask) {
+        struct zzip_hashindex_item* known = &index->items[index->slots[pos] - 1];
+        if (known->hash == item->hash && ! strcmp(known->name, name))
+            return;
+    }
+    index->slots[pos] = index->count;
+}
+
+static struct zzip_hashindex_item*
+_zzip_hashindex_find(struct zzip_hashindex* index, const char* name)
+{
+    size_t hash = _zzip_hashindex_hash(name);
+    size_t pos  = hash & index->mask;
+    for (; index->slots[pos]; pos = (pos + 1) & index->mask) {
+        struct zzip_hashindex_item* item = &index->items[index->slots[pos] - 1];
+        if (item->hash == hash && ! strcmp(item->name, name))
+            return item;
+    }
+    return 0;
+}
+
+static int
+_zzip_hashindex_compare(const void* a, const void* b)
+{
+    const struct zzip_hashindex_item* x = *(const struct zzip_hashindex_item* const*) a;
+    const struct zzip_hashindex_item* y = *(const struct zzip_hashindex_item* const*) b;
+    int cmp = strcmp(x->name, y->name);
+    if (cmp)
+        return cmp;
+    return x < y ? -1 : x > y; /* duplicates stay in archive order */
+}
+
+/* returns 0 on ENOMEM */
+static struct zzip_hashindex_item**
+_zzip_hashindex_sorted(struct zzip_hashindex* index)
+{
+    size_t rank;
+    if (index->sorted)
+        return index->sorted;
+    index->sorted = malloc((index->count ? index->count : 1) * sizeof(struct zzip_hashindex_item*));
+    if (! index->sorted)
+        return 0; /* ENOMEM */
+    for (rank = 0; rank < index->count; rank++)
+        index->sorted[rank] = &index->items[rank];
+    qsort(index->sorted, index->count, sizeof(struct zzip_hashindex_item*), _zzip_hashindex_compare);
+    for (rank = 0; rank < index->count; rank++)
+        index->sorted[rank]->rank = rank;
+    return index->sorted;
+}
+
+/* the length of the filespec before the first wildcard */
+static size_t
+_zzip_hashindex_literal(const char* filespec)
+{
+    return strcspn(filespec, "*?[\\");
+}
+
+/* the first rank with a name not less than the prefix */
+static size_t
+_zzip_hashindex_lower(struct zzip_hashindex* index, const char* prefix, size_t len)
+{
+    size_t lo = 0, hi = index->count;
+    while (lo < hi) {
+        size_t mid = lo + (hi - lo) / 2;
+        if (strncmp(index->sorted[mid]->name, prefix, len) < 0)
+            lo = mid + 1;
+        else
+            hi = mid;
+    }
+    return lo;
+}
+
+/** the next entry in name order with the literal prefix of the filespec
+ * that the compare function matches - after the entry with that name
+ * (or from the start if null). The caller did run _zzip_hashindex_sorted.
+ */
+static void*
+_zzip_hashindex_findmatch(struct zzip_hashindex* index, char* filespec, void* after,
+                          const char* aftername, zzip_fnmatch_fn_t compare, int flags)
+{
+    size_t len  = _zzip_hashindex_literal(filespec);
+    size_t rank = 0;
+    if (after) {
+        struct zzip_hashindex_item* item = aftername ? _zzip_hashindex_find(index, aftername) : 0;
+        if (! item)
+            return 0;
+        for (rank = item->rank; rank < index->count; rank++) {
+            if (index->sorted[rank]->entry == after)
+                break;
+        }
+        rank++;
+    } else {
+        rank = _zzip_hashindex_lower(index, filespec, len);
+    }
+    for (; rank < index->count; rank++) {
+        struct zzip_hashindex_item* item = index->sorted[rank];
+        if (strncmp(item->name, filespec, len))
+            break;
+        if (! compare(filespec, item->name, flags))
+            return item->entry;
+    }
+    return 0;
+}
+
+#endif
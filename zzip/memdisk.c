@@ -25,6 +25,7 @@
 #include <stdlib.h>
 #include <string.h>
 #include <time.h>
+#include <sys/stat.h>
 
 #include <zlib.h>
 #include <zzip/format.h>
@@ -33,6 +34,7 @@
 #include <zzip/memdisk.h>
 #include <zzip/__errno.h>
 #include <zzip/__fnmatch.h>
+#include <zzip/__hashindex.h>
 
 #define ___  {
 #define ____ }
@@ -128,6 +130,180 @@ zzip_mem_disk_buffer(char* buffer, size_t buflen)
     ____;
 }
 
+/* the sidecar index as written by test/zzipsidecar.py (little endian) */
+#define ZZIP_SIDECAR_SUFFIX     ".zzipidx"
+#define ZZIP_SIDECAR_MAGIC      "ZZIPIDX1"
+#define ZZIP_SIDECAR_VERSION    1
+#define ZZIP_SIDECAR_HEADERSIZE 128
+#define ZZIP_SIDECAR_RECORDSIZE 56
+
+/* the entries from the records of a valid sidecar - returns -1 if it does not match */
+static long
+zzip_mem_disk_load_sidecar(ZZIP_MEM_DISK* dir, ZZIP_DISK* disk, ZZIP_DISK* sidecar,
+                           struct stat* st)
+{
+    zzip_byte_t* head     = sidecar->buffer;
+    zzip_size_t  size     = sidecar->endbuf - sidecar->buffer;
+    zzip_size_t  disksize = disk->endbuf - disk->buffer;
+    if (size < ZZIP_SIDECAR_HEADERSIZE || memcmp(head, ZZIP_SIDECAR_MAGIC, 8) ||
+        ZZIP_GET16(head + 8) != ZZIP_SIDECAR_VERSION ||
+        ZZIP_GET16(head + 10) != ZZIP_SIDECAR_RECORDSIZE) {
+        debug1("not a sidecar");
+        return -1;
+    }
+    ___ uint64_t archive_size = ZZIP_GET64(head + 12);
+    uint64_t     mtime_ns     = ZZIP_GET64(head + 20);
+    uint64_t     cd_offset    = ZZIP_GET64(head + 28);
+    uint64_t     cd_size      = ZZIP_GET64(head + 36);
+    uint32_t     count        = ZZIP_GET32(head + 44);
+    uint64_t     records      = ZZIP_GET64(head + 52);
+    uint64_t     names        = ZZIP_GET64(head + 68);
+    uint64_t     names_size   = ZZIP_GET64(head + 76);
+    if (archive_size != disksize || archive_size != (uint64_t) st->st_size ||
+        mtime_ns / 1000000000u != (uint64_t) st->st_mtime) {
+        debug1("stale sidecar - the archive has changed");
+        return -1;
+    }
+    if (! count || records + (uint64_t) count * ZZIP_SIDECAR_RECORDSIZE > size ||
+        names + names_size > size || cd_offset + cd_size + 4 > disksize ||
+        ! ZZIP_DISK_ENTRY_CHECKMAGIC(disk->buffer + cd_offset) ||
+        ! (ZZIP_DISK_TRAILER_CHECKMAGIC(disk->buffer + cd_offset + cd_size) ||
+           ZZIP_DISK64_TRAILER_CHECKMAGIC(disk->buffer + cd_offset + cd_size))) {
+        debug1("stale sidecar - no central directory at its offset");
+        return -1;
+    }
+    dir->disk = disk;
+    ___ uint32_t num;
+    uint32_t     dostime  = 0;
+    long         unixtime = 0;
+    for (num = 0; num < count; num++) {
+        zzip_byte_t* record  = head + records + (uint64_t) num * ZZIP_SIDECAR_RECORDSIZE;
+        uint64_t     cdoff   = ZZIP_GET64(record);
+        uint64_t     dataoff = ZZIP_GET64(record + 8);
+        uint64_t     nameoff = ZZIP_GET64(record + 32);
+        uint32_t     namelen = ZZIP_GET32(record + 40);
+        if (cdoff < cd_offset || cdoff + sizeof(struct zzip_disk_entry) > cd_offset + cd_size ||
+            nameoff + namelen >= names_size || head[names + nameoff + namelen]) {
+            debug2("bad sidecar record %li", (long) num);
+            goto error;
+        }
+        ___ struct zzip_disk_entry* entry = (struct zzip_disk_entry*) (disk->buffer + cdoff);
+        ZZIP_MEM_ENTRY*             item  = calloc(1, sizeof(*item));
+        if (! item)
+            goto error; /* errno=ENOMEM */
+        if (dir->last) {
+            dir->last->zz_next = item; /* chain last */
+        }
+        else {
+            dir->list = item;
+        }
+        dir->last          = item;
+        item->zz_name      = strdup((char*) head + names + nameoff);
+        item->zz_comment   = zzip_disk_entry_strdup_comment(disk, entry);
+        item->zz_data      = disk->buffer + dataoff;
+        item->zz_csize     = ZZIP_GET64(record + 16);
+        item->zz_usize     = ZZIP_GET64(record + 24);
+        item->zz_crc32     = ZZIP_GET32(record + 44);
+        item->zz_compr     = ZZIP_GET16(record + 52);
+        item->zz_flags     = ZZIP_GET16(record + 54);
+        item->zz_diskstart = zzip_disk_entry_get_diskstart(entry);
+        item->zz_filetype  = zzip_disk_entry_get_filetype(entry);
+        ___ uint32_t entrytime = ZZIP_GET16(entry->z_dostime.time) |
+                                 (uint32_t) ZZIP_GET16(entry->z_dostime.date) << 16;
+        if (! num || entrytime != dostime) { /* mktime is the slowest part */
+            dostime  = entrytime;
+            unixtime = zzip_disk_entry_get_mktime(entry);
+        }
+        item->zz_mktime = unixtime;
+        ____;
+        if (! item->zz_name || ! item->zz_comment)
+            goto error; /* errno=ENOMEM */
+        if (dataoff + item->zz_csize >= disksize ||
+            (item->zz_compr == ZZIP_IS_STORED && item->zz_csize != item->zz_usize)) {
+            debug2("sidecar entry data out of range: %s", item->zz_name);
+            goto error;
+        }
+        ___ zzip_size_t ext1_len = zzip_disk_entry_get_extras(entry);
+        zzip_byte_t*    ext1_ptr = zzip_disk_entry_to_extras(entry);
+        if (ext1_len > 0 && ext1_ptr + ext1_len < disk->endbuf) {
+            item->zz_ext[1] = malloc(ext1_len);
+            if (! item->zz_ext[1])
+                goto error; /* errno=ENOMEM */
+            item->zz_extlen[1] = ext1_len;
+            memcpy(item->zz_ext[1], ext1_ptr, ext1_len);
+        }
+        ____;
+        ____;
+    }
+    return (long) count;
+    ____;
+    ____;
+error:
+    while (dir->list) {
+        ZZIP_MEM_ENTRY* next = dir->list->zz_next;
+        zzip_mem_entry_free(dir->list);
+        dir->list = next;
+    }
+    dir->list = dir->last = 0;
+    dir->disk             = 0;
+    return -1;
+}
+
+/** create new diskdir handle from a sidecar index.
+ *  This function wraps underlying zzip_disk_open like => zzip_mem_disk_open
+ *  but the entries are made from the records of a sidecar index (as written
+ *  by test/zzipsidecar.py) instead of parsing the central directory - the
+ *  local file headers are not read and the central directory is only used
+ *  for the date, the comment and its extra block. The sidecar name is the
+ *  filename with ".zzipidx" if it is null. If the sidecar is missing or it
+ *  does not match the archive (size, mtime, central directory offset) then
+ *  the central directory is parsed as in => zzip_mem_disk_open.
+ *  Note that the extra blocks of the local file headers (zz_ext[2]) are not
+ *  loaded from a sidecar.
+ */
+zzip__new__ ZZIP_MEM_DISK*
+zzip_mem_disk_open_sidecar(char* filename, char* sidecar)
+{
+    struct stat st;
+    if (stat(filename, &st))
+        return 0; /* ENOENT */
+    ___ ZZIP_DISK* disk = zzip_disk_open(filename);
+    if (! disk) {
+        debug2("can not open disk file %s", filename);
+        return 0;
+    }
+    ___ ZZIP_MEM_DISK* dir = zzip_mem_disk_new();
+    if (! dir) {
+        zzip_disk_close(disk);
+        return 0; /* ENOMEM */
+    }
+    ___ char* sidecarname = sidecar;
+    if (! sidecar) {
+        sidecarname = malloc(strlen(filename) + sizeof(ZZIP_SIDECAR_SUFFIX));
+        if (sidecarname) {
+            strcpy(sidecarname, filename);
+            strcat(sidecarname, ZZIP_SIDECAR_SUFFIX);
+        }
+    }
+    ___ ZZIP_DISK* index = sidecarname ? zzip_disk_open(sidecarname) : 0;
+    if (sidecarname != sidecar)
+        free(sidecarname);
+    if (index) {
+        long count = zzip_mem_disk_load_sidecar(dir, disk, index, &st);
+        zzip_disk_close(index);
+        if (count >= 0)
+            return dir;
+    }
+    if (zzip_mem_disk_load(dir, disk) == -1) {
+        debug2("unable to load disk %s", filename);
+    }
+    return dir;
+    ____;
+    ____;
+    ____;
+    ____;
+}
+
 /** parse central dir.
  *  creates an internal copy of each entry converted to the local platform.
  *  returns: number of entries, or -1 on error (setting errno)
@@ -372,6 +548,7 @@ void
 zzip_mem_disk_unload(ZZIP_MEM_DISK* dir)
 {
     ZZIP_MEM_ENTRY* item = dir->list;
+    zzip_mem_disk_unindex(dir);
     while (item) {
         ZZIP_MEM_ENTRY* next = item->zz_next;
         zzip_mem_entry_free(item);
@@ -453,7 +630,12 @@ ZZIP_MEM_ENTRY*
 zzip_mem_disk_findfile(ZZIP_MEM_DISK* dir, char* filename, ZZIP_MEM_ENTRY* after,
                        zzip_strcmp_fn_t compare)
 {
-    ZZIP_MEM_ENTRY* entry = (! after ? dir->list : after->zz_next);
+    struct zzip_hashindex* index = dir->disk ? _zzip_hashindex_of(dir->disk->reserved, dir) : 0;
+    if (! after && ! compare && index) {
+        struct zzip_hashindex_item* item = _zzip_hashindex_find(index, filename);
+        return item ? item->entry : 0;
+    }
+    ___ ZZIP_MEM_ENTRY* entry = (! after ? dir->list : after->zz_next);
     if (! compare)
         compare = (zzip_strcmp_fn_t) (strcmp);
     for (; entry; entry = entry->zz_next) {
@@ -462,6 +644,7 @@ zzip_mem_disk_findfile(ZZIP_MEM_DISK* dir, char* filename, ZZIP_MEM_ENTRY* after
         }
     }
     return 0;
+    ____;
 }
 
 /* => zzip_mem_disk_findfile
@@ -471,7 +654,12 @@ ZZIP_MEM_ENTRY*
 zzip_mem_disk_findmatch(ZZIP_MEM_DISK* dir, char* filespec, ZZIP_MEM_ENTRY* after,
                         zzip_fnmatch_fn_t compare, int flags)
 {
-    ZZIP_MEM_ENTRY* entry = (! after ? dir->list : after->zz_next);
+    struct zzip_hashindex* index = dir->disk ? _zzip_hashindex_of(dir->disk->reserved, dir) : 0;
+    if (! compare && index && ! (flags & _zzip_FNM_CASEFOLD) && _zzip_hashindex_sorted(index)) {
+        return _zzip_hashindex_findmatch(index, filespec, after, after ? after->zz_name : 0,
+                                         (zzip_fnmatch_fn_t) _zzip_fnmatch, flags);
+    }
+    ___ ZZIP_MEM_ENTRY* entry = (! after ? dir->list : after->zz_next);
     if (! compare)
         compare = (zzip_fnmatch_fn_t) _zzip_fnmatch;
     for (; entry; entry = entry->zz_next) {
@@ -480,6 +668,54 @@ zzip_mem_disk_findmatch(ZZIP_MEM_DISK* dir, char* filespec, ZZIP_MEM_ENTRY* afte
         }
     }
     return 0;
+    ____;
+}
+
+/** create a name index for the lookup functions.
+ * This function puts the names of the loaded entries into a hash table,
+ * so that => zzip_mem_disk_findfile does not need to walk the list. The
+ * => zzip_mem_disk_findmatch function will check only the entries with
+ * the literal prefix of the filespec - returning them in name order.
+ * See => zzip_disk_index for the details. It is released on unload.
+ * The index is kept in the reserved member of the underlying ZZIP_DISK,
+ * so it replaces an index of => zzip_disk_index (and the other way round).
+ *
+ * This function returns the number of entries or -1 on errors (errno).
+ */
+long
+zzip_mem_disk_index(ZZIP_MEM_DISK* dir)
+{
+    if (! dir || ! dir->disk) {
+        errno = EINVAL;
+        return -1;
+    }
+    zzip_disk_unindex(dir->disk);
+    ___ size_t      count = 0;
+    ZZIP_MEM_ENTRY* entry;
+    for (entry = dir->list; entry; entry = entry->zz_next)
+        count++;
+    ___ struct zzip_hashindex* index = _zzip_hashindex_new(count, 0);
+    if (! index) {
+        errno = ENOMEM;
+        return -1;
+    }
+    for (entry = dir->list; entry; entry = entry->zz_next)
+        _zzip_hashindex_add(index, entry->zz_name, entry);
+    index->owner        = dir;
+    dir->disk->reserved = index;
+    return (long) count;
+    ____;
+    ____;
+}
+
+/** => zzip_mem_disk_index
+ * This function releases the name index (if any).
+ */
+void
+zzip_mem_disk_unindex(ZZIP_MEM_DISK* dir)
+{
+    if (dir && dir->disk && _zzip_hashindex_of(dir->disk->reserved, dir))
+        zzip_disk_unindex(dir->disk);
 }
 
 /** start usage.
@@ -574,11 +810,12 @@ zzip_disk_entry_get_mktime(ZZIP_DISK_ENTRY* entry)
     uint16_t  dostime = ZZIP_GET16(entry->z_dostime.time);
     uint16_t  dosdate = ZZIP_GET16(entry->z_dostime.date);
     struct tm date;
-    date.tm_sec  = (dostime) &0x1F;       /* bits 0..4 */
-    date.tm_min  = (dostime >> 5) & 0x3F; /* bits 5..10 */
-    date.tm_hour = (dostime >> 11);       /* bits 11..15 */
-    date.tm_mday = (dosdate) &0x1F;       /* bits 16..20 */
-    date.tm_mon  = (dosdate >> 5) & 0xF;  /* bits 21..24 */
-    date.tm_year = (dosdate >> 9) + 80;   /* bits 25..31 */
-    return mktime(&date);                 /* well, unix has that function... */
+    date.tm_sec   = (dostime) &0x1F;       /* bits 0..4 */
+    date.tm_min   = (dostime >> 5) & 0x3F; /* bits 5..10 */
+    date.tm_hour  = (dostime >> 11);       /* bits 11..15 */
+    date.tm_mday  = (dosdate) &0x1F;       /* bits 16..20 */
+    date.tm_mon   = (dosdate >> 5) & 0xF;  /* bits 21..24 */
+    date.tm_year  = (dosdate >> 9) + 80;   /* bits 25..31 */
+    date.tm_isdst = -1;                    /* unknown - an uninitialized value makes mktime slow */
+    return mktime(&date);                  /* well, unix has that function... */
 }
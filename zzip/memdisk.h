@@ -36,6 +36,8 @@ zzip_mem_disk_extern zzip__new__ ZZIP_MEM_DISK*
 zzip_mem_disk_fdopen(int fd);
 zzip_mem_disk_extern zzip__new__ ZZIP_MEM_DISK*
 zzip_mem_disk_buffer(char* buffer, size_t buflen);
+zzip_mem_disk_extern zzip__new__ ZZIP_MEM_DISK*
+zzip_mem_disk_open_sidecar(char* filename, char* sidecar);
 zzip_mem_disk_extern void
 zzip_mem_disk_close(ZZIP_MEM_DISK* _zzip_restrict dir);
 
@@ -43,6 +45,10 @@ zzip_mem_disk_extern long
 zzip_mem_disk_load(ZZIP_MEM_DISK* dir, ZZIP_DISK* disk);
 zzip_mem_disk_extern void
 zzip_mem_disk_unload(ZZIP_MEM_DISK* dir);
+zzip_mem_disk_extern long
+zzip_mem_disk_index(ZZIP_MEM_DISK* dir);
+zzip_mem_disk_extern void
+zzip_mem_disk_unindex(ZZIP_MEM_DISK* dir);
 ZZIP_EXTRA_BLOCK*
 zzip_mem_entry_extra_block(ZZIP_MEM_ENTRY* entry, short datatype) ZZIP_GNUC_DEPRECATED;
 ZZIP_EXTRA_BLOCK*
@@ -33,6 +33,7 @@
 #include <zzip/__debug.h>
 #include <zzip/__errno.h>
 #include <zzip/__fnmatch.h>
+#include <zzip/__hashindex.h>
 #include <zzip/__mmap.h>
 #include <zzip/__string.h>
 
@@ -144,6 +145,7 @@ zzip_disk_munmap(ZZIP_DISK* disk)
 {
     if (! disk)
         return 0;
+    zzip_disk_unindex(disk);
     _zzip_munmap(disk->mapped, disk->buffer, disk->endbuf - disk->buffer);
     free(disk);
     return 0;
@@ -235,6 +237,7 @@ zzip_disk_close(ZZIP_DISK* disk)
         return 0;
     if (disk->mapped != -1)
         return zzip_disk_munmap(disk);
+    zzip_disk_unindex(disk);
     if (disk->buffer && disk->flags & ZZIP_DISK_FLAGS_OWNED_BUFFER) {
         free(disk->buffer);
         disk->buffer = NULL;
@@ -274,7 +277,7 @@ struct zzip_file_header*
 zzip_disk_entry_to_file_header(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
 {
     zzip_off64_t offset = zzip_disk_entry_fileoffset(entry);
-    if ((offset & 0xFFFFu) == 0xFFFFu) {
+    if (offset == 0xFFFFFFFFu) { /* the ZIP64 marker */
         zzip_byte_t* extras_ptr = zzip_disk_entry_to_extras(entry);
         if (extras_ptr + sizeof(struct zzip_extra_zip64) > disk->endbuf) {
             debug1("ZIP64 corrupted file header");
@@ -309,26 +312,13 @@ zzip_disk_entry_to_file_header(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
     ____;
 }
 
-/** => zzip_disk_entry_to_data
- * This function is a big helper despite its little name: in a zip file the
- * encoded filenames are usually NOT zero-terminated but for common usage
- * with libc we need it that way. Secondly, the filename SHOULD be present
- * in the zip central directory but if not then we fallback to the filename
- * given in the file_header of each compressed data portion.
- *
- * This function returns a new string buffer, or null on error.
- * If no name can be found then an empty string is returned.
- */
-zzip__new__ char*
-zzip_disk_entry_strdup_name(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
+/* the filename of the entry (not zero-terminated) and its length - the
+ * name in the central directory or else the one in the file_header. */
+static char*
+zzip_disk_entry_name(ZZIP_DISK* disk, struct zzip_disk_entry* entry, zzip_size_t* namelen)
 {
-    if (! disk || ! entry) {
-        errno = EINVAL;
-        return 0;
-    }
-
-    ___ char*   name = 0;
-    zzip_size_t len = len = zzip_disk_entry_namlen(entry);
+    char*       name = 0;
+    zzip_size_t len  = zzip_disk_entry_namlen(entry);
     if (len) {
         name = zzip_disk_entry_to_filename(entry);
     }
@@ -340,7 +330,8 @@ zzip_disk_entry_strdup_name(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
         len = zzip_file_header_namlen(file);
         if (! len) {
             /* neither a name in disk_entry nor in file_header */
-            return strdup(""); /* ENOMEM */
+            *namelen = 0;
+            return (char*) "";
         }
         name = zzip_file_header_to_filename(file);
     }
@@ -350,7 +341,32 @@ zzip_disk_entry_strdup_name(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
         errno = EBADMSG;
         return 0;
     }
+    *namelen = len;
+    return name;
+}
 
+/** => zzip_disk_entry_to_data
+ * This function is a big helper despite its little name: in a zip file the
+ * encoded filenames are usually NOT zero-terminated but for common usage
+ * with libc we need it that way. Secondly, the filename SHOULD be present
+ * in the zip central directory but if not then we fallback to the filename
+ * given in the file_header of each compressed data portion.
+ *
+ * This function returns a new string buffer, or null on error.
+ * If no name can be found then an empty string is returned.
+ */
+zzip__new__ char*
+zzip_disk_entry_strdup_name(ZZIP_DISK* disk, struct zzip_disk_entry* entry)
+{
+    if (! disk || ! entry) {
+        errno = EINVAL;
+        return 0;
+    }
+
+    ___ zzip_size_t len  = 0;
+    char*           name = zzip_disk_entry_name(disk, entry, &len);
+    if (! name)
+        return 0; /* EBADMSG */
     return _zzip_strndup(name, len); /* ENOMEM */
     ____;
 }
@@ -548,7 +564,15 @@ struct zzip_disk_entry*
 zzip_disk_findfile(ZZIP_DISK* disk, char* filename, struct zzip_disk_entry* after,
                    zzip_strcmp_fn_t compare)
 {
-    struct zzip_disk_entry* entry =
+    struct zzip_hashindex* index = _zzip_hashindex_of(disk->reserved, disk);
+    if (! after && ! compare && index && ! (disk->flags & ZZIP_DISK_FLAGS_MATCH_NOCASE)) {
+        struct zzip_hashindex_item* item = _zzip_hashindex_find(index, filename);
+        if (item)
+            return item->entry;
+        errno = ENOENT;
+        return 0;
+    }
+    ___ struct zzip_disk_entry* entry =
         (! after ? zzip_disk_findfirst(disk) : zzip_disk_findnext(disk, after));
     if (! compare)
         compare = (zzip_strcmp_fn_t) ((disk->flags & ZZIP_DISK_FLAGS_MATCH_NOCASE) ? /* .. */
@@ -568,6 +592,7 @@ zzip_disk_findfile(ZZIP_DISK* disk, char* filename, struct zzip_disk_entry* afte
     }
     errno = ENOENT;
     return 0;
+    ____;
 }
 
 /** => zzip_disk_findfile
@@ -590,7 +615,18 @@ struct zzip_disk_entry*
 zzip_disk_findmatch(ZZIP_DISK* disk, char* filespec, struct zzip_disk_entry* after,
                     zzip_fnmatch_fn_t compare, int flags)
 {
-    struct zzip_disk_entry* entry =
+    struct zzip_hashindex* index = _zzip_hashindex_of(disk->reserved, disk);
+    if (! compare && index && ! (disk->flags & ZZIP_DISK_FLAGS_MATCH_NOCASE) &&
+        ! (flags & _zzip_FNM_CASEFOLD) && _zzip_hashindex_sorted(index)) {
+        char* aftername = after ? zzip_disk_entry_strdup_name(disk, after) : 0;
+        void* found     = _zzip_hashindex_findmatch(index, filespec, after, aftername,
+                                                (zzip_fnmatch_fn_t) _zzip_fnmatch, flags);
+        free(aftername);
+        if (! found)
+            errno = ENOENT;
+        return found;
+    }
+    ___ struct zzip_disk_entry* entry =
         (! after ? zzip_disk_findfirst(disk) : zzip_disk_findnext(disk, after));
     if (! compare) {
         compare = (zzip_fnmatch_fn_t) _zzip_fnmatch;
@@ -603,7 +639,7 @@ zzip_disk_findmatch(ZZIP_DISK* disk, char* filespec, struct zzip_disk_entry* aft
         if (! realname) {
             return 0; /* ENOMEM | EBADMSG */
         }
-        if (compare(filespec, realname, flags)) {
+        if (! compare(filespec, realname, flags)) {
             free(realname);
             return entry; /* found */
         }
@@ -611,6 +647,76 @@ zzip_disk_findmatch(ZZIP_DISK* disk, char* filespec, struct zzip_disk_entry* aft
     }
     errno = ENOENT;
     return 0;
+    ____;
+}
+
+/** create a name index for the lookup functions
+ *
+ * This function walks the central directory once and puts the names into
+ * a hash table, so that => zzip_disk_findfile is O(1) instead of a linear
+ * search with a strdup and strcmp per entry. The first of duplicate names
+ * is found, as with the linear search. The => zzip_disk_findmatch function
+ * will use an array of the names sorted on first use to check only the
+ * entries that have the literal prefix of the filespec (the part before
+ * any wildcard). Note that with an index the matches are returned in the
+ * order of their names, not in the order of the central directory.
+ *
+ * The index is used only for the default compare functions and not
+ * for ZZIP_DISK_FLAGS_MATCH_NOCASE or a _zzip_FNM_CASEFOLD findmatch.
+ * It is released by => zzip_disk_close - any earlier index is replaced
+ * (including one of => zzip_mem_disk_index as both use disk->reserved).
+ *
+ * This function returns the number of entries or -1 on errors (errno).
+ */
+long
+zzip_disk_index(ZZIP_DISK* disk)
+{
+    if (! disk) {
+        errno = EINVAL;
+        return -1;
+    }
+    zzip_disk_unindex(disk);
+    ___ struct zzip_disk_entry* entry;
+    zzip_size_t                 len       = 0;
+    size_t                      count     = 0;
+    size_t                      namebytes = 0;
+    for (entry = zzip_disk_findfirst(disk); entry; entry = zzip_disk_findnext(disk, entry)) {
+        if (! zzip_disk_entry_name(disk, entry, &len))
+            return -1; /* EBADMSG */
+        count++;
+        namebytes += len + 1;
+    }
+    ___ struct zzip_hashindex* index = _zzip_hashindex_new(count, namebytes);
+    if (! index) {
+        errno = ENOMEM;
+        return -1;
+    }
+    ___ char* names = index->names;
+    for (entry = zzip_disk_findfirst(disk); entry; entry = zzip_disk_findnext(disk, entry)) {
+        char* name = zzip_disk_entry_name(disk, entry, &len);
+        memcpy(names, name, len);
+        names[len] = '\0';
+        _zzip_hashindex_add(index, names, entry);
+        names += len + 1;
+    }
+    index->owner   = disk;
+    disk->reserved = index;
+    return (long) count;
+    ____;
+    ____;
+    ____;
+}
+
+/** => zzip_disk_index
+ * This function releases the name index (if any).
+ */
+void
+zzip_disk_unindex(ZZIP_DISK* disk)
+{
+    if (disk && disk->reserved) {
+        _zzip_hashindex_free(disk->reserved);
+        disk->reserved = 0;
+    }
 }
 
 /* ====================================================================== */
@@ -641,6 +747,13 @@ zzip_disk_entry_fopen(ZZIP_DISK* disk, ZZIP_DISK_ENTRY* entry)
     file->buffer = disk->buffer;
     file->endbuf = disk->endbuf;
     file->avail  = zzip_file_header_usize(header);
+    if (file->avail == 0xFFFFFFFFu) { /* the ZIP64 marker */
+        struct zzip_extra_zip64* zip64 =
+            (struct zzip_extra_zip64*) zzip_file_header_to_extras(header);
+        if (ZZIP_EXTRA_ZIP64_CHECK(zip64)) {
+            file->avail = zzip_extra_zip64_usize(zip64);
+        }
+    }
 
     if (! file->avail || zzip_file_header_data_stored(header)) {
         file->stored = zzip_file_header_to_data(header);
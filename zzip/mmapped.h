@@ -32,7 +32,7 @@ typedef struct zzip_disk      ZZIP_DISK;
 struct zzip_disk {
     zzip_byte_t* buffer;   /* start of mmapped area, the base of all seekvals */
     zzip_byte_t* endbuf;   /* end of mmapped area, i.e. buffer + buflen */
-    void*        reserved; /* - for later extensions (might be renamed) */
+    void*        reserved; /* - the name index of zzip_disk_index or zzip_mem_disk_index */
     void*        user;     /* - free for applications (use this!) */
     long         flags;    /* bit 0: findfile searches case-insensitive */
     long         mapped;   /* used for mmap() wrappers of zzip/__mmap.h */
@@ -92,6 +92,11 @@ zzip_disk_extern ZZIP_DISK_ENTRY*
 zzip_disk_findmatch(ZZIP_DISK* disk, char* filespec, ZZIP_DISK_ENTRY* after,
                     zzip_fnmatch_fn_t compare, int flags);
 
+zzip_disk_extern long
+zzip_disk_index(ZZIP_DISK* disk);
+zzip_disk_extern void
+zzip_disk_unindex(ZZIP_DISK* disk);
+
 zzip_disk_extern zzip__new__ ZZIP_DISK_FILE*
 zzip_disk_entry_fopen(ZZIP_DISK* disk, ZZIP_DISK_ENTRY* entry);
 